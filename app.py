@@ -78,9 +78,13 @@ except Exception:
 
 try:
     from db_storage import (
+        get_schema_error,
         save_uploaded_data,
         save_table,
         insert_into_table,
+        ingest_files,
+        get_quarantined_rows,
+        clear_quarantine,
         save_extraction_run,
         load_uploaded_data,
         load_table,
@@ -92,6 +96,7 @@ try:
         get_db_path,
         refresh_erd_tables_json,
         create_table_from_schema,
+        create_tables_from_schema,
         get_table_schema_with_comments,
         get_all_tables_schema_with_comments,
         get_table_comment,
@@ -99,9 +104,33 @@ try:
         get_column_data_lengths,
         save_column_min_max_batch,
         get_table_row_count,
+        count_table_rows,
+        query_table_page,
+        get_table_column_stats,
+        get_column_profile,
+        advise_indexes,
+        create_key_indexes,
+        get_partitions,
+        consult_keyword_hits,
+        search_consult,
+        CONSULT_RISK_TERMS,
+        get_customer_detail,
+        count_segment_customers,
+        format_sql_with_params,
+        aggregate_by_customer,
+        cached_call,
+        get_result_cache_stats,
+        clear_result_cache,
+        get_analytic_engine_info,
+        FILTER_OPS,
         insert_one_row_and_get_error,
         table_has_rows,
         update_ml_crm_segment_interpretations,
+        list_ml_runs,
+        prune_ml_runs,
+        incremental_vacuum,
+        ML_RUN_KEEP_RUNS,
+        ML_RUN_KEEP_DAYS,
         _sanitize_table_name,
         _sanitize_column_name,
         TABLE_CONDITION_EXTRACT_RESULT,
@@ -122,15 +151,23 @@ except Exception:
         return False
     def save_table(df, table_name):
         return False
-    def insert_into_table(df, table_name):
+    def insert_into_table(df, table_name, **k):
         return False, "db_storage 미로드", 0
+    def get_quarantined_rows(table_name=None, limit=1000):
+        return pd.DataFrame()
+    def clear_quarantine(table_name=None):
+        return 0
+    def get_schema_error():
+        return None
+    def ingest_files(files, **k):
+        return [{"name": n, "table": Path(n).stem, "ok": False, "error": "db_storage 미로드", "rows": 0, "inserted": 0, "ignored": 0, "preview": None, "columns": [], "elapsed": 0.0} for n, _ in files]
     def save_extraction_run(*a, **k):
         return False
     def load_extraction_result_with_criteria():
         return None
     def load_uploaded_data(table_name=None):
         return None
-    def load_table(table_name, limit=None):
+    def load_table(table_name, limit=None, **k):
         return None
     def list_tables():
         return []
@@ -146,6 +183,8 @@ except Exception:
         return False
     def create_table_from_schema(*a, **k):
         return False, "", "db_storage 미로드"
+    def create_tables_from_schema(tables):
+        return [(t[0], False, "", "db_storage 미로드") for t in tables]
     def get_table_schema_with_comments(*a, **k):
         return []
     def get_all_tables_schema_with_comments(*a, **k):
@@ -160,10 +199,54 @@ except Exception:
         return 0, "db_storage 미로드"
     def get_table_row_count(*a, **k):
         return 0
+    def count_table_rows(*a, **k):
+        return 0
+    def query_table_page(*a, **k):
+        return {"df": pd.DataFrame(), "next_after": None, "sql": ""}
+    def get_table_column_stats(*a, **k):
+        return []
+    def get_column_profile(*a, **k):
+        return {}
+    def advise_indexes(*a, **k):
+        return []
+    def create_key_indexes(*a, **k):
+        return []
+    def get_partitions(*a, **k):
+        return []
+    def consult_keyword_hits(*a, **k):
+        return None
+    def search_consult(*a, **k):
+        return []
+    CONSULT_RISK_TERMS = ("연체", "파산", "개인회생", "연기 요청")
+    def get_customer_detail(cust_id, **k):
+        return {"customer": cust_id, "tables": {}, "key_columns": {}, "grades": None, "run_key": None, "elapsed_ms": 0.0}
+    def count_segment_customers(*a, **k):
+        return {"count": 0, "sql": "", "params": [], "elapsed_ms": 0.0, "join_key": None, "notes": ["db_storage 미로드"]}
+    def format_sql_with_params(sql, params):
+        return sql
+    def aggregate_by_customer(*a, **k):
+        return None
+    def cached_call(name, tables, compute, *args, copy_result=True, **kwargs):
+        return compute(*args, **kwargs)
+    def get_result_cache_stats():
+        return {"hits": 0, "misses": 0, "hit_rate": 0.0, "evictions": 0, "entries": 0, "bytes": 0, "max_bytes": 0}
+    def clear_result_cache():
+        pass
+    FILTER_OPS = ("=", "!=", ">", ">=", "<", "<=", "LIKE", "NOT LIKE", "IS NULL", "IS NOT NULL")
+    def get_analytic_engine_info():
+        return {"engine": "sqlite", "mode": None, "queries": 0, "fallbacks": 0, "last_error": None, "mirrored": []}
     def insert_one_row_and_get_error(*a, **k):
         return None
     def update_ml_crm_segment_interpretations(*a, **k):
         return False
+    def list_ml_runs():
+        return []
+    def prune_ml_runs(*a, **k):
+        return {"runs": 0, "rows": 0, "error": "db_storage 미로드"}
+    def incremental_vacuum(*a, **k):
+        return 0
+    ML_RUN_KEEP_RUNS = 10
+    ML_RUN_KEEP_DAYS = 90
     def table_has_rows(*a, **k):
         return False
     def _sanitize_table_name(x):
@@ -373,8 +456,18 @@ def load_custom_css():
     )
 
 
-def _data_context(df: pd.DataFrame) -> dict:
-    """업로드된 데이터프레임에서 AI용 요약 컨텍스트 생성."""
+def _data_context(df: pd.DataFrame, table_name: str | None = None) -> dict:
+    """업로드된 데이터프레임에서 AI용 요약 컨텍스트 생성. table_name이 있으면 _column_profile(전체 적재분) 기준."""
+    profile = get_column_profile(table_name) if table_name else {}
+    if profile:
+        nums = {c: p for c, p in profile.items() if p["numeric"] and p["numeric"] >= p["non_null"] // 2}
+        ctx = {"rows": max(p["rows"] for p in profile.values()), "columns": list(profile)}
+        if nums:
+            ctx["numeric_summary"] = {
+                c: {k: round(v, 2) for k, v in (("count", p["numeric"]), ("mean", p["mean"]), ("std", p["std"]), ("min", p["min"]), ("max", p["max"])) if v is not None}
+                for c, p in nums.items()
+            }
+        return ctx
     if df is None or df.empty:
         return {}
     ctx = {"rows": len(df), "columns": list(df.columns)}
@@ -434,7 +527,7 @@ def _get_dashboard_tables():
     out = {}
     for name in ["마이데이터", "대출", "신용", "상담"]:
         if name in tables:
-            df = load_table(name)
+            df = load_table(name, compact=True)
             out[name] = df
         else:
             out[name] = None
@@ -492,41 +585,77 @@ def data_upload():
         success_count = 0
         fail_count = 0
         NA_VALUES_READ = ["", "#N/A", "null", "None", "nan", ".", "#NULL!"]
-        for f in files:
-            try:
-                if f.name.endswith(".csv"):
-                    df = pd.read_csv(f, keep_default_na=False, na_values=NA_VALUES_READ)
-                else:
-                    df = pd.read_excel(f, na_values=NA_VALUES_READ)
-                table_name = Path(f.name).stem
-                ok, err, _ = insert_into_table(df, table_name)
-                if ok:
-                    success_count += 1
-                    st.session_state.uploaded_data = df
-                    st.success(f"✅ **{f.name}** → 테이블 **{table_name}** 에 {len(df):,}건 추가 완료")
-                else:
-                    fail_count += 1
-                    st.error(f"❌ **{f.name}** → {table_name}: {err or '업로드 실패'}")
-                with st.expander(f"미리보기: {f.name} (상위 10행)"):
-                    st.dataframe(df.head(10), use_container_width=True)
-                    st.caption(f"컬럼: {list(df.columns)}")
-            except Exception as e:
+        # 파싱·검증은 프로세스 풀에서 병렬, INSERT는 단일 쓰기로 파일별 트랜잭션 (ERD 갱신은 마지막에 한 번)
+        progress = st.progress(0.0, text=f"파일 {len(files)}개 적재 중...")
+
+        def _on_progress(p, _bar=progress):
+            frac, text = p["done"] / max(1, p["total"]), f"{p['done']}/{p['total']} · {p['name']}: {p['rows']:,}행"
+            if "bytes" in p:
+                # 대용량 CSV 스트리밍: 청크마다 bytes·행/초 갱신
+                total = p.get("total_bytes") or 0
+                frac += (min(1.0, p["bytes"] / total) if total else 0.0) / max(1, p["total"])
+                text += f" · {p['bytes'] / 1_048_576:,.1f}MB · {p['rows_per_sec']:,.0f}행/초"
+            elif not p["ok"]:
+                text += " (실패)"
+            elif p.get("elapsed"):
+                text += f" · {p['rows'] / p['elapsed']:,.0f}행/초"
+            _bar.progress(min(1.0, frac), text=text)
+
+        try:
+            # UploadedFile을 그대로 넘김 → 파싱 직전에만 읽고, 큰 CSV는 청크 스트리밍
+            results = ingest_files([(f.name, f) for f in files], na_values=NA_VALUES_READ, on_progress=_on_progress)
+        except Exception as e:
+            results = [{"name": f.name, "table": Path(f.name).stem, "ok": False, "error": f"파일 처리 오류: {e}", "preview": None} for f in files]
+        progress.empty()
+        for res in results:
+            table_name = res["table"]
+            if res["ok"]:
+                success_count += 1
+                st.session_state.uploaded_data = res["preview"]
+                st.session_state.uploaded_table = table_name
+                dup_t, dup_f = res.get("duplicate_in_table", 0), res.get("duplicate_in_file", 0)
+                detail = f" (테이블 중복 {dup_t:,}건 · 파일 내 중복 {dup_f:,}건 건너뜀" if dup_t or dup_f else f" ({res['ignored']:,}건 중복 무시"
+                if res.get("quarantined"):
+                    detail += f", 검증 위반 {res['quarantined']:,}건 격리"
+                detail += f", {res['rows'] / res['elapsed']:,.0f}행/초)" if res["elapsed"] > 0 else ")"
+                st.success(f"✅ **{res['name']}** → 테이블 **{table_name}** 에 {res['inserted']:,}건 추가 완료 (총 {res['rows']:,}건){detail}")
+                samples = res.get("duplicate_samples") or {}
+                if samples.get("duplicate_in_table") or samples.get("duplicate_in_file"):
+                    with st.expander(f"중복 키 예시: {res['name']}"):
+                        st.write({"테이블 중복": samples.get("duplicate_in_table", []), "파일 내 중복": samples.get("duplicate_in_file", [])})
+                if res.get("validation_counts"):
+                    with st.expander(f"검증 위반: {res['name']} ({res['quarantined']:,}건 격리)"):
+                        st.dataframe(pd.DataFrame(res["validation_counts"]), use_container_width=True, hide_index=True)
+                        st.dataframe(pd.DataFrame(res.get("validation_errors") or []), use_container_width=True, hide_index=True)
+            else:
                 fail_count += 1
-                st.error(f"❌ **{f.name}** 파일 처리 오류: {e}")
+                st.error(f"❌ **{res['name']}** → {table_name}: {res['error'] or '업로드 실패'}")
+            if res["preview"] is not None:
+                with st.expander(f"미리보기: {res['name']} (상위 10행)"):
+                    st.dataframe(res["preview"], use_container_width=True)
+                    st.caption(f"컬럼: {list(res['preview'].columns)}")
+        parallel_error = next((r["parallel_error"] for r in results if r.get("parallel_error")), None)
         if success_count > 0:
-            try:
-                refresh_erd_tables_json()
-            except Exception:
-                pass
             st.session_state.data_upload_message = (
-                "info",
-                f"총 **{success_count}**개 파일 적재 완료" + (f", **{fail_count}**개 실패" if fail_count else "") + ". **데이터 보기**에서 확인하세요.",
+                "warning" if parallel_error else "info",
+                f"총 **{success_count}**개 파일 적재 완료" + (f", **{fail_count}**개 실패" if fail_count else "") + ". **데이터 보기**에서 확인하세요."
+                + (f" ({parallel_error})" if parallel_error else ""),
             )
         elif fail_count > 0:
             st.session_state.data_upload_message = ("error", f"**{fail_count}**개 파일 적재 실패. 테이블 존재 여부·스키마·파일 형식을 확인하세요.")
         st.session_state.data_uploader_key = (st.session_state.data_uploader_key + 1) % (10**6)
         st.rerun()
 
+    quarantined = get_quarantined_rows(limit=500)
+    if quarantined is not None and not quarantined.empty:
+        with st.expander(f"🚧 검증 위반으로 격리된 행 (최근 {len(quarantined):,}건)"):
+            st.caption("errors: 위반 컬럼:규칙 (type·length·scale·not_null·min·max). row_data는 업로드 원본 값입니다.")
+            st.dataframe(quarantined, use_container_width=True, hide_index=True)
+            if st.button("격리 행 비우기", key="clear_quarantine_btn"):
+                n = clear_quarantine()
+                st.session_state.data_upload_message = ("info", f"격리 행 {n:,}건을 삭제했습니다.")
+                st.rerun()
+
     st.divider()
 
     # ----- 2. 테이블 컬럼 MIN/MAX 정의 적재 -----
@@ -591,10 +720,17 @@ def data_upload():
             for tname in selected_tables:
                 df = _generate_sample_data(tname, sample_count)
                 if df is not None and not df.empty:
-                    ok, err, rows_inserted = insert_into_table(df, tname)
+                    screen = {}
+                    ok, err, rows_inserted = insert_into_table(df, tname, report=screen)
                     if ok:
                         if rows_inserted == 0:
-                            detail = insert_one_row_and_get_error(df.head(1), tname)
+                            # 검증 위반·키 중복이면 적재 전 판별 결과로 설명, 아니면 1행을 제약 없이 넣어 원인 확인
+                            n_dup = screen.get("duplicate_in_table", 0) + screen.get("duplicate_in_file", 0)
+                            if screen.get("invalid") or n_dup:
+                                viol = ", ".join(f"{c['column']} {c['rule']} {c['count']:,}건" for c in screen.get("validation_counts", [])[:5])
+                                detail = f"검증 위반 {screen.get('invalid', 0):,}건 격리" + (f" ({viol})" if viol else "") + f" · 키 중복 {n_dup:,}건"
+                            else:
+                                detail = insert_one_row_and_get_error(df.head(1), tname)
                             errors.append(f"**{tname}**: 0건 — " + (detail or "제약으로 무시됨"))
                         else:
                             results.append((tname, rows_inserted, get_table_row_count(tname)))
@@ -1021,15 +1157,15 @@ def table_schema_upload_page():
             st.dataframe(preview_df, use_container_width=True)
 
     if st.button("✅ 위 테이블들 DB에 생성", type="primary", key="create_tables_btn"):
-        results = []  # (테이블명, 성공여부, CREATE_SQL, 오류메시지)
+        # 워크북 전체를 한 트랜잭션으로 생성 (테이블별 실패는 해당 테이블만 되돌림)
+        staged = []
         for item in tables_schema:
             tname = item[0]
             table_name_ko = item[1] if len(item) >= 2 else None
             columns = item[2] if len(item) >= 3 else item[1] if len(item) == 2 else []
-            if not columns:
-                continue
-            ok, sql, err = create_table_from_schema(tname, columns, table_name_ko=table_name_ko)
-            results.append((tname, ok, sql, err))
+            if columns:
+                staged.append((tname, table_name_ko, columns))
+        results = create_tables_from_schema(staged)  # (테이블명, 성공여부, CREATE_SQL, 오류메시지)
         try:
             refresh_erd_tables_json()
         except Exception:
@@ -1105,44 +1241,126 @@ def view_loaded_data():
         st.caption("위에서 테이블을 선택하면 데이터가 표시됩니다.")
         return
 
-    df = load_table(selected)
+    # 전체 로드 없이 스키마·건수·현재 페이지만 SQL로 조회
     display_name = table_label(selected)
-    if df is None or df.empty:
+    schema = get_table_schema_with_comments(selected)
+    if not schema:
         st.warning(f"**{display_name}** 데이터를 불러올 수 없습니다.")
         return
+    col_names = [c["name"] for c in schema]
+    total_rows = get_table_row_count(selected)
+
+    # 컬럼 통계(결측·유일값)는 버튼으로 별도 집계 — 테이블별로 세션에 보관
+    stats_cache = st.session_state.setdefault("view_loaded_data_stats", {})
+    stats = stats_cache.get(selected)
 
     # 선택 테이블 요약 카드
-    n_rows, n_cols = len(df), len(df.columns)
+    n_cols = len(col_names)
     c1, c2, c3, c4 = st.columns(4)
     with c1:
         st.metric("선택 테이블", display_name)
     with c2:
-        st.metric("총 행 수", f"{n_rows:,}건")
+        st.metric("총 행 수", f"{total_rows:,}건")
     with c3:
         st.metric("총 컬럼 수", f"{n_cols}개")
     with c4:
-        null_pct = (df.isna().sum().sum() / (n_rows * n_cols) * 100) if (n_rows * n_cols) > 0 else 0
-        st.metric("결측 비율", f"{null_pct:.1f}%")
+        if stats and total_rows * n_cols > 0:
+            null_pct = sum(x["nulls"] for x in stats) / (stats[0]["non_null"] + stats[0]["nulls"]) / n_cols * 100
+            st.metric("결측 비율", f"{null_pct:.1f}%")
+        else:
+            st.metric("결측 비율", "-")
 
     # 컬럼 목록·타입·결측
     st.subheader("컬럼 정보")
+    STATS_SAMPLE_THRESHOLD = 1_000_000
+    if st.button("결측·유일값 통계 계산", key="view_loaded_data_stats_btn"):
+        sample = STATS_SAMPLE_THRESHOLD if total_rows > STATS_SAMPLE_THRESHOLD else None
+        with st.spinner("컬럼 통계 집계 중..."):
+            stats = get_table_column_stats(selected, sample_rows=sample)
+        stats_cache[selected] = stats
+    if stats:
+        by_name = {x["name"]: x for x in stats}
+    else:
+        # 계산 전에는 적재 시 누적된 _column_profile 값(유일값은 근사) 표시
+        by_name = {c: {"nulls": p["nulls"], "distinct": p["distinct"]} for c, p in get_column_profile(selected).items()}
     col_info = pd.DataFrame({
-        "컬럼명": df.columns,
-        "타입": [str(d) for d in df.dtypes],
-        "결측 수": df.isna().sum().values,
-        "유일값 수": [df[c].nunique() for c in df.columns],
+        "컬럼명": col_names,
+        "한글명": [c.get("name_ko") or "" for c in schema],
+        "타입": [c["type"] for c in schema],
+        "결측 수": [by_name[c]["nulls"] if c in by_name else None for c in col_names],
+        "유일값 수": [by_name[c]["distinct"] if c in by_name else None for c in col_names],
     })
+    if not stats and by_name:
+        st.caption("결측·유일값은 적재 시 누적된 프로파일 값입니다 (유일값은 근사). 정확한 값은 위 버튼으로 계산하세요.")
     st.dataframe(col_info, use_container_width=True, height=min(200, 50 + len(col_info) * 35))
+    if stats and total_rows > STATS_SAMPLE_THRESHOLD:
+        st.caption(f"통계는 앞쪽 {STATS_SAMPLE_THRESHOLD:,}행 기준입니다.")
 
-    # 데이터 테이블 (페이지네이션)
+    # 정렬·필터
     st.subheader("데이터 테이블")
+    f1, f2, f3, f4, f5 = st.columns([2, 1, 2, 1, 2])
+    with f1:
+        order_by = st.selectbox("정렬 컬럼", options=[""] + col_names, format_func=lambda c: c or "(적재 순서)", key="view_loaded_data_order")
+    with f2:
+        descending = st.checkbox("내림차순", value=False, key="view_loaded_data_desc", disabled=not order_by)
+    with f3:
+        filter_col = st.selectbox("필터 컬럼", options=[""] + col_names, format_func=lambda c: c or "(없음)", key="view_loaded_data_filter_col")
+    with f4:
+        filter_op = st.selectbox("조건", options=list(FILTER_OPS), key="view_loaded_data_filter_op", disabled=not filter_col)
+    with f5:
+        filter_val = st.text_input("값", key="view_loaded_data_filter_val", disabled=not filter_col or filter_op in ("IS NULL", "IS NOT NULL"))
+    filters = [(filter_col, filter_op, filter_val)] if filter_col else None
+    n_rows = count_table_rows(selected, filters) if filters else total_rows
+
+    # 데이터 테이블 (페이지네이션) — 다음 페이지는 keyset 커서, 그 외 점프는 OFFSET
     page_size = 50
     n_pages = max(1, (n_rows + page_size - 1) // page_size)
     page = st.number_input("페이지", min_value=1, max_value=n_pages, value=1, step=1, key="view_loaded_data_page")
+    query_key = (selected, order_by, descending, tuple(filters or []))
+    cursors = st.session_state.get("view_loaded_data_cursors")
+    if not cursors or cursors.get("key") != query_key:
+        cursors = {"key": query_key, "pages": {}}
+        st.session_state.view_loaded_data_cursors = cursors
     start = (page - 1) * page_size
-    end = min(start + page_size, n_rows)
-    st.caption(f"**{display_name}** · 총 {n_rows:,}건 중 {start + 1} ~ {end}건 표시 (페이지당 {page_size}건)")
-    st.dataframe(df.iloc[start:end], use_container_width=True, height=400)
+    res = query_table_page(
+        selected,
+        page_size=page_size,
+        order_by=order_by or None,
+        descending=bool(order_by) and descending,
+        filters=filters,
+        after=cursors["pages"].get(page - 1),
+        offset=start,
+    )
+    if res["next_after"] is not None:
+        cursors["pages"][page] = res["next_after"]
+    page_df = res["df"]
+    end = start + len(page_df)
+    st.caption(f"**{display_name}** · 총 {n_rows:,}건 중 {start + 1 if len(page_df) else 0} ~ {end}건 표시 (페이지당 {page_size}건)")
+    st.dataframe(page_df, use_container_width=True, height=400)
+
+    # BASE_YM 파티션별 행 수 (파티션 카탈로그 — 테이블을 읽지 않음)
+    partitions = get_partitions(selected)
+    if partitions:
+        with st.expander(f"BASE_YM 파티션 ({len(partitions)}개, 최신 {partitions[-1]['partition']})"):
+            st.dataframe(
+                pd.DataFrame([{"BASE_YM": p["partition"], "행 수": p["rows"], "갱신 시각": p["updated_at"]} for p in partitions]),
+                use_container_width=True,
+            )
+
+    # 인덱스 점검 — 고객키 조회·조인, BASE_YM 조회의 실행 계획(EXPLAIN QUERY PLAN)에서 전체 스캔 여부 확인
+    with st.expander("인덱스 점검"):
+        advice = advise_indexes([selected])
+        if not advice:
+            st.caption("고객키·BASE_YM 조회가 모두 인덱스를 사용합니다.")
+        else:
+            st.warning(f"전체 스캔 조회 {len(advice)}건 — 아래 인덱스가 필요합니다.")
+            st.dataframe(
+                pd.DataFrame([{"컬럼": a["column"], "조회": a["sql"], "실행 계획": " / ".join(a["plan"]), "추천": a["suggestion"]} for a in advice]),
+                use_container_width=True,
+            )
+            if st.button("추천 인덱스 생성", key="view_loaded_data_create_index_btn"):
+                created = create_key_indexes(selected)
+                st.success(f"인덱스 {len(created)}개 확인·생성 완료: {', '.join(created)}" if created else "생성할 인덱스가 없습니다.")
 
 
 def _comment_for_feature(feature_name: str, column_comments_by_table: dict) -> str:
@@ -1179,6 +1397,8 @@ def ml_crm_grade_page():
         if ok:
             st.success("학습·등급화 완료. **ML_CRM_RESULTS** 테이블에 저장되었습니다.")
             st.metric("병합 행 수", f"{res.get('merged_rows', 0):,}건")
+            if res.get("memory_saved"):
+                st.caption(f"컴팩트 dtype 적용으로 입력 데이터 메모리 {res['memory_saved'] / 1048576:,.1f}MB 절감")
             sel = res.get("selected_targets") or {}
             cand = res.get("target_candidates") or {}
             st.caption(
@@ -1267,6 +1487,29 @@ def ml_crm_grade_page():
     else:
         st.caption("위 **모델 학습 및 등급화 실행** 버튼을 누르면 데이터 사용 설정 테이블 기준으로 학습이 진행됩니다. 결과는 **데이터 보기**에서 **ML_CRM_RESULTS** 테이블을 선택해 확인할 수 있습니다.")
 
+    # 실행 이력 (ML_CRM_RUNS) — 보존 정책 밖의 실행은 학습 후 백그라운드에서 자동 정리
+    runs = list_ml_runs()
+    with st.expander(f"실행 이력 ({len(runs)}건 · 최근 {ML_RUN_KEEP_RUNS}개 또는 {ML_RUN_KEEP_DAYS}일 이내 유지)"):
+        if runs:
+            st.dataframe(
+                pd.DataFrame([
+                    {"실행키": r["run_key"], "건수": r["rows"], "생성 일자": r["created_date"], "생성 시간": r["created_time"],
+                     "원천 테이블": ", ".join(r["source_tables"])}
+                    for r in runs
+                ]),
+                use_container_width=True,
+                hide_index=True,
+            )
+        else:
+            st.caption("저장된 실행이 없습니다.")
+        if st.button("보존 정책 적용 (오래된 실행 삭제)", key="ml_crm_prune_runs_btn"):
+            pr = prune_ml_runs()
+            if pr["error"]:
+                st.error(f"정리 실패: {pr['error']}")
+            else:
+                freed = incremental_vacuum() if pr["runs"] else 0
+                st.success(f"실행 {pr['runs']}건 · 결과 {pr['rows']:,}행 삭제" + (f" (빈 페이지 {freed:,}개 반환)" if freed > 0 else ""))
+
 
 def extraction_config_page():
     """데이터 사용 설정 — 좌: 테이블 목록(사용 체크), 우: 선택 테이블의 컬럼 목록(사용 체크)."""
@@ -1422,11 +1665,16 @@ def _find_col(df, *candidates):
     """DataFrame에서 후보 문자열이 포함된 컬럼명 찾기 (대소문자 무시)."""
     if df is None or df.empty:
         return None
-    cols = [str(c) for c in df.columns]
+    return _find_col_name(list(df.columns), *candidates)
+
+
+def _find_col_name(columns, *candidates):
+    """컬럼명 목록(스키마 등)에서 후보 문자열이 포함된 컬럼명 찾기 (대소문자 무시). 데이터를 읽지 않음."""
+    cols = [str(c) for c in columns or []]
     for cand in candidates:
         for i, c in enumerate(cols):
             if cand.lower() in c.lower() or (cand in c):
-                return df.columns[i]
+                return columns[i]
     return None
 
 
@@ -1492,12 +1740,27 @@ def _save_extraction_config(tables_config):
         return False
 
 
+def _extraction_config_token():
+    """설정 파일 변경 감지용 토큰 (결과 캐시 키에 포함)."""
+    try:
+        st_ = EXTRACTION_CONFIG_PATH.stat()
+        return (st_.st_mtime_ns, st_.st_size)
+    except OSError:
+        return None
+
+
 def _get_segment_column_stats():
     """
     데이터 사용 설정에서 체크된 테이블·컬럼 기준으로 컬럼별 min, max, dtype 수집.
     설정이 없거나 현재 DB 테이블과 맞지 않으면, 데이터 있는 모든 테이블·모든 컬럼을 기본 사용.
+    DB·설정 파일이 바뀌지 않았으면 결과 캐시에서 반환.
     반환: (schema_info: str, column_stats: list[dict]). column_stats 항목: table, column, min, max, dtype
     """
+    return cached_call("segment_column_stats", None, _compute_segment_column_stats, _extraction_config_token())
+
+
+def _compute_segment_column_stats(_config_token=None):
+    """_get_segment_column_stats 본체 (캐시 미적중 시 실행)."""
     tables = list_tables()
     if not tables:
         return "적재된 테이블 없음", []
@@ -1526,7 +1789,7 @@ def _get_segment_column_stats():
                 "customer_id_column": default_cid,
                 "columns_for_ai": cols,
             })
-    # 통계용으로는 샘플만 로드해 화면 로딩 속도 확보 (전체 로드 시 10만 건×테이블 수로 지연)
+    # 통계는 적재 시 누적된 _column_profile에서 조회 (원본 미조회). 프로파일 없는 테이블만 샘플 로드
     SEGMENT_STATS_SAMPLE = 10_000
     schema_parts = []
     column_stats = []
@@ -1535,11 +1798,45 @@ def _get_segment_column_stats():
         cols_ai = cfg.get("columns_for_ai") or []
         if not tname or not cols_ai:
             continue
-        df = load_table(tname, limit=SEGMENT_STATS_SAMPLE)
-        if df is None or df.empty:
+        profile = get_column_profile(tname)
+        # TEXT 선언 컬럼은 숫자 문자열이어도 문자형으로 취급 (DB에서 읽으면 object)
+        text_cols = {
+            c["name"] for c in get_table_schema_with_comments(tname)
+            if any(k in (c.get("type") or "") for k in ("CHAR", "CLOB", "TEXT"))
+        } if profile else set()
+        df = None
+        if not profile:
+            df = load_table(tname, limit=SEGMENT_STATS_SAMPLE, columns=cols_ai)
+            if df is None or df.empty:
+                continue
+        elif not any(p["rows"] for p in profile.values()):
             continue
         schema_parts.append(f"{tname}({', '.join(cols_ai[:8])}{'...' if len(cols_ai) > 8 else ''})")
         for col in cols_ai:
+            if profile:
+                p = profile.get(col)
+                if p is None:
+                    continue
+                if col not in text_cols and p["numeric"] and p["numeric"] >= p["non_null"]:
+                    mn, mx = p["min"], p["max"]
+                    dtype = "float64"
+                    is_boolean = False
+                    unique_values = None
+                else:
+                    mn = mx = None
+                    dtype = "object"
+                    is_boolean = "여부" in col or 1 <= p["distinct"] <= 2
+                    if is_boolean and p["text_min"] is not None:
+                        unique_values = list(dict.fromkeys([p["text_min"], p["text_max"]]))
+                    elif is_boolean and p["min"] is not None:
+                        unique_values = list(dict.fromkeys(f"{v:g}" for v in (p["min"], p["max"])))
+                    else:
+                        unique_values = ["예", "아니오"] if is_boolean else None
+                row = {"table": tname, "column": col, "min": mn, "max": mx, "dtype": dtype, "is_boolean": is_boolean}
+                if unique_values is not None:
+                    row["unique_values"] = unique_values
+                column_stats.append(row)
+                continue
             if col not in df.columns:
                 continue
             s = df[col]
@@ -1569,67 +1866,75 @@ def _get_segment_column_stats():
     return schema_info, column_stats
 
 
+_SUMMARY_SAMPLE_ROWS = 1000  # 자동 감지 시 컬럼 판별용 샘플 행 수
+
+
+def _summary_schema_info(tables):
+    """고객 요약용 스키마 설명 문자열 (메타데이터에서 조회, 테이블 전체 로드 없음)."""
+    schemas_by_table = get_all_tables_schema_with_comments()
+    parts = []
+    for t in tables:
+        cols = [c["name"] for c in schemas_by_table.get(t) or []]
+        if cols and table_has_rows(t):
+            parts.append(f"{t}({', '.join(cols[:8])}{'...' if len(cols) > 8 else ''})")
+    return "; ".join(parts)
+
+
 def _build_summary_from_config(tables, used_config_list, schema_info):
     """
-    설정(used_config_list)에 따라 테이블을 로드해 고객별 요약 생성.
+    설정(used_config_list)에 따라 테이블별 GROUP BY 집계 1회로 고객별 요약 생성.
     used_config_list: list[dict] with table_name, customer_id_column, columns_for_ai (each use=True).
     반환: (summaries: list[dict], used_tables_columns: list[dict])
     """
-    all_cids = set()
-    table_dfs = {}
-    name_by_cid = {}
+    schemas_by_table = get_all_tables_schema_with_comments()
+    merged = None
+    fill_values = {}
+    used_tables_columns = []
     for cfg in used_config_list:
         tname = cfg.get("table_name")
         cid_col = cfg.get("customer_id_column")
         if not tname or not cid_col or tname not in tables:
             continue
-        df = load_table(tname)
-        if df is None or df.empty or cid_col not in df.columns:
+        table_cols = [c["name"] for c in schemas_by_table.get(tname) or []]
+        cols_ai = [c for c in (cfg.get("columns_for_ai") or []) if c in table_cols and c != cid_col]
+        # 고객명: 이름 컬럼이 있으면 고객별 첫 값
+        name_col = _find_col_name(table_cols, "고객명", "customer_name", "이름", "name")
+        agg = aggregate_by_customer(tname, cid_col, columns=cols_ai, first_columns=[name_col] if name_col else None)
+        if agg is None or agg.empty:
             continue
-        table_dfs[tname] = {"df": df, "cfg": cfg}
-        all_cids.update(df[cid_col].dropna().astype(str).unique().tolist())
-        # 고객명: 첫 테이블에서 이름 컬럼 찾아서 채우기
-        name_col = _find_col(df, "고객명", "customer_name", "이름", "name")
-        if name_col and name_col in df.columns:
-            for _, row in df[[cid_col, name_col]].drop_duplicates(cid_col).iterrows():
-                cid = row[cid_col]
-                if cid not in name_by_cid:
-                    name_by_cid[cid] = str(row[name_col])
-
-    if not all_cids:
+        part = pd.DataFrame({"고객_ID": agg[cid_col].astype(str), f"{tname}_건수": agg["_rows"]})
+        for col in cols_ai:
+            part[f"{tname}_{col}"] = agg[col].values
+            # 해당 테이블에 행이 없는 고객: 숫자 0, 텍스트 ""
+            fill_values[f"{tname}_{col}"] = (0, agg[col].dtype) if pd.api.types.is_numeric_dtype(agg[col]) else ("", None)
+        fill_values[f"{tname}_건수"] = (0, agg["_rows"].dtype)
+        if name_col and name_col in agg.columns:
+            part["_고객명"] = agg[name_col].values
+        if merged is None:
+            merged = part
+        else:
+            dup = [c for c in part.columns if c in merged.columns and c not in ("고객_ID", "_고객명")]
+            part = part.drop(columns=dup)
+            merged = merged.merge(part, on="고객_ID", how="outer", suffixes=("", "_r"))
+            if "_고객명_r" in merged.columns:
+                # 고객명은 먼저 나온 테이블 값 우선
+                merged["_고객명"] = merged["_고객명"].where(merged["_고객명"].notna(), merged["_고객명_r"]) if "_고객명" in merged.columns else merged["_고객명_r"]
+                merged = merged.drop(columns=["_고객명_r"])
+        cols_loan = [cid_col] + cols_ai
+        used_tables_columns.append({"table": tname, "columns": cols_loan, "labels": ["연결키"] + cols_ai})
+
+    if merged is None or merged.empty:
         return [], []
 
-    used_tables_columns = []
-    for tname, data in table_dfs.items():
-        cfg = data["cfg"]
-        cid_col = cfg.get("customer_id_column")
-        cols_ai = cfg.get("columns_for_ai") or []
-        cols_loan = [cid_col] + [c for c in cols_ai if c in data["df"].columns]
-        used_tables_columns.append({"table": tname, "columns": cols_loan, "labels": ["연결키"] + cols_ai[: len(cols_loan) - 1]})
-
-    summaries = []
-    for cid in sorted(all_cids, key=lambda x: (str(x), x)):
-        cname = name_by_cid.get(cid, f"고객_{cid}")
-        row = {"고객_ID": cid, "고객명": cname}
-        for tname, data in table_dfs.items():
-            df = data["df"]
-            cfg = data["cfg"]
-            cid_col = cfg.get("customer_id_column")
-            cols_ai = cfg.get("columns_for_ai") or []
-            sub = df[df[cid_col].astype(str) == str(cid)]
-            row[f"{tname}_건수"] = len(sub)
-            for col in cols_ai:
-                if col not in sub.columns:
-                    continue
-                try:
-                    s = sub[col]
-                    if pd.api.types.is_numeric_dtype(s):
-                        row[f"{tname}_{col}"] = pd.to_numeric(s, errors="coerce").sum()
-                    else:
-                        row[f"{tname}_{col}"] = " ".join(s.dropna().astype(str).tolist())[:200]
-                except Exception:
-                    row[f"{tname}_{col}"] = None
-        summaries.append(row)
+    names = merged.pop("_고객명") if "_고객명" in merged.columns else pd.Series(None, index=merged.index, dtype=object)
+    merged.insert(1, "고객명", [str(n) if pd.notna(n) else f"고객_{cid}" for cid, n in zip(merged["고객_ID"], names)])
+    for c, (fill, dtype) in fill_values.items():
+        if c in merged.columns:
+            merged[c] = merged[c].fillna(fill)
+            if dtype is not None:
+                merged[c] = merged[c].astype(dtype)
+    merged = merged.sort_values("고객_ID", kind="stable").reset_index(drop=True)
+    summaries = merged.astype(object).where(merged.notna(), None).to_dict("records")
     return summaries, used_tables_columns
 
 
@@ -1637,17 +1942,21 @@ def _build_customer_summary_from_db():
     """
     DB의 테이블을 분석해 고객별 요약 dict 리스트와 스키마 설명·사용 테이블·컬럼 반환.
     설정(extraction_config.json)이 있으면 해당 테이블·컬럼만 사용; 없으면 기존 자동 감지(고객내역/대출내역 등).
+    테이블별 집계는 aggregate_by_customer(GROUP BY 1회)로 계산하고, 컬럼 판별은 샘플 행만 읽음.
+    DB·설정 파일이 바뀌지 않았으면 결과 캐시에서 반환 (요약 목록은 읽기 전용으로 사용).
     반환: (summaries: list[dict], schema_info: str, used_tables_columns: list[dict])
     """
+    return cached_call(
+        "customer_summary", None, _compute_customer_summary_from_db, _extraction_config_token(), copy_result=False
+    )
+
+
+def _compute_customer_summary_from_db(_config_token=None):
+    """_build_customer_summary_from_db 본체 (캐시 미적중 시 실행)."""
     tables = list_tables()
     if not tables:
         return [], "적재된 테이블 없음", []
-    schema_parts = []
-    for t in tables:
-        df = load_table(t)
-        if df is not None and not df.empty:
-            schema_parts.append(f"{t}({', '.join(df.columns[:8])}{'...' if len(df.columns) > 8 else ''})")
-    schema_info = "; ".join(schema_parts)
+    schema_info = _summary_schema_info(tables)
 
     # 설정에 따라 사용할 테이블·컬럼이 있으면 설정 기반으로 요약 생성
     config_list = _load_extraction_config()
@@ -1659,56 +1968,28 @@ def _build_customer_summary_from_db():
                 return summaries, schema_info, used_tables_columns
             # 설정 테이블 로드 실패 등이면 아래 자동 감지로 fallback
 
+    def _sample(tname):
+        return load_table(tname, limit=_SUMMARY_SAMPLE_ROWS) if tname else None
+
+    def _by_key(agg, key_col):
+        """집계 결과를 {고객키: 행 dict}로."""
+        if agg is None or agg.empty:
+            return {}
+        return dict(zip(agg[key_col].tolist(), agg.to_dict("records")))
+
     table_customer = _resolve_table(tables, "고객내역", "고객")
-    df_customers = load_table(table_customer) if table_customer else None
+    df_customers = _sample(table_customer)
     id_col_cust = _find_col(df_customers, "고객_ID", "customer_id", "id", "ID") if df_customers is not None else None
     name_col_cust = _find_col(df_customers, "고객명", "customer_name", "이름", "name") if df_customers is not None else None
 
-    used_tables_columns = []
-
-    customers = []
-    if df_customers is not None and not df_customers.empty:
-        id_col = id_col_cust or df_customers.columns[0]
-        name_col = name_col_cust or id_col  # 이름 컬럼 없으면 ID로 표시
-        cols_guest = [c for c in [id_col, name_col] if c]
-        labels_guest = ["연결키", "이름(검토)"][: len(cols_guest)]
-        used_tables_columns.append({"table": table_customer or "고객", "columns": cols_guest, "labels": labels_guest})
-        for i in range(len(df_customers)):
-            cid = df_customers[id_col].iloc[i]
-            cname = str(df_customers[name_col].iloc[i])
-            customers.append({"고객_ID": cid, "고객명": cname})
-    else:
-        cids = set()
-        for role, candidates in [
-            ("대출", ["대출내역", "대출"]),
-            ("신용", ["신용정보내역", "고객신용정보내역", "신용"]),
-            ("상담", ["상담내역", "상담"]),
-            ("연체", ["연체"]),
-        ]:
-            tname = _resolve_table(tables, *candidates)
-            if tname is None:
-                continue
-            df = load_table(tname)
-            if df is None or df.empty:
-                continue
-            cid_col = _find_col(df, "고객_ID", "customer_id", "id", "ID")
-            if cid_col is not None:
-                cids.update(df[cid_col].dropna().unique().tolist())
-        for cid in sorted(cids, key=lambda x: (str(x), x)):
-            customers.append({"고객_ID": cid, "고객명": f"고객_{cid}"})
-        if not customers:
-            for i in range(30):
-                customers.append({"고객_ID": i, "고객명": f"고객{i+1} (목업)"})
-
-    summaries = []
     table_loan = _resolve_table(tables, "대출내역", "대출")
     table_credit = _resolve_table(tables, "신용정보내역", "고객신용정보내역", "신용")
     table_consult = _resolve_table(tables, "상담내역", "상담")
     table_overdue = _resolve_table(tables, "연체")
-    df_loan = load_table(table_loan) if table_loan else None
-    df_credit = load_table(table_credit) if table_credit else None
-    df_consult = load_table(table_consult) if table_consult else None
-    df_overdue = load_table(table_overdue) if table_overdue else None
+    df_loan = _sample(table_loan)
+    df_credit = _sample(table_credit)
+    df_consult = _sample(table_consult)
+    df_overdue = _sample(table_overdue)
 
     cid_loan = _find_col(df_loan, "고객_ID", "customer_id", "id") if df_loan is not None else None
     cid_credit = _find_col(df_credit, "고객_ID", "customer_id", "id") if df_credit is not None else None
@@ -1724,6 +2005,41 @@ def _build_customer_summary_from_db():
     if content_col is None and df_consult is not None:
         content_col = _find_first_text_col(df_consult, exclude_cols=[cid_consult] if cid_consult else None)
 
+    loan_by = _by_key(aggregate_by_customer(table_loan, cid_loan, sum_columns=[balance_col] if balance_col else None), cid_loan) if cid_loan else {}
+    agg_credit = aggregate_by_customer(table_credit, cid_credit, last_columns=[score_col] if score_col else None) if cid_credit else None
+    if agg_credit is not None and score_col in agg_credit.columns:
+        agg_credit[score_col] = pd.to_numeric(agg_credit[score_col], errors="coerce")
+    credit_by = _by_key(agg_credit, cid_credit)
+    # 상담 키워드 요약: 전문 검색 색인이 있으면 위험 키워드별 건수, 없으면 상담 내용을 이어 붙임
+    keyword_by = consult_keyword_hits(CONSULT_RISK_TERMS, table_name=table_consult) if table_consult else None
+    text_cols_consult = [content_col] if content_col and keyword_by is None else None
+    consult_by = _by_key(aggregate_by_customer(table_consult, cid_consult, text_columns=text_cols_consult), cid_consult) if cid_consult else {}
+    overdue_by = _by_key(aggregate_by_customer(table_overdue, cid_overdue), cid_overdue) if cid_overdue else {}
+
+    used_tables_columns = []
+
+    customers = []
+    if df_customers is not None and not df_customers.empty:
+        id_col = id_col_cust or df_customers.columns[0]
+        name_col = name_col_cust or id_col  # 이름 컬럼 없으면 ID로 표시
+        cols_guest = [c for c in [id_col, name_col] if c]
+        labels_guest = ["연결키", "이름(검토)"][: len(cols_guest)]
+        used_tables_columns.append({"table": table_customer or "고객", "columns": cols_guest, "labels": labels_guest})
+        agg_cust = aggregate_by_customer(table_customer, id_col, first_columns=[name_col] if name_col != id_col else None)
+        if agg_cust is not None:
+            names = agg_cust[name_col] if name_col in agg_cust.columns else agg_cust[id_col]
+            for cid, cname in zip(agg_cust[id_col].tolist(), names.tolist()):
+                customers.append({"고객_ID": cid, "고객명": str(cname)})
+    else:
+        cids = set()
+        for by in (loan_by, credit_by, consult_by, overdue_by):
+            cids.update(by.keys())
+        for cid in sorted(cids, key=lambda x: (str(x), x)):
+            customers.append({"고객_ID": cid, "고객명": f"고객_{cid}"})
+        if not customers:
+            for i in range(30):
+                customers.append({"고객_ID": i, "고객명": f"고객{i+1} (목업)"})
+
     # 검토 항목(의미) + 실제 컬럼명 — 결과 화면에서 "고객_ID만" 아닌 검토 의미가 보이도록
     if df_loan is not None and (cid_loan or balance_col):
         cols_loan = [cid_loan] if cid_loan else []
@@ -1743,33 +2059,29 @@ def _build_customer_summary_from_db():
     if df_overdue is not None and cid_overdue:
         used_tables_columns.append({"table": table_overdue or "연체", "columns": [cid_overdue], "labels": ["연결키"]})
 
+    summaries = []
     for c in customers:
         cid = c["고객_ID"]
         row = {"고객_ID": cid, "고객명": c["고객명"], "대출_건수": 0, "대출_잔액_합계": 0, "신용점수_최근": None, "상담_건수": 0, "상담_키워드_요약": "", "연체_건수": 0}
-        if df_loan is not None and cid_loan and cid in df_loan[cid_loan].values:
-            sub = df_loan[df_loan[cid_loan] == cid]
-            row["대출_건수"] = len(sub)
-            if balance_col and balance_col in sub.columns:
-                try:
-                    row["대출_잔액_합계"] = pd.to_numeric(sub[balance_col], errors="coerce").sum()
-                except Exception:
-                    pass
-        if df_credit is not None and cid_credit and cid in df_credit[cid_credit].values:
-            sub = df_credit[df_credit[cid_credit] == cid]
-            if score_col and score_col in sub.columns:
-                try:
-                    row["신용점수_최근"] = pd.to_numeric(sub[score_col], errors="coerce").dropna().iloc[-1] if len(sub) else None
-                except Exception:
-                    pass
-        if df_consult is not None and cid_consult and cid in df_consult[cid_consult].values:
-            sub = df_consult[df_consult[cid_consult] == cid]
-            row["상담_건수"] = len(sub)
-            texts = []
-            if content_col and content_col in sub.columns:
-                texts = sub[content_col].dropna().astype(str).tolist()
-            row["상담_키워드_요약"] = " ".join(texts)[:200] if texts else ""
-        if df_overdue is not None and cid_overdue and cid in df_overdue[cid_overdue].values:
-            row["연체_건수"] = len(df_overdue[df_overdue[cid_overdue] == cid])
+        loan = loan_by.get(cid)
+        if loan:
+            row["대출_건수"] = int(loan["_rows"])
+            if balance_col:
+                row["대출_잔액_합계"] = loan.get(balance_col, 0)
+        credit = credit_by.get(cid)
+        if credit and score_col and pd.notna(credit.get(score_col)):
+            row["신용점수_최근"] = credit[score_col]
+        consult = consult_by.get(cid)
+        if consult:
+            row["상담_건수"] = int(consult["_rows"])
+            if keyword_by is not None:
+                hits = keyword_by.get(cid) or keyword_by.get(str(cid)) or {}
+                row["상담_키워드_요약"] = ", ".join(f"{t} {n}건" for t, n in hits.items())
+            elif content_col:
+                row["상담_키워드_요약"] = consult.get(content_col) or ""
+        overdue = overdue_by.get(cid)
+        if overdue:
+            row["연체_건수"] = int(overdue["_rows"])
         summaries.append(row)
     return summaries, schema_info, used_tables_columns
 
@@ -2050,7 +2362,7 @@ def ai_insight_report():
         st.info("조건에 맞는 고객 추출을 실행하면 AI 점수 산출 시 중점 항목 및 사유가 여기에 표시됩니다.")
 
     df = st.session_state.uploaded_data
-    ctx = _data_context(df) if df is not None else {}
+    ctx = _data_context(df, st.session_state.get("uploaded_table"))
     scores = st.session_state.last_scores.copy()
 
 
@@ -2131,11 +2443,13 @@ def customer_detail_page():
     customer_ids = list(range(30))
     tables = list_tables()
     table_customer = _resolve_table(tables, "고객내역", "고객")
-    df_customers = load_table(table_customer) if table_customer else None
+    # 고객 목록은 표시용 이름·ID 컬럼만 읽음 (컬럼은 스키마에서 결정)
+    cust_cols = [c["name"] for c in get_table_schema_with_comments(table_customer)] if table_customer else []
+    name_col = [c for c in cust_cols if "이름" in str(c) or "name" in str(c).lower()][:1]
+    id_col = [c for c in cust_cols if "ID" in str(c) or "id" in str(c).lower()][:1]
+    display_col = name_col[0] if name_col else (cust_cols[0] if cust_cols else None)
+    df_customers = load_table(table_customer, columns=[display_col] + id_col) if display_col else None
     if df_customers is not None and not df_customers.empty:
-        name_col = [c for c in df_customers.columns if "이름" in str(c) or "name" in str(c).lower()][:1]
-        id_col = [c for c in df_customers.columns if "ID" in str(c) or "id" in str(c).lower()][:1]
-        display_col = name_col[0] if name_col else df_customers.columns[0]
         customer_options = [f"{df_customers[display_col].iloc[i]} (행 {i+1})" for i in range(len(df_customers))]
         customer_ids = df_customers[id_col[0]].tolist() if id_col else list(range(len(df_customers)))
 
@@ -2183,34 +2497,48 @@ def customer_detail_page():
     table_loan = _resolve_table(tables, "대출내역", "대출")
     table_credit = _resolve_table(tables, "신용정보내역", "고객신용정보내역", "신용")
     table_consult = _resolve_table(tables, "상담내역", "상담")
-    df_loan = load_table(table_loan) if table_loan else None
-    df_credit = load_table(table_credit) if table_credit else None
-    df_consult = load_table(table_consult) if table_consult else None
+    score_source = None
     if cust_id is not None:
-        loan_cid = [_find_col(df_loan, "customer_id", "고객_ID", "id")] if df_loan is not None else []
-        credit_cid = [_find_col(df_credit, "customer_id", "고객_ID", "id")] if df_credit is not None else []
-        consult_cid = [_find_col(df_consult, "customer_id", "고객_ID", "id")] if df_consult is not None else []
-        loan_cid = [c for c in loan_cid if c]
-        credit_cid = [c for c in credit_cid if c]
-        consult_cid = [c for c in consult_cid if c]
-        if df_loan is not None and loan_cid and cust_id in df_loan[loan_cid[0]].values:
-            sub = df_loan[df_loan[loan_cid[0]] == cust_id]
+        # 선택 고객의 대출/신용/상담 행과 최신 ML 등급을 고객키 인덱스로 조회 (테이블 크기와 무관)
+        detail = get_customer_detail(cust_id, tables=[t for t in (table_loan, table_credit, table_consult) if t])
+        g = detail["grades"]
+        if g:
+            sg = int(g.get("soundness_grade") or 5)
+            scores = {"수익성": int(g.get("profit_grade") or 5) * 10, "건전성": sg * 10, "리스크": (11 - sg) * 10}
+            grade = g.get("SEGMENT_NM") or g.get("marketing_group") or grade
+            score_source = f"ML 실행 {detail['run_key']} 등급 기준 (수익성·건전성 = 등급×10, 리스크 = 건전성 등급 역순) · 조회 {detail['elapsed_ms']:.0f}ms"
+
+        def _cust_rows(tname, limit):
+            """고객키로 조회된 최근 행. 고객키로 인식되지 않는 테이블은 ID 후보 컬럼으로 SQLite 필터."""
+            if tname in detail["tables"]:
+                return detail["tables"][tname].tail(limit), [detail["key_columns"][tname]]
+            cols = [c["name"] for c in get_table_schema_with_comments(tname)] if tname else []
+            cid = _find_col_name(cols, "customer_id", "고객_ID", "id")
+            if not cid:
+                return None, []
+            return load_table(tname, limit=limit, where=[(cid, "=", cust_id)], compact=True), [cid]
+
+        df_loan, loan_cid = _cust_rows(table_loan, 12)
+        df_credit, credit_cid = _cust_rows(table_credit, 12)
+        df_consult, consult_cid = _cust_rows(table_consult, 10)
+        if df_loan is not None and loan_cid:
+            sub = df_loan
             num_cols = sub.select_dtypes(include=["number"]).columns.tolist()
             if num_cols:
                 n = min(12, len(sub))
                 loan_balance = sub.iloc[:n][num_cols[0]].tolist()
                 if len(loan_balance) < 12:
                     loan_balance = loan_balance + [loan_balance[-1] if loan_balance else 0] * (12 - len(loan_balance))
-        if df_credit is not None and credit_cid and cust_id in df_credit[credit_cid[0]].values:
-            sub = df_credit[df_credit[credit_cid[0]] == cust_id]
+        if df_credit is not None and credit_cid:
+            sub = df_credit
             num_cols = sub.select_dtypes(include=["number"]).columns.tolist()
             if num_cols:
                 n = min(12, len(sub))
                 credit_score = sub.iloc[:n][num_cols[0]].tolist()
                 if len(credit_score) < 12:
                     credit_score = credit_score + [credit_score[-1] if credit_score else 700] * (12 - len(credit_score))
-        if df_consult is not None and consult_cid and cust_id in df_consult[consult_cid[0]].values:
-            sub = df_consult[df_consult[consult_cid[0]] == cust_id].head(10)
+        if df_consult is not None and consult_cid:
+            sub = df_consult.iloc[::-1]  # 최근 상담 먼저
             text_cols = [c for c in sub.columns if c != consult_cid[0]][:3]
             consultations = []
             for _, row in sub.iterrows():
@@ -2228,6 +2556,8 @@ def customer_detail_page():
         st.metric("건전성", f"{scores['건전성']}점", help="DSR·연체 전이율·신용 추이 등")
     with c3:
         st.metric("리스크", f"{scores['리스크']}점", help="부도율·상담 키워드 리스크 등")
+    if score_source:
+        st.caption(score_source)
 
     # 점수 산출 항목·이유 (수익성 / 건전성 / 리스크) — 선택한 고객의 실제 점수에 따라 문구 변경
     st.markdown("---")
@@ -2292,9 +2622,18 @@ def customer_detail_page():
         notable_items = []
     else:
         notable_items = [notable_pool[(selected_idx + i) % len(notable_pool)] for i in range(min(n_notable, 2))]
+    # 상담 전문 검색 색인이 있으면 선택 고객의 위험 키워드 언급을 맨 앞에 (원문 스니펫 포함)
+    risk_hits = consult_keyword_hits(CONSULT_RISK_TERMS, customers=[cust_id], table_name=table_consult) if cust_id is not None and table_consult else None
+    risk_hits = next(iter(risk_hits.values()), {}) if risk_hits else {}
+    if risk_hits:
+        summary = ", ".join(f"'{t}' {n}회" for t, n in risk_hits.items())
+        notable_items = [f"상담 이력에서 위험 키워드 {summary} 출현."] + notable_items
     if notable_items:
         for i, text in enumerate(notable_items, 1):
             st.markdown(f"- **{i}.** {text}")
+        if risk_hits:
+            for hit in search_consult(list(risk_hits), customer=cust_id, limit=3, table_name=table_consult):
+                st.caption(f"💬 {hit['snippet']}")
         st.caption("위 항목은 해당 고객 분석 시 도출된 특이 사항입니다. 필요 시 상담·추가 검토를 권장합니다.")
     else:
         st.info("이번 분석에서 **특이 사항은 없습니다.** 수익성·건전성·리스크 지표 모두 정상 범위 내로 판단됩니다.")
@@ -2862,68 +3201,16 @@ def _segment_customer_count_and_query(selections: list[dict]):
             by_table[t] = []
         by_table[t].append((c, iv))
 
-    query_parts = []
-    filtered_dfs = []
-    join_key_candidates = ["customer_id", "고객_id", "고객_ID", "id"]
-
-    for tname, cols_intervals in by_table.items():
-        if tname not in tables:
-            query_parts.append(f"-- 테이블 '{tname}' 없음")
-            continue
-        df = load_table(tname)
-        if df is None or df.empty:
-            query_parts.append(f"-- '{tname}' 데이터 없음")
-            continue
-        mask = pd.Series(True, index=df.index)
-        conds = []
-        for col, iv in cols_intervals:
-            if col not in df.columns:
-                conds.append(f"  {col} (컬럼 없음)")
-                continue
-            if "low" in iv and "high" in iv:
-                try:
-                    lo, hi = float(iv["low"]), float(iv["high"])
-                    mask = mask & (df[col].astype(float, errors="ignore") >= lo) & (df[col].astype(float, errors="ignore") <= hi)
-                    conds.append(f"  \"{tname}\".\"{col}\" BETWEEN {lo} AND {hi}")
-                except (TypeError, ValueError):
-                    conds.append(f"  \"{tname}\".\"{col}\" (구간 파싱 실패)")
-            elif "value" in iv:
-                val = iv["value"]
-                mask = mask & (df[col].astype(str) == str(val))
-                conds.append(f"  \"{tname}\".\"{col}\" = '{val}'")
-            else:
-                conds.append(f"  \"{tname}\".\"{col}\" (조건 없음)")
-        df_filtered = df.loc[mask]
-        filtered_dfs.append((tname, df_filtered))
-        query_parts.append(f"SELECT * FROM \"{tname}\" WHERE\n" + " AND\n".join(conds))
-
-    if not filtered_dfs:
-        return 0, "\n\n".join(query_parts) if query_parts else "-- 적용 가능한 조건 없음"
-
-    # 단일 테이블
-    if len(filtered_dfs) == 1:
-        _, df_one = filtered_dfs[0]
-        cnt = len(df_one)
-        return cnt, query_parts[0] + f"\n\n-- 결과: {cnt}건"
-
-    # 다중 테이블: 공통 키로 조인
-    join_key = None
-    for k in join_key_candidates:
-        if all(k in df.columns for _, df in filtered_dfs):
-            join_key = k
-            break
-    if join_key is None:
-        # 첫 테이블 건수만 사용
-        cnt = len(filtered_dfs[0][1])
-        full_query = "\n\n-- 다중 테이블(조인 키 미검출). 첫 테이블 기준 건수.\n\n" + "\n\n".join(query_parts) + f"\n\n-- 첫 테이블 결과: {cnt}건"
-        return cnt, full_query
-
-    merged = filtered_dfs[0][1][[join_key]].drop_duplicates()
-    for _, df in filtered_dfs[1:]:
-        merged = merged.merge(df[[join_key]].drop_duplicates(), on=join_key, how="inner")
-    cnt = len(merged)
-    full_query = f"-- 조인 키: {join_key}\n\n" + "\n\n".join(query_parts) + f"\n\n-- INNER JOIN 결과: {cnt}건"
-    return cnt, full_query
+    # 조건을 파라미터 SQL로 만들어 SQLite에서 실행 (테이블 로드 없음). 표시 쿼리는 실제 실행한 SQL 그대로
+    res = count_segment_customers(by_table)
+    lines = [f"-- {n}" for n in res["notes"]]
+    if not res["sql"]:
+        return 0, "\n".join(lines) if lines else "-- 적용 가능한 조건 없음"
+    if res["join_key"]:
+        lines.append(f"-- 조인 키: {res['join_key']} (테이블별 DISTINCT 키 INTERSECT)")
+    lines.append(format_sql_with_params(res["sql"], res["params"]) + ";")
+    lines.append(f"-- 결과: {res['count']:,}건 · 실행 시간 {res['elapsed_ms']:,.1f} ms")
+    return res["count"], "\n".join(lines)
 
 
 def _build_seg_code_and_digit_info(selections: list[dict]) -> tuple[str, list[dict]]:
@@ -2954,7 +3241,7 @@ def _build_seg_code_and_digit_info(selections: list[dict]) -> tuple[str, list[di
 @st.dialog("세그 쿼리 보기")
 def _show_segment_query_dialog_inline():
     query_text = st.session_state.get("segment_query_to_show", "") or "(없음)"
-    st.caption("이 세그의 고객 건수 계산에 사용된 조건(쿼리)입니다.")
+    st.caption("이 세그의 고객 건수 계산에 실제 실행된 SQL과 실행 시간입니다.")
     try:
         q_b64 = base64.b64encode(query_text.encode("utf-8")).decode("ascii")
     except Exception:
@@ -3154,6 +3441,9 @@ def run():
         else:
             with st.expander("AI 연동 안내"):
                 st.caption("OPENAI_API_KEY 환경변수를 설정하면 대시보드 요약·Reasoning·비교 분석을 AI가 생성합니다.")
+        schema_error = get_schema_error()
+        if schema_error:
+            st.error(f"DB 스키마 마이그레이션 실패: {schema_error}")
         st.markdown("---")
         # API 호출 후 rate limit 헤더 표시 (B 방식: 사이드바, 세션에 저장된 값 우선)
         h = st.session_state.get("last_rate_limit_headers") or get_last_rate_limit_headers()
@@ -3174,6 +3464,20 @@ def run():
                     "AI 호출 **성공** 시 여기에 표시됩니다. "
                     "한도 초과(429)로 실패한 경우에는 응답 헤더를 읽을 수 없어 표시되지 않습니다."
                 )
+        cs = get_result_cache_stats()
+        with st.expander("🗄️ 조회 캐시"):
+            st.caption(f"적중 {cs['hits']:,} / 미스 {cs['misses']:,} (적중률 {cs['hit_rate']:.0%})")
+            st.caption(
+                f"항목 {cs['entries']:,}개 · {cs['bytes'] / 1048576:.1f}MB / {cs['max_bytes'] / 1048576:.0f}MB · 제거 {cs['evictions']:,}"
+            )
+            if st.button("캐시 비우기", key="sidebar_clear_result_cache"):
+                clear_result_cache()
+                st.rerun()
+        ae = get_analytic_engine_info()
+        if ae["engine"] == "duckdb":
+            st.caption(
+                f"분석 엔진: DuckDB ({ae['mode'] or '대기'}) · 조회 {ae['queries']:,} · SQLite 대체 {ae['fallbacks']:,}"
+            )
 
     if menu == "홈 (대시보드)":
         main_dashboard()
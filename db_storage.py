@@ -10,11 +10,25 @@
 - 인식성: 약어보다 풀네임 권장, 복수는 단수 테이블명 (예: customers → customer)
 """
 
+import contextlib
+import copy
+import functools
+import io
+import json
+import multiprocessing
+import os
 import re
+import shutil
 import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
 import pandas as pd
+import numpy as np
 
 # 프로젝트 루트 기준 data/crm.db
 DB_DIR = Path(__file__).resolve().parent / "data"
@@ -23,8 +37,15 @@ META_TABLE = "_crm_tables"  # 적재된 테이블명 목록 저장
 TABLE_COMMENT_TABLE = "_table_comment"   # 테이블 한글명 (table_name, name_ko)
 COLUMN_COMMENT_TABLE = "_column_comment"  # 컬럼 한글명 (table_name, column_name, name_ko)
 COLUMN_MIN_MAX_TABLE = "_column_min_max"   # 컬럼 min/max (table_name, column_name, min_val, max_val)
+COLUMN_PROFILE_TABLE = "_column_profile"   # 적재 시 갱신되는 컬럼 통계 (건수·결측·min/max·합계·근사 유일값)
+CHANGE_LOG_TABLE = "_change_log"   # 테이블별 변경 행 구간 (version, table_name, op, rowid_from, rowid_to, row_count)
+QUARANTINE_TABLE = "_upload_quarantine"  # 적재 전 검증에서 걸러진 행 (table_name, row_no, errors, row_data)
+PARTITION_CATALOG_TABLE = "_partition_catalog"  # BASE_YM 파티션별 행 수 (table_name, part_value, row_count)
+TEXT_INDEX_CATALOG_TABLE = "_text_index_catalog"  # 상담 전문 검색 색인 (table_name, customer_col, text_cols, version)
 ERD_JSON_PATH = DB_DIR / "erd_tables.json"  # ERD 시각화 연동용
+ML_RESULTS_TABLE = "ML_CRM_RESULTS"    # RUN_KEY + CSTNO별 등급·우선순위 점수
 ML_SEGMENTS_TABLE = "ML_CRM_SEGMENTS"  # RUN_KEY + SEGMENT_CD 키, 범주 요약·해석
+ML_RUNS_TABLE = "ML_CRM_RUNS"          # RUN_KEY별 실행 메타데이터 (건수·생성 일시·원천 테이블) — 결과 행마다 반복하지 않음
 
 # ---- 앱에서 사용하는 표준 테이블/컬럼명 (영문, snake_case) ----
 TABLE_CONDITION_EXTRACT_RESULT = "condition_extract_result"
@@ -50,11 +71,89 @@ COL_UPDATED_BY = "updated_by"
 COL_AI_REASONING = "ai_reasoning"
 COL_CRITERIA_ID = "criteria_id"
 
+# ---- SQLite 연결 PRAGMA 프로파일 (연결마다 최초 1회 적용) ----
+# WAL: 적재(쓰기) 중에도 조회가 막히지 않음. synchronous=NORMAL: WAL에서는 커밋마다 fsync 생략해도 안전.
+SQLITE_PRAGMAS = {
+    "auto_vacuum": "INCREMENTAL",  # 새 DB 파일에만 적용 (기존 DB는 incremental_vacuum(convert=True)로 한 번 전환)
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,       # 음수 = KiB 단위 → 64MB 페이지 캐시
+    "mmap_size": 268435456,     # 256MB 메모리 맵 I/O
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # 쓰기 잠금 대기(ms) — 동시 업로드 시 즉시 'database is locked' 방지
+    "analysis_limit": 1000,     # ANALYZE 시 인덱스당 표본 행 수 상한 (대용량 테이블도 빠르게 통계 갱신)
+}
+
+_local = threading.local()  # 스레드당 연결 1개 (Streamlit 세션 스레드별)
+_pragma_generation = 0      # set_pragma_profile 호출 시 증가 → 각 스레드가 다음 사용 시 재연결
+_schema_ready: set[str] = set()  # 마이그레이션 완료된 DB 경로
+_schema_errors: dict[str, str] = {}  # 마이그레이션 실패한 DB 경로 → 오류 (연결마다 재시도하지 않음, get_schema_error로 노출)
+_schema_lock = threading.Lock()
+
 
 def _ensure_dir():
     DB_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def set_pragma_profile(**pragmas) -> dict:
+    """
+    연결 PRAGMA 프로파일 변경 (예: set_pragma_profile(cache_size=-131072, mmap_size=0)).
+    값이 None이면 해당 PRAGMA 제거. 이미 열린 연결은 각 스레드가 다음 조회 시 새 프로파일로 재연결.
+    반환: 적용 후 프로파일
+    """
+    global _pragma_generation
+    for k, v in pragmas.items():
+        if v is None:
+            SQLITE_PRAGMAS.pop(k, None)
+        else:
+            SQLITE_PRAGMAS[k] = v
+    _pragma_generation += 1
+    return dict(SQLITE_PRAGMAS)
+
+
+def _apply_pragmas(conn: sqlite3.Connection):
+    """SQLITE_PRAGMAS를 연결에 적용. 지원하지 않는 PRAGMA는 무시."""
+    for name, value in SQLITE_PRAGMAS.items():
+        try:
+            conn.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.Error:
+            pass
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    현재 스레드 전용 SQLite 연결 반환 (없으면 생성 후 PRAGMA 프로파일 적용).
+    호출 측에서 close()하지 않음. 쓰기는 write_transaction 블록으로 커밋/롤백.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and (_local.path != str(DB_PATH) or _local.generation != _pragma_generation):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        conn = None
+    if conn is None:
+        _ensure_dir()
+        conn = sqlite3.connect(DB_PATH)
+        _apply_pragmas(conn)
+        _local.conn = conn
+        _local.path = str(DB_PATH)
+        _local.generation = _pragma_generation
+    _ensure_schema(conn)
+    return conn
+
+
+def close_connection():
+    """현재 스레드의 연결 닫기 (DB 파일 교체·삭제 전 등)."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
 def _sanitize_table_name(name: str) -> str:
     """테이블명을 DB 저장용으로 정리 (공백·특수문자 → _). 신규 테이블은 영문 snake_case 사용 권장."""
     if not name or not name.strip():
@@ -79,16 +178,22 @@ def get_db_path():
     return str(DB_PATH)
 
 
-def _ensure_meta(conn: sqlite3.Connection):
-    """메타 테이블 생성 (저장된 테이블명 목록)"""
-    conn.execute(
-        f"CREATE TABLE IF NOT EXISTS {META_TABLE} (name TEXT PRIMARY KEY)"
-    )
-    conn.commit()
+# ---- 스키마 마이그레이션 (PRAGMA user_version 기준, 프로세스·DB 파일당 1회) ----
+# 조회 경로에서는 DDL을 실행하지 않음. 메타/결과 테이블 정의 변경 시 아래 목록 끝에 새 버전을 추가.
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: list[tuple[str, str]]):
+    """기존 DB 호환: table에 없는 컬럼만 ALTER TABLE ADD COLUMN."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()}
+    if not existing:
+        return
+    for col, typ in columns:
+        if col not in existing:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" {typ}')
 
 
-def _ensure_comment_tables(conn: sqlite3.Connection):
-    """테이블/컬럼 한글명 저장용 메타 테이블 생성"""
+def _migration_1_meta_tables(conn: sqlite3.Connection):
+    """메타 테이블: 적재 테이블 목록, 테이블/컬럼 한글명, 컬럼 min/max."""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (name TEXT PRIMARY KEY)")
     conn.execute(
         f"""CREATE TABLE IF NOT EXISTS {TABLE_COMMENT_TABLE} (
             table_name TEXT PRIMARY KEY,
@@ -109,22 +214,15 @@ def _ensure_comment_tables(conn: sqlite3.Connection):
             PRIMARY KEY (table_name, column_name)
         )"""
     )
-    # 기존 DB: 새 컬럼이 없으면 추가
-    cur = conn.execute(f"PRAGMA table_info({COLUMN_COMMENT_TABLE})")
-    cols = [row[1] for row in cur.fetchall()]
-    for new_col, typ in (
+    # 예전 버전(ml_crm_rf 등)에서 (table_name, column_name, name_ko)만으로 만든 경우
+    _add_missing_columns(conn, COLUMN_COMMENT_TABLE, [
         ("data_type", "TEXT"),
         ("data_length", "TEXT"),
         ("scale_val", "TEXT"),
         ("pk", "TEXT"),
         ("null_yn", "TEXT"),
         ("default_val", "TEXT"),
-    ):
-        if new_col not in cols:
-            try:
-                conn.execute(f"ALTER TABLE {COLUMN_COMMENT_TABLE} ADD COLUMN {new_col} {typ}")
-            except Exception:
-                pass
+    ])
     conn.execute(
         f"""CREATE TABLE IF NOT EXISTS {COLUMN_MIN_MAX_TABLE} (
             table_name TEXT,
@@ -134,7 +232,653 @@ def _ensure_comment_tables(conn: sqlite3.Connection):
             PRIMARY KEY (table_name, column_name)
         )"""
     )
-    conn.commit()
+    # 예전 버전에서 uploaded_data 단일 테이블만 있던 경우 목록에 등록
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='uploaded_data'").fetchone():
+        conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (name) VALUES ('uploaded_data')")
+
+
+def _migration_2_extraction_tables(conn: sqlite3.Connection):
+    """조회 조건·조회 결과 테이블 (감사 컬럼 포함) 생성 후 목록(_crm_tables)에 등록."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_EXTRACTION_CRITERIA} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {COL_CREATED_DATE} TEXT,
+            {COL_CREATED_TIME} TEXT,
+            {COL_CREATED_BY} TEXT,
+            {COL_UPDATED_DATE} TEXT,
+            {COL_UPDATED_TIME} TEXT,
+            {COL_UPDATED_BY} TEXT,
+            {COL_CRITERIA_PROFITABILITY_MIN} INTEGER,
+            {COL_CRITERIA_SOUNDNESS_MIN} INTEGER,
+            {COL_CRITERIA_RISK_MAX} INTEGER
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_EXTRACTION_RESULT} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {COL_CRITERIA_ID} INTEGER NOT NULL REFERENCES {TABLE_EXTRACTION_CRITERIA}(id),
+            {COL_CREATED_DATE} TEXT,
+            {COL_CREATED_TIME} TEXT,
+            {COL_CREATED_BY} TEXT,
+            {COL_UPDATED_DATE} TEXT,
+            {COL_UPDATED_TIME} TEXT,
+            {COL_UPDATED_BY} TEXT,
+            {COL_CUSTOMER_ID} TEXT,
+            {COL_CUSTOMER_NAME} TEXT,
+            {COL_PROFITABILITY_SCORE} INTEGER,
+            {COL_SOUNDNESS_SCORE} INTEGER,
+            {COL_RISK_SCORE} INTEGER,
+            {COL_AI_REASONING} TEXT
+        )
+    """)
+    for name in (TABLE_EXTRACTION_CRITERIA, TABLE_EXTRACTION_RESULT):
+        conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (name) VALUES (?)", (name,))
+
+
+def _migration_3_ml_tables(conn: sqlite3.Connection):
+    """ML 등급 결과·범주 요약 테이블. CSTNO는 원본 타입(정수/문자) 그대로 저장되도록 타입 미지정."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {ML_RESULTS_TABLE} (
+            RUN_KEY TEXT,
+            CSTNO,
+            profit_grade INTEGER,
+            soundness_grade INTEGER,
+            handling_grade INTEGER,
+            priority_score REAL,
+            marketing_group TEXT,
+            SEGMENT_CD TEXT,
+            CREATED_DATE TEXT,
+            CREATED_TIME TEXT
+        )"""
+    )
+    # 예전 버전에서 RUN_KEY 등 없이 만들어진 결과 테이블
+    _add_missing_columns(conn, ML_RESULTS_TABLE, [
+        ("RUN_KEY", "TEXT"),
+        ("CREATED_DATE", "TEXT"),
+        ("CREATED_TIME", "TEXT"),
+        ("SEGMENT_CD", "TEXT"),
+    ])
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {ML_SEGMENTS_TABLE} (
+            RUN_KEY TEXT NOT NULL,
+            SEGMENT_CD TEXT NOT NULL,
+            SEGMENT_NM TEXT,
+            CNT INTEGER,
+            AVG_PROFIT_GRADE REAL,
+            AVG_SOUNDNESS_GRADE REAL,
+            AVG_HANDLING_GRADE REAL,
+            AVG_PRIORITY_SCORE REAL,
+            SEGMENT_INTERPRETATION TEXT,
+            CREATED_DATE TEXT,
+            CREATED_TIME TEXT,
+            PRIMARY KEY (RUN_KEY, SEGMENT_CD)
+        )"""
+    )
+
+
+def _migration_4_column_profile(conn: sqlite3.Connection):
+    """컬럼 프로파일: 적재 경로에서 배치마다 누적 갱신. sketch는 HyperLogLog 레지스터(BLOB, 병합 가능)."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {COLUMN_PROFILE_TABLE} (
+            table_name TEXT,
+            column_name TEXT,
+            row_count INTEGER,
+            null_count INTEGER,
+            numeric_count INTEGER,
+            min_num REAL,
+            max_num REAL,
+            sum_num REAL,
+            sumsq_num REAL,
+            min_text TEXT,
+            max_text TEXT,
+            sketch BLOB,
+            exact INTEGER,
+            PRIMARY KEY (table_name, column_name)
+        )"""
+    )
+
+
+def _migration_5_key_indexes(conn: sqlite3.Connection):
+    """기존 적재 테이블에 고객키·BASE_YM 인덱스 추가."""
+    for (name,) in conn.execute(f"SELECT name FROM {META_TABLE}").fetchall():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone():
+            ensure_key_indexes(conn, name)
+
+
+def _migration_6_change_log(conn: sqlite3.Connection):
+    """변경 로그: 쓰기 함수가 같은 트랜잭션에서 rowid 구간 단위로 기록. version은 재사용되지 않음(AUTOINCREMENT)."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            rowid_from INTEGER,
+            rowid_to INTEGER,
+            row_count INTEGER,
+            changed_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )"""
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "ix_{CHANGE_LOG_TABLE}_table" ON {CHANGE_LOG_TABLE} (table_name, version)'
+    )
+
+
+def _migration_7_upload_quarantine(conn: sqlite3.Connection):
+    """적재 격리 테이블: 검증 위반 행을 원본 값(JSON)·위반 사유와 함께 보관."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {QUARANTINE_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_no INTEGER,
+            errors TEXT,
+            row_data TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )"""
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "ix_{QUARANTINE_TABLE}_table" ON {QUARANTINE_TABLE} (table_name, id)'
+    )
+
+
+def _migration_8_partition_catalog(conn: sqlite3.Connection):
+    """파티션 카탈로그: 테이블별 BASE_YM 값마다 행 수. part_value는 선언 타입 없음(저장된 값 타입 그대로). 기존 테이블은 GROUP BY로 채움."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {PARTITION_CATALOG_TABLE} (
+            table_name TEXT NOT NULL,
+            partition_col TEXT NOT NULL,
+            part_value NOT NULL,
+            row_count INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+            PRIMARY KEY (table_name, part_value)
+        )"""
+    )
+    for (name,) in conn.execute(f"SELECT name FROM {META_TABLE}").fetchall():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone():
+            _recount_partitions(conn, name)
+
+
+def _migration_9_ml_run_catalog(conn: sqlite3.Connection):
+    """ML 실행 카탈로그 + 결과 (RUN_KEY, CSTNO) 인덱스. 기존 결과는 RUN_KEY별로 묶어 카탈로그에 채움."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {ML_RUNS_TABLE} (
+            RUN_KEY TEXT PRIMARY KEY,
+            ROW_CNT INTEGER,
+            SOURCE_TABLES TEXT,
+            CREATED_DATE TEXT,
+            CREATED_TIME TEXT
+        )"""
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "ix_{ML_RESULTS_TABLE}_RUN_KEY_CSTNO" ON {ML_RESULTS_TABLE} (RUN_KEY, CSTNO)'
+    )
+    conn.execute(
+        f"""INSERT OR IGNORE INTO {ML_RUNS_TABLE} (RUN_KEY, ROW_CNT, CREATED_DATE, CREATED_TIME)
+            SELECT RUN_KEY, COUNT(*), MIN(CREATED_DATE), MIN(CREATED_TIME)
+            FROM {ML_RESULTS_TABLE} WHERE RUN_KEY IS NOT NULL GROUP BY RUN_KEY"""
+    )
+
+
+def _migration_10_text_index_catalog(conn: sqlite3.Connection):
+    """상담 전문 검색(FTS5) 색인 카탈로그. 색인 자체는 sync_consult_index가 처음 동기화할 때 만듦."""
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {TEXT_INDEX_CATALOG_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            customer_col TEXT,
+            text_cols TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )"""
+    )
+
+
+def _migration_11_ml_result_created_at(conn: sqlite3.Connection):
+    """생성 일시 없이 저장됐던 ML_CRM_RESULTS 행을 실행 카탈로그(ML_CRM_RUNS) 값으로 채움."""
+    conn.execute(
+        f"""UPDATE {ML_RESULTS_TABLE} SET
+                CREATED_DATE = (SELECT r.CREATED_DATE FROM {ML_RUNS_TABLE} r WHERE r.RUN_KEY = {ML_RESULTS_TABLE}.RUN_KEY),
+                CREATED_TIME = (SELECT r.CREATED_TIME FROM {ML_RUNS_TABLE} r WHERE r.RUN_KEY = {ML_RESULTS_TABLE}.RUN_KEY)
+            WHERE CREATED_DATE IS NULL AND RUN_KEY IN (SELECT RUN_KEY FROM {ML_RUNS_TABLE})"""
+    )
+
+
+
+# (버전, 적용 함수) — 버전은 1부터 증가. 이미 배포된 항목은 수정하지 말고 새 버전으로 추가.
+_MIGRATIONS = [
+    (1, _migration_1_meta_tables),
+    (2, _migration_2_extraction_tables),
+    (3, _migration_3_ml_tables),
+    (4, _migration_4_column_profile),
+    (5, _migration_5_key_indexes),
+    (6, _migration_6_change_log),
+    (7, _migration_7_upload_quarantine),
+    (8, _migration_8_partition_catalog),
+    (9, _migration_9_ml_run_catalog),
+    (10, _migration_10_text_index_catalog),
+    (11, _migration_11_ml_result_created_at),
+]
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+# 마이그레이션이 관리하는 테이블 — 삭제(clear_table 등) 시 재생성 대상
+_MANAGED_TABLES = {
+    META_TABLE, TABLE_COMMENT_TABLE, COLUMN_COMMENT_TABLE, COLUMN_MIN_MAX_TABLE, COLUMN_PROFILE_TABLE,
+    CHANGE_LOG_TABLE, QUARANTINE_TABLE, PARTITION_CATALOG_TABLE, TABLE_EXTRACTION_CRITERIA,
+    TABLE_EXTRACTION_RESULT, ML_RESULTS_TABLE, ML_SEGMENTS_TABLE, ML_RUNS_TABLE, TEXT_INDEX_CATALOG_TABLE,
+}
+
+
+def migrate_schema(conn: sqlite3.Connection | None = None) -> int:
+    """
+    PRAGMA user_version이 SCHEMA_VERSION보다 낮으면 남은 마이그레이션을 한 트랜잭션으로 적용.
+    BEGIN IMMEDIATE로 다른 프로세스와 동시 적용을 막고, 잠금 획득 후 버전을 다시 읽음.
+    반환: 적용 후 스키마 버전
+    """
+    conn = conn or get_connection()
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current >= SCHEMA_VERSION:
+        return current
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, migrate in _MIGRATIONS:
+            if version > current:
+                migrate(conn)
+                current = version
+        conn.execute(f"PRAGMA user_version = {int(current)}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_metadata_catalog()
+    _schema_errors.pop(str(DB_PATH), None)
+    return current
+
+
+def _ensure_schema(conn: sqlite3.Connection):
+    """
+    프로세스에서 DB 파일별 최초 연결 시 1회 migrate_schema 실행.
+    실패하면 오류를 stderr에 한 번 남기고 _schema_errors에 보관 (연결마다 BEGIN IMMEDIATE로 재시도하지 않음).
+    명시적으로 migrate_schema()를 다시 호출해 성공하면 오류가 지워짐.
+    """
+    path = str(DB_PATH)
+    if path in _schema_ready or path in _schema_errors:
+        return
+    with _schema_lock:
+        if path in _schema_ready or path in _schema_errors:
+            return
+        try:
+            migrate_schema(conn)
+            _schema_ready.add(path)
+        except Exception as e:
+            _schema_errors[path] = f"{type(e).__name__}: {e}"
+            print(f"[db_storage] 스키마 마이그레이션 실패 ({path}): {_schema_errors[path]}", file=sys.stderr)
+
+
+def get_schema_error() -> str | None:
+    """현재 DB의 스키마 마이그레이션 실패 메시지 (성공했거나 DB가 없으면 None). 아직 연결 전이면 연결해 확인."""
+    if not DB_PATH.exists():
+        return None
+    if str(DB_PATH) not in _schema_ready:
+        try:
+            get_connection()
+        except Exception as e:
+            return str(e)
+    return _schema_errors.get(str(DB_PATH))
+
+
+def _remigrate_if_managed(conn: sqlite3.Connection, dropped: list[str]):
+    """마이그레이션 관리 테이블이 삭제됐으면 user_version을 되돌려 재생성."""
+    if not any(t in _MANAGED_TABLES for t in dropped):
+        return
+    conn.execute("PRAGMA user_version = 0")
+    migrate_schema(conn)
+
+
+# ---- 메타데이터 카탈로그 (프로세스 공용 메모리 캐시) ----
+# 테이블 목록·한글명·컬럼 정의·min/max·PRAGMA table_info를 한 번에 읽어 두고 조회는 메모리에서 처리.
+# 이 모듈의 DDL/메타 쓰기 함수는 invalidate_metadata_catalog()를 호출하고,
+# 외부 연결(다른 프로세스·DB 도구)의 커밋은 PRAGMA data_version 변화로 감지해 다시 읽음 (_external_write_epoch).
+
+class MetadataCatalog:
+    """DB 메타데이터 스냅샷. snapshot()은 무효화된 경우에만 DB를 다시 읽음."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (스냅샷, DB 경로, 외부 쓰기 epoch) — 한 속성으로 교체해 잠금 없이 읽어도 세 값이 어긋나지 않음
+        self._state: tuple[dict, str, int] | None = None
+        self._extra_info: dict[str, list[tuple]] = {}  # 목록 밖 테이블 table_info (현재 스냅샷 전용, _lock으로 보호)
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+            self._extra_info = {}
+
+    def _load(self, conn: sqlite3.Connection) -> dict:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+        registered = [row[0] for row in conn.execute(f"SELECT name FROM {META_TABLE} ORDER BY name").fetchall()]
+        tables = sorted(n for n in registered if n in existing)
+        table_comments = {
+            row[0]: row[1]
+            for row in conn.execute(f"SELECT table_name, name_ko FROM {TABLE_COMMENT_TABLE}").fetchall()
+            if row[1]
+        }
+        columns: dict[str, dict[str, dict]] = {}
+        cur = conn.execute(
+            f"""SELECT table_name, column_name, name_ko, data_type, data_length, scale_val, pk, null_yn, default_val
+                FROM {COLUMN_COMMENT_TABLE}"""
+        )
+        for t, c, ko, dt, dl, sv, pk, nn, dv in cur.fetchall():
+            columns.setdefault(t, {})[c] = {
+                "name_ko": ko, "data_type": dt, "data_length": dl, "scale_val": sv,
+                "pk": pk, "null_yn": nn, "default_val": dv,
+            }
+        min_max: dict[str, dict[str, dict]] = {}
+        for t, c, mn, mx in conn.execute(
+            f"SELECT table_name, column_name, min_val, max_val FROM {COLUMN_MIN_MAX_TABLE}"
+        ).fetchall():
+            min_max.setdefault(t, {})[c] = {"min": mn, "max": mx}
+        table_info = {t: conn.execute(f'PRAGMA table_info("{t}")').fetchall() for t in tables}
+        return {
+            "tables": tables,
+            "existing": existing,
+            "table_comments": table_comments,
+            "columns": columns,
+            "min_max": min_max,
+            "table_info": table_info,
+        }
+
+    def snapshot(self) -> dict:
+        """현재 메타데이터 스냅샷 (읽기 전용, 공개 후에는 수정하지 않음). 오류 시 예외 전파."""
+        conn = get_connection()
+        path = str(DB_PATH)
+        epoch = _external_write_epoch()
+        state = self._state
+        if state is not None and state[1] == path and state[2] == epoch:
+            return state[0]
+        with self._lock:
+            state = self._state
+            if state is None or state[1] != path or state[2] != epoch:
+                state = self._state = (self._load(conn), path, epoch)
+                self._extra_info = {}
+            return state[0]
+
+    def table_info(self, table_name: str) -> list[tuple]:
+        """PRAGMA table_info 결과. 목록(_crm_tables)에 없는 테이블은 최초 조회 후 별도 캐시(_extra_info)에 보관."""
+        data = self.snapshot()
+        rows = data["table_info"].get(table_name)
+        if rows is not None:
+            return rows
+        if table_name not in data["existing"]:
+            return []
+        with self._lock:
+            current = self._state is not None and self._state[0] is data
+            rows = self._extra_info.get(table_name) if current else None
+        if rows is None:
+            rows = get_connection().execute(f'PRAGMA table_info("{table_name}")').fetchall()
+            with self._lock:
+                # 그 사이 스냅샷이 바뀌었으면 보관하지 않음 (새 스냅샷 기준으로 다시 조회)
+                if self._state is not None and self._state[0] is data:
+                    self._extra_info[table_name] = rows
+        return rows
+
+
+_catalog = MetadataCatalog()
+
+
+def get_metadata_catalog() -> MetadataCatalog:
+    """프로세스 공용 메타데이터 카탈로그."""
+    return _catalog
+
+
+def invalidate_metadata_catalog():
+    """테이블 생성·삭제, 한글명·min/max 저장 등 메타데이터 변경 후 호출 (결과 캐시도 함께 무효화)."""
+    _catalog.invalidate()
+    mark_tables_changed(META_TABLE)
+
+
+# ---- 조회 결과 캐시 (프로세스 공용, 테이블 버전 토큰 기준, LRU·메모리 한도) ----
+# 이 모듈의 쓰기 함수는 커밋 후 mark_tables_changed()로 테이블 버전을 올림. 캐시 키 = 함수·인자 + 의존 테이블 버전
+# + 메타(_crm_tables) 버전 + 외부 쓰기 epoch. 외부 쓰기(다른 프로세스·DB 도구)는 전용 감시 연결의
+# PRAGMA data_version 변화 중 이 프로세스 쓰기로 설명되지 않는 것으로 감지 (동시에 일어난 외부 쓰기는 놓칠 수 있음).
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 결과 캐시 메모리 한도 (추정치 기준)
+
+_version_lock = threading.Lock()
+_table_versions: dict[str, int] = {}
+_write_seq = 0  # 이 프로세스에서 기록된 쓰기 횟수 (테이블 무관)
+_watch = {"conn": None, "path": None, "data_version": None, "write_seq": 0, "epoch": 0}
+
+
+def mark_tables_changed(*table_names: str):
+    """테이블 데이터가 바뀌었음을 기록 (커밋 후 호출, 결과 캐시·컬럼형 스냅샷 무효화). 이 모듈 밖에서 직접 쓴 경우에도 호출."""
+    global _write_seq
+    with _version_lock:
+        _write_seq += 1
+        for t in table_names:
+            _table_versions[t] = _table_versions.get(t, 0) + 1
+    _invalidate_columnar(table_names)
+
+
+def _external_write_epoch() -> int:
+    """외부 쓰기 감지 시 증가하는 epoch. DB 파일이 없으면 감시 연결을 만들지 않음."""
+    with _version_lock:
+        path = str(DB_PATH)
+        if _watch["path"] != path:
+            if _watch["conn"] is not None:
+                try:
+                    _watch["conn"].close()
+                except Exception:
+                    pass
+            _watch.update(conn=None, path=path, data_version=None)
+        if _watch["conn"] is None:
+            if not DB_PATH.exists():
+                return _watch["epoch"]
+            _watch["conn"] = sqlite3.connect(path, check_same_thread=False)
+        try:
+            dv = _watch["conn"].execute("PRAGMA data_version").fetchone()[0]
+        except Exception:
+            _watch["epoch"] += 1
+            _watch.update(conn=None, data_version=None)
+            return _watch["epoch"]
+        if _watch["data_version"] is not None and dv != _watch["data_version"] and _write_seq == _watch["write_seq"]:
+            _watch["epoch"] += 1
+        _watch.update(data_version=dv, write_seq=_write_seq)
+        return _watch["epoch"]
+
+
+def _approx_nbytes(obj, _depth: int = 0) -> int:
+    """캐시 항목 메모리 추정 (DataFrame은 deep memory_usage, 컨테이너는 재귀 합산)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(_approx_nbytes(k, _depth + 1) + _approx_nbytes(v, _depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)) and len(obj) > 1000:
+        # 긴 목록은 앞부분 표본으로 추정 (고객 요약 100만 건 등)
+        sample = obj[:200]
+        return size + sum(_approx_nbytes(v, _depth + 1) for v in sample) * len(obj) // len(sample)
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(_approx_nbytes(v, _depth + 1) for v in obj)
+    return size
+
+
+class ResultCache:
+    """조회 결과 LRU 캐시. 항목 크기 합이 max_bytes를 넘으면 오래 안 쓴 항목부터 제거."""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, nbytes)
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def _key(self, name: str, tables, args) -> tuple:
+        epoch = _external_write_epoch()
+        with _version_lock:
+            meta = _table_versions.get(META_TABLE, 0)
+            deps = _write_seq if tables is None else tuple((t, _table_versions.get(t, 0)) for t in tables)
+        return (name, str(DB_PATH), epoch, meta, deps, args)
+
+    def get_or_compute(self, name: str, tables, args, compute, copy_result: bool = True):
+        """
+        캐시에 있으면 반환, 없으면 compute()로 계산해 저장.
+        tables: 결과가 의존하는 테이블명 목록. None이면 모든 테이블(이 프로세스의 어떤 쓰기든 무효화).
+        copy_result: DataFrame·컨테이너 결과를 복사해 반환 (호출 측 수정이 캐시에 반영되지 않도록).
+        """
+        key = self._key(name, tables, repr(args))  # 버전은 계산 전에 읽음 → 계산 중 쓰기가 있어도 다음 조회는 새 키
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if hit is not None:
+            return _copy_cached(hit[0]) if copy_result else hit[0]
+        value = compute()
+        nbytes = _approx_nbytes(value)
+        with self._lock:
+            self.misses += 1
+            if nbytes <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (value, nbytes)
+                self.nbytes += nbytes
+                self._evict()
+        return _copy_cached(value) if copy_result else value
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, (_, n) = self._entries.popitem(last=False)
+            self.nbytes -= n
+            self.evictions += 1
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _copy_cached(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    if isinstance(value, tuple):
+        return tuple(_copy_cached(v) for v in value)
+    return value
+
+
+_result_cache = ResultCache()
+
+
+def cached_call(name: str, tables, compute, *args, copy_result: bool = True, **kwargs):
+    """compute(*args, **kwargs) 결과를 프로세스 공용 캐시로 감싸 호출 (앱 단위 집계 등 모듈 밖 조회용)."""
+    return _result_cache.get_or_compute(
+        name, tables, (args, sorted(kwargs.items())), lambda: compute(*args, **kwargs), copy_result=copy_result
+    )
+
+
+def _cached_read(tables_of):
+    """db_storage 조회 함수용 데코레이터. tables_of(*args, **kwargs) → 의존 테이블명 목록 (None=전체)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                tables = tables_of(*args, **kwargs)
+            except Exception:
+                return fn(*args, **kwargs)
+            return _result_cache.get_or_compute(
+                fn.__name__, tables, (args, sorted(kwargs.items())), lambda: fn(*args, **kwargs)
+            )
+        wrapper.uncached = fn
+        return wrapper
+    return deco
+
+
+def _table_arg(table_name, *args, **kwargs) -> list[str]:
+    return [_sanitize_table_name(table_name)] if table_name else []
+
+
+def get_result_cache_stats() -> dict:
+    """결과 캐시 적중/미스·항목 수·메모리 사용량."""
+    return _result_cache.stats()
+
+
+def set_result_cache_budget(max_bytes: int) -> dict:
+    """결과 캐시 메모리 한도 변경 (초과분은 즉시 LRU 제거). 반환: 변경 후 stats."""
+    _result_cache.resize(max_bytes)
+    return _result_cache.stats()
+
+
+def clear_result_cache():
+    """결과 캐시 비우기 (적중/미스 카운터는 유지)."""
+    _result_cache.clear()
+
+
+# ---- 일괄 쓰기 (논리 작업 하나 = 트랜잭션 하나, executemany) ----
+# 스키마 워크북 적재처럼 여러 쓰기 함수를 묶을 때 바깥에서 write_transaction을 열면 안쪽 호출은 SAVEPOINT로 합류.
+# 안쪽 블록이 실패하면 그 부분만 되돌리고 나머지는 바깥 커밋 한 번으로 반영.
+_write_tx = threading.local()
+
+
+@contextlib.contextmanager
+def write_transaction(*tables: str, metadata: bool = False):
+    """
+    쓰기 트랜잭션 컨텍스트. yield: 현재 스레드 연결. 블록 안 쓰기는 한 번에 커밋(예외 시 전체 롤백).
+    같은 스레드에서 중첩되면 SAVEPOINT로 바깥 트랜잭션에 합류 (안쪽 예외는 SAVEPOINT까지만 되돌리고 전파).
+    가장 바깥 블록이 커밋된 뒤 tables에 mark_tables_changed, metadata=True면 메타데이터 카탈로그 무효화.
+    tables가 비어 있어도(ANALYZE·내부 테이블만 쓰는 경우) 이 프로세스의 쓰기로 기록 → 외부 쓰기로 오인해 캐시 전체를 비우지 않음.
+    """
+    state = getattr(_write_tx, "state", None)
+    if state is not None:
+        conn = state["conn"]
+        state["depth"] += 1
+        sp = f"sp_write_{state['depth']}"
+        conn.execute(f"SAVEPOINT {sp}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {sp}")
+            conn.execute(f"RELEASE {sp}")
+            raise
+        else:
+            conn.execute(f"RELEASE {sp}")
+            state["tables"].update(tables)
+            state["metadata"] = state["metadata"] or metadata
+        finally:
+            state["depth"] -= 1
+        return
+    _ensure_dir()
+    conn = get_connection()
+    state = {"conn": conn, "depth": 0, "tables": set(tables), "metadata": metadata}
+    _write_tx.state = state
+    try:
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")  # DDL(CREATE TABLE)로 시작해도 자동 커밋되지 않도록
+            yield conn
+    finally:
+        _write_tx.state = None
+    mark_tables_changed(*state["tables"])
+    if state["metadata"]:
+        invalidate_metadata_catalog()
 
 
 def list_tables() -> list[str]:
@@ -142,24 +886,7 @@ def list_tables() -> list[str]:
     if not DB_PATH.exists():
         return []
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        cur = conn.execute(f"SELECT name FROM {META_TABLE} ORDER BY name")
-        names = [row[0] for row in cur.fetchall()]
-        # 마이그레이션: 예전 버전에서 uploaded_data 단일 테이블만 있던 경우
-        cur2 = conn.execute(
-            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='uploaded_data'"
-        )
-        if cur2.fetchone() and "uploaded_data" not in names:
-            conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (name) VALUES ('uploaded_data')")
-            conn.commit()
-            names.append("uploaded_data")
-        # 실제 sqlite_master에 있는 테이블만 반환 (유령 목록 제거)
-        cur3 = conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        existing = {row[0] for row in cur3.fetchall()}
-        names = sorted(n for n in names if n in existing)
-        conn.close()
-        return names
+        return list(_catalog.snapshot()["tables"])
     except Exception:
         return []
 
@@ -174,447 +901,3433 @@ def save_table(df: pd.DataFrame, table_name: str) -> bool:
     table_name = _sanitize_table_name(table_name)
     try:
         _ensure_dir()
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
-        conn.execute(
-            f"INSERT OR REPLACE INTO {META_TABLE} (name) VALUES (?)",
-            (table_name,),
-        )
-        conn.commit()
-        conn.close()
+        df = df.set_axis([str(c) for c in df.columns], axis=1)
+        # DROP·CREATE·INSERT·변경 로그(R)를 한 트랜잭션으로 (to_sql replace는 자체 커밋하므로 쓰지 않음)
+        with write_transaction(table_name, metadata=True) as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            conn.execute(pd.io.sql.get_schema(df, table_name, con=conn))  # to_sql과 같은 컬럼 타입
+            conn.execute(
+                f"INSERT OR REPLACE INTO {META_TABLE} (name) VALUES (?)",
+                (table_name,),
+            )
+            _delete_column_profile(conn, [table_name])
+            _delete_partitions(conn, [table_name])
+            _catalog.invalidate()  # 새 컬럼 정의로 INSERT (트랜잭션 안 연결 기준으로 다시 읽음)
+            _insert_batches(conn, table_name, df, or_ignore=False, log_changes=False)
+            ensure_key_indexes(conn, table_name)
+            lo, hi = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table_name}"').fetchone()
+            _log_change(conn, table_name, "R", lo, hi, len(df))
+        sync_consult_index(table_name)
         return True
     except Exception:
+        _catalog.invalidate()  # 롤백된 컬럼 정의가 남지 않도록
         return False
 
 
-def _fill_notnull_columns_for_insert(df: pd.DataFrame, conn: sqlite3.Connection, table_name: str) -> pd.DataFrame:
-    """테이블의 NOT NULL 컬럼에 대해 DataFrame의 NaN을 기본값으로 채워 NOT NULL constraint 오류를 방지.
-    INTEGER PRIMARY KEY 컬럼은 채우지 않음 — NULL이면 SQLite가 자동 생성하므로, 0으로 채우면 모든 행이 같은 키가 되어 INSERT OR IGNORE 시 0건만 들어감."""
-    cur = conn.execute(f'PRAGMA table_info("{table_name}")')
-    rows = cur.fetchall()
+def _notnull_fill_values(table_name: str) -> dict[str, object]:
+    """테이블의 NOT NULL 컬럼별 빈 값 대체값 { column_name: 0 | "" }.
+    INTEGER PRIMARY KEY 컬럼은 제외 — NULL이면 SQLite가 자동 생성하므로, 0으로 채우면 모든 행이 같은 키가 되어 INSERT OR IGNORE 시 0건만 들어감."""
+    out = {}
     # sqlite3: (cid, name, type, notnull, dflt_value, pk)
-    out = df.copy()
-    for r in rows:
+    for r in _catalog.table_info(table_name):
         col_name, col_type, notnull = r[1], (r[2] or "TEXT").upper(), r[3]
         pk = r[5] if len(r) > 5 else 0
-        if not notnull or col_name not in out.columns:
+        if not notnull:
             continue
         # INTEGER PRIMARY KEY는 채우지 않음 — NULL로 두어 자동 생성되도록
         if pk and "INT" in col_type:
             continue
         if "INT" in col_type:
-            fill_val = 0
+            out[col_name] = 0
         elif "REAL" in col_type or "FLOAT" in col_type or "NUM" in col_type:
             # 0 사용 (0.0이면 TEXT 컬럼에 "0.0" 3자로 들어가 CHECK(length≤1) 등에서 실패할 수 있음)
-            fill_val = 0
+            out[col_name] = 0
         else:
-            fill_val = ""
-        out[col_name] = out[col_name].fillna(fill_val)
-        # object 타입에서 pd.NA/None이 남을 수 있음
-        if out[col_name].dtype == "object" and out[col_name].isna().any():
-            out[col_name] = out[col_name].fillna("")
+            out[col_name] = ""
     return out
 
 
-def insert_into_table(df: pd.DataFrame, table_name: str) -> tuple[bool, str | None, int]:
-    """
-    기존 테이블에만 데이터를 INSERT(추가). 테이블 생성·재생성·교체 없음.
-    NOT NULL 컬럼의 빈 값(NaN)은 타입에 맞게 기본값(0, 0.0, '')으로 채운 뒤 삽입.
-    UNIQUE/PRIMARY KEY 중복 행은 건너뛰고(INSERT OR IGNORE) 나머지만 적재.
-    table_name은 파일명 등에서 추출 후 _sanitize_table_name 적용 권장.
-    반환: (성공 여부, 실패 시 오류 메시지, 실제 삽입된 행 수)
-    """
-    if df is None or df.empty:
-        return False, "데이터가 비어 있습니다.", 0
-    table_name = _sanitize_table_name(table_name)
-    if not DB_PATH.exists():
-        return False, "DB가 없습니다. 먼저 **테이블 생성** 메뉴에서 테이블을 만든 뒤 업로드하세요.", 0
-    existing = list_tables()
-    if table_name not in existing:
-        return False, f"테이블 **{table_name}** 이(가) 없습니다. 먼저 **테이블 생성** 메뉴에서 해당 테이블을 만든 뒤 업로드하세요.", 0
+# ---- 컬럼 프로파일 (_column_profile) ----
+# 적재 배치마다 건수·결측·숫자 min/max·합계·제곱합·문자 min/max와 HyperLogLog 스케치를 누적.
+# 조회 화면은 원본을 다시 읽지 않고 컬럼 수만큼의 행만 읽음.
+
+_HLL_P = 12                 # 레지스터 2^12개 (컬럼당 4KB, 표준오차 약 1.6%)
+_HLL_M = 1 << _HLL_P
+
+
+def _hll_registers(values: pd.Series) -> np.ndarray:
+    """값들(결측 제외, float 또는 str로 정규화된 상태)의 HyperLogLog 레지스터."""
+    reg = np.zeros(_HLL_M, dtype=np.uint8)
+    if values.empty:
+        return reg
+    h = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+    idx = (h >> np.uint64(64 - _HLL_P)).astype(np.int64)
+    w = (h << np.uint64(_HLL_P)) | np.uint64(1 << (_HLL_P - 1))
+    rank = (64 - np.floor(np.log2(w.astype(np.float64)))).astype(np.uint8)
+    np.maximum.at(reg, idx, rank)
+    return reg
+
+
+def _hll_estimate(reg: np.ndarray) -> int:
+    """HyperLogLog 레지스터로 유일값 수 추정 (소규모는 linear counting 보정)."""
+    alpha = 0.7213 / (1 + 1.079 / _HLL_M)
+    est = alpha * _HLL_M * _HLL_M / float(np.sum(np.power(2.0, -reg.astype(np.float64))))
+    zeros = int(np.count_nonzero(reg == 0))
+    if est <= 2.5 * _HLL_M and zeros:
+        est = _HLL_M * np.log(_HLL_M / zeros)
+    return int(round(est))
+
+
+def _numeric_part(s: pd.Series) -> pd.Series:
+    """결측 제외 값 중 숫자로 해석되는 값(float64). 문자 컬럼은 앞 32개에 숫자가 없으면 전체 변환 생략."""
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        return s.astype("float64")
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(f'PRAGMA table_info("{table_name}")')
-        target_cols = [r[1] for r in cur.fetchall()]
-        df_reindexed = df.reindex(columns=[c for c in target_cols if c in df.columns]).reindex(columns=target_cols)
-        df_filled = _fill_notnull_columns_for_insert(df_reindexed, conn, table_name)
-        tmp_name = "_tmp_append"
-        df_filled.to_sql(tmp_name, conn, if_exists="replace", index=False)
-        conn.execute(f'INSERT OR IGNORE INTO "{table_name}" SELECT * FROM "{tmp_name}"')
-        rows_inserted = conn.execute("SELECT changes()").fetchone()[0]
-        conn.execute(f'DROP TABLE "{tmp_name}"')
-        conn.commit()
-        conn.close()
-        return True, None, rows_inserted
-    except Exception as e:
-        return False, str(e) if str(e).strip() else "스키마가 맞지 않거나 저장 중 오류가 났습니다.", 0
+        return s.astype("float64")
+    except (ValueError, TypeError):
+        pass
+    if pd.to_numeric(s.head(32), errors="coerce").isna().all():
+        return s.iloc[:0].astype("float64")
+    return pd.to_numeric(s, errors="coerce").dropna().astype("float64")
 
 
-def insert_one_row_and_get_error(df_one_row: pd.DataFrame, table_name: str) -> str | None:
-    """
+def _profile_batch(batch: pd.DataFrame) -> dict[str, dict]:
+    """배치 DataFrame의 컬럼별 부분 통계 (병합 가능한 형태)."""
+    out = {}
+    n = len(batch)
+    for col in batch.columns:
+        s = batch[col].dropna()
+        nulls = n - len(s)
+        num = _numeric_part(s)
+        # 스케치 키: 모두 숫자면 float(1과 "1"을 같은 값으로), 아니면 문자열
+        key = num if len(num) == len(s) else s.astype(str)
+        st = {
+            "row_count": n, "null_count": nulls, "numeric_count": int(len(num)),
+            "min_num": float(num.min()) if len(num) else None,
+            "max_num": float(num.max()) if len(num) else None,
+            "sum_num": float(num.sum()) if len(num) else 0.0,
+            "sumsq_num": float((num * num).sum()) if len(num) else 0.0,
+            "min_text": None, "max_text": None,
+            "sketch": _hll_registers(key),
+        }
+        if len(num) < len(s):
+            st["min_text"], st["max_text"] = key.min(), key.max()
+        out[col] = st
+    return out
+
+
+def _merge_profile(a: dict | None, b: dict) -> dict:
+    if a is None:
+        return b
+    def _pick(x, y, f):
+        return y if x is None else (x if y is None else f(x, y))
+    return {
+        "row_count": a["row_count"] + b["row_count"],
+        "null_count": a["null_count"] + b["null_count"],
+        "numeric_count": a["numeric_count"] + b["numeric_count"],
+        "min_num": _pick(a["min_num"], b["min_num"], min),
+        "max_num": _pick(a["max_num"], b["max_num"], max),
+        "sum_num": (a["sum_num"] or 0.0) + (b["sum_num"] or 0.0),
+        "sumsq_num": (a["sumsq_num"] or 0.0) + (b["sumsq_num"] or 0.0),
+        "min_text": _pick(a["min_text"], b["min_text"], min),
+        "max_text": _pick(a["max_text"], b["max_text"], max),
+        "sketch": np.maximum(a["sketch"], b["sketch"]),
+    }
+
+
+_PROFILE_COLS = (
+    "row_count", "null_count", "numeric_count", "min_num", "max_num",
+    "sum_num", "sumsq_num", "min_text", "max_text",
+)
+
+
+def _read_profile_rows(conn: sqlite3.Connection, table_name: str) -> dict[str, dict]:
+    cur = conn.execute(
+        f"SELECT column_name, {', '.join(_PROFILE_COLS)}, sketch, exact FROM {COLUMN_PROFILE_TABLE} WHERE table_name = ?",
+        (table_name,),
+    )
+    out = {}
+    for row in cur.fetchall():
+        st = dict(zip(_PROFILE_COLS, row[1:1 + len(_PROFILE_COLS)]))
+        blob = row[1 + len(_PROFILE_COLS)]
+        st["sketch"] = np.frombuffer(blob, dtype=np.uint8).copy() if blob and len(blob) == _HLL_M else np.zeros(_HLL_M, dtype=np.uint8)
+        st["exact"] = row[-1]
+        out[row[0]] = st
+    return out
+
+
+def _update_column_profile(
+    conn: sqlite3.Connection, table_name: str, batch: pd.DataFrame, exact: bool = True, replace: bool = False
+):
+    """배치 통계를 _column_profile에 누적 (호출 측 트랜잭션 안에서). replace=True면 기존 값을 버리고 새로 씀."""
+    if batch is None or batch.empty:
+        return
+    current = {} if replace else _read_profile_rows(conn, table_name)
+    rows = []
+    for col, st in _profile_batch(batch).items():
+        prev = current.get(col)
+        merged = _merge_profile(prev, st)
+        is_exact = bool(exact) and (prev is None or bool(prev.get("exact", 1)))
+        rows.append(
+            (table_name, col, *[merged[k] for k in _PROFILE_COLS], merged["sketch"].tobytes(), 1 if is_exact else 0)
+        )
+    conn.executemany(
+        f"""INSERT OR REPLACE INTO {COLUMN_PROFILE_TABLE}
+            (table_name, column_name, {', '.join(_PROFILE_COLS)}, sketch, exact)
+            VALUES ({', '.join('?' * (len(_PROFILE_COLS) + 4))})""",
+        rows,
+    )
+
+
+def _delete_column_profile(conn: sqlite3.Connection, table_names: list[str]):
+    conn.executemany(f"DELETE FROM {COLUMN_PROFILE_TABLE} WHERE table_name = ?", [(t,) for t in table_names])
+
+
+@_cached_read(_table_arg)
+def get_column_profile(table_name: str) -> dict[str, dict]:
+    """
+    _column_profile에서 컬럼별 통계 조회 (컬럼 수만큼의 행만 읽음).
+    반환: { column_name: {"rows", "nulls", "non_null", "numeric", "min", "max", "mean", "std",
+                          "text_min", "text_max", "distinct"(근사), "exact"} }
+    exact=False: 일부 행이 중복으로 무시된 배치가 섞여 근사치(rebuild_column_profile로 재계산 가능).
+    """
+    if not table_name or not DB_PATH.exists():
+        return {}
+    table_name = _sanitize_table_name(table_name)
+    try:
+        rows = _read_profile_rows(get_connection(), table_name)
+    except Exception:
+        return {}
+    out = {}
+    for col, st in rows.items():
+        k = st["numeric_count"] or 0
+        mean = std = None
+        if k:
+            mean = st["sum_num"] / k
+            var = max(0.0, st["sumsq_num"] / k - mean * mean)
+            std = float(np.sqrt(var * k / (k - 1))) if k > 1 else 0.0
+        out[col] = {
+            "rows": st["row_count"],
+            "nulls": st["null_count"],
+            "non_null": st["row_count"] - st["null_count"],
+            "numeric": k,
+            "min": st["min_num"],
+            "max": st["max_num"],
+            "mean": mean,
+            "std": std,
+            "text_min": st["min_text"],
+            "text_max": st["max_text"],
+            "distinct": min(_hll_estimate(st["sketch"]), st["row_count"] - st["null_count"]),  # 근사 오차가 건수를 넘지 않게
+            "exact": bool(st["exact"]),
+        }
+    return out
+
+
+def rebuild_column_profile(table_name: str, chunk_rows: int | None = None) -> bool:
+    """테이블 전체를 청크 단위로 다시 읽어 _column_profile 재작성 (기존 DB·근사 프로파일 보정용)."""
+    if not table_name or not DB_PATH.exists():
+        return False
+    table_name = _sanitize_table_name(table_name)
+    try:
+        with write_transaction(table_name) as conn:
+            _delete_column_profile(conn, [table_name])
+            for chunk in load_table_iter(table_name, chunk_rows or INGEST_CHUNK_ROWS):
+                _update_column_profile(conn, table_name, chunk)
+        return True
+    except Exception:
+        return False
+
+
+# ---- 변경 로그 (CDC: 테이블별 삽입·갱신·삭제 행 키를 버전과 함께 기록) ----
+# 쓰기 함수가 같은 트랜잭션 안에서 _change_log에 rowid 구간 단위로 기록 (행마다 1건이 아니라 배치당 1건).
+# op: I 삽입, U 갱신, D 삭제(rowid 구간 NULL = 테이블 전체·삭제됨), R 전체 교체(구간 = 새 행 전체).
+# version은 AUTOINCREMENT라 정리(prune_change_log) 후에도 재사용되지 않음.
+CHANGE_OPS = {"I": "inserted", "U": "updated", "D": "deleted", "R": "replaced"}
+
+
+def _log_change(
+    conn: sqlite3.Connection,
+    table_name: str,
+    op: str,
+    rowid_from: int | None = None,
+    rowid_to: int | None = None,
+    row_count: int | None = None,
+):
+    conn.execute(
+        f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, op, rowid_from, rowid_to, row_count) VALUES (?, ?, ?, ?, ?)",
+        (table_name, op, rowid_from, rowid_to, row_count),
+    )
+
+
+def _max_rowid(conn: sqlite3.Connection, table_name: str) -> int:
+    return conn.execute(f'SELECT MAX(rowid) FROM "{table_name}"').fetchone()[0] or 0
+
+
+def _rowid_alias_column(table_name: str) -> str | None:
+    """rowid 별칭인 INTEGER PRIMARY KEY 컬럼명 (단일 PK이고 선언 타입이 정확히 INTEGER일 때만)."""
+    pks = [r for r in _catalog.table_info(table_name) if r[5]]
+    if len(pks) == 1 and (pks[0][2] or "").upper() == "INTEGER":
+        return pks[0][1]
+    return None
+
+
+def _runs(values) -> list[tuple[int, int, int]]:
+    """정수 목록을 연속 구간 [(시작, 끝, 개수), ...]로 압축."""
+    a = np.unique(np.asarray(values, dtype=np.int64))
+    if not len(a):
+        return []
+    breaks = np.flatnonzero(np.diff(a) != 1) + 1
+    return [(int(s[0]), int(s[-1]), len(s)) for s in np.split(a, breaks)]
+
+
+def log_table_append(
+    conn: sqlite3.Connection, table_name: str, max_rowid_before: int, inserted: int, keys=None
+):
+    """
+    max_rowid_before 이후 추가된 행을 I 구간으로 기록 (호출 측 트랜잭션 안에서).
+    새 행이 모두 max_rowid_before 뒤에 있으면 구간 1개. INTEGER PRIMARY KEY를 직접 지정해 앞쪽 rowid에 들어간 행이 있으면
+    keys(삽입 시도한 키 값, 무시된 중복 포함)를 연속 구간으로 기록.
+    """
+    if not inserted:
+        return
+    lo, hi, n = conn.execute(
+        f'SELECT MIN(rowid), MAX(rowid), COUNT(*) FROM "{table_name}" WHERE rowid > ?', (max_rowid_before,)
+    ).fetchone()
+    if n == inserted or keys is None or not len(keys):
+        if n:
+            _log_change(conn, table_name, "I", lo, hi, n)
+        return
+    conn.executemany(
+        f"INSERT INTO {CHANGE_LOG_TABLE} (table_name, op, rowid_from, rowid_to, row_count) VALUES (?, 'I', ?, ?, ?)",
+        [(table_name, s, e, c) for s, e, c in _runs(keys)],
+    )
+
+
+def get_change_version() -> int:
+    """현재 변경 로그 버전 (마지막으로 부여된 version, 없으면 0). 소비 측은 처리 후 이 값을 저장해 두고 다음에 since로 사용."""
+    if not DB_PATH.exists():
+        return 0
+    try:
+        row = get_connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGE_LOG_TABLE,)
+        ).fetchone()
+        return int(row[0]) if row else 0
+    except Exception:
+        return 0
+
+
+def get_changes_since(version: int, table_name: str | None = None, limit: int | None = None) -> list[dict]:
+    """
+    version 이후 변경 목록 (오래된 순).
+    반환: [ {"version", "table", "op", "rowid_from", "rowid_to", "rows", "changed_at"}, ... ]
+    rowid_from/rowid_to가 None이면 테이블 전체 (D: 테이블 삭제).
+    """
+    if not DB_PATH.exists():
+        return []
+    q = f"""SELECT version, table_name, op, rowid_from, rowid_to, row_count, changed_at
+            FROM {CHANGE_LOG_TABLE} WHERE version > ?"""
+    params: list = [int(version or 0)]
+    if table_name:
+        q += " AND table_name = ?"
+        params.append(_sanitize_table_name(table_name))
+    q += " ORDER BY version"
+    if limit:
+        q += f" LIMIT {int(limit)}"
+    try:
+        rows = get_connection().execute(q, params).fetchall()
+    except Exception:
+        return []
+    return [
+        {"version": v, "table": t, "op": op, "rowid_from": lo, "rowid_to": hi, "rows": n, "changed_at": at}
+        for v, t, op, lo, hi, n, at in rows
+    ]
+
+
+def summarize_changes_since(version: int) -> dict[str, dict]:
+    """
+    version 이후 테이블별 변경 요약.
+    반환: { table: {"inserted", "updated", "deleted" (행 수), "replaced", "dropped" (bool), "version" (마지막)} }
+    replaced/dropped가 True면 증분 처리 대신 해당 테이블 전체를 다시 계산해야 함.
+    """
+    out: dict[str, dict] = {}
+    for ch in get_changes_since(version):
+        s = out.setdefault(ch["table"], {
+            "inserted": 0, "updated": 0, "deleted": 0, "replaced": False, "dropped": False, "version": 0,
+        })
+        s["version"] = ch["version"]
+        if ch["op"] == "R":
+            s.update(inserted=0, updated=0, deleted=0, replaced=True, dropped=False)
+        elif ch["op"] == "D" and ch["rowid_from"] is None:
+            s.update(dropped=True)
+        else:
+            s[CHANGE_OPS[ch["op"]]] += ch["rows"] or 0
+    return out
+
+
+def load_changed_rows(table_name: str, since_version: int, columns: list[str] | None = None) -> pd.DataFrame | None:
+    """
+    since_version 이후 삽입·갱신된 행 중 현재 남아 있는 행을 조회 (_rowid 컬럼 포함).
+    그 사이 테이블이 교체·삭제됐으면 None (증분 불가 → 전체 다시 계산).
+    """
+    if not table_name or not DB_PATH.exists():
+        return None
+    table_name = _sanitize_table_name(table_name)
+    changes = get_changes_since(since_version, table_name)
+    if any(ch["op"] == "R" or (ch["op"] == "D" and ch["rowid_from"] is None) for ch in changes):
+        return None
+    ranges = [(ch["rowid_from"], ch["rowid_to"]) for ch in changes if ch["op"] in ("I", "U")]
+    valid = {r[1] for r in _catalog.table_info(table_name)}
+    col_sql = ", ".join(f'"{c}"' for c in columns if c in valid) if columns else "*"
+    try:
+        conn = get_connection()
+        parts = []
+        for start in range(0, len(ranges), 400):
+            chunk = ranges[start:start + 400]
+            where = " OR ".join("rowid BETWEEN ? AND ?" for _ in chunk)
+            params = [v for r in chunk for v in r]
+            parts.append(pd.read_sql(f'SELECT rowid AS _rowid, {col_sql} FROM "{table_name}" WHERE {where}', conn, params=params))
+        if not parts:
+            return pd.DataFrame(columns=["_rowid"] + ([c for c in columns if c in valid] if columns else [r[1] for r in _catalog.table_info(table_name)]))
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        return df.drop_duplicates("_rowid").sort_values("_rowid", kind="stable").reset_index(drop=True)
+    except Exception:
+        return None
+
+
+def prune_change_log(before_version: int) -> int:
+    """before_version 이하 변경 기록 삭제 (모든 소비 측이 처리한 버전까지). 반환: 삭제 건수."""
+    if not DB_PATH.exists():
+        return 0
+    try:
+        with write_transaction() as conn:
+            cur = conn.execute(f"DELETE FROM {CHANGE_LOG_TABLE} WHERE version <= ?", (int(before_version),))
+        return cur.rowcount
+    except Exception:
+        return 0
+
+
+# ---- 적재 전 중복 판별 (PK·UNIQUE 키 해시 집합) ----
+# 테이블 키 값을 64비트 해시로 만들어 정렬 배열(키당 8바이트)로 보관하고, 쓰기 전에 들어오는 행을
+# 신규 / 테이블 중복 / 파일 내 중복으로 분류. 키 집합은 결과 캐시에 테이블 버전 기준으로 보관 (쓰기 후 재생성).
+# 정규화가 어긋나는 값(정수 컬럼에 1.5가 섞인 경우 등)은 중복을 신규로 볼 뿐이고, 쓰기는 INSERT OR IGNORE라 안전.
+DUPLICATE_SAMPLE_KEYS = 5  # 분류별 예시 키 개수
+
+
+def _unique_key_columns(table_name: str) -> list[list[str]]:
+    """PRIMARY KEY와 UNIQUE 제약(인덱스)의 컬럼 목록. 예: [["고객_ID"], ["계좌번호", "기준년월"]]"""
+    info = _catalog.table_info(table_name)
+    keys = []
+    pk = [r[1] for r in sorted((r for r in info if r[5]), key=lambda r: r[5])]
+    if pk:
+        keys.append(pk)
+    conn = get_connection()
+    for idx in conn.execute(f'PRAGMA index_list("{table_name}")').fetchall():
+        # (seq, name, unique, origin, partial) — 부분 인덱스는 조건 밖 행을 막지 않으므로 제외
+        if not idx[2] or (len(idx) > 4 and idx[4]):
+            continue
+        cols = [r[2] for r in conn.execute(f'PRAGMA index_info("{idx[1]}")').fetchall()]
+        if cols and None not in cols and cols not in keys:
+            keys.append(cols)
+    return keys
+
+
+def _key_hashes(df: pd.DataFrame, cols: list[str], numeric: list[bool]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    키 컬럼 값을 SQLite 저장 형태에 맞춰 정규화한 뒤 행별 64비트 해시 계산.
+    반환: (키가 모두 있는 행의 해시 배열, 그 행 마스크). NULL이 섞인 키는 UNIQUE 충돌이 없으므로 제외.
+    """
+    valid = np.ones(len(df), dtype=bool)
+    parts = {}
+    for c, is_num in zip(cols, numeric):
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        if is_num:
+            s = pd.to_numeric(s, errors="coerce")  # 숫자로 못 바꾸는 값은 TEXT로 저장되므로 판별 제외
+        valid &= s.notna().to_numpy()
+        parts[c] = s
+    key = pd.DataFrame({c: s[valid] for c, s in parts.items()})
+    for c, is_num in zip(cols, numeric):
+        s = key[c]
+        if not is_num:
+            key[c] = s.astype(str)
+        elif len(s) and not pd.api.types.is_integer_dtype(s):
+            v = s.to_numpy(dtype="float64")
+            if (np.abs(v) < 2**63).all() and (v == np.floor(v)).all():
+                key[c] = v.astype("int64")  # 1.0 → 1 (INTEGER 컬럼 저장 형태)
+            else:
+                key[c] = v
+        else:
+            key[c] = s.astype("int64")
+    return pd.util.hash_pandas_object(key, index=False).to_numpy(), valid
+
+
+def _table_key_hashes(table_name: str, cols: tuple[str, ...]) -> np.ndarray:
+    """테이블에 저장된 키 해시의 정렬 배열 (키 컬럼만 청크 단위로 읽음)."""
+    types = {r[1]: r[2] for r in _catalog.table_info(table_name)}
+    numeric = [_is_numeric_affinity(types.get(c)) for c in cols]
+    col_sql = ", ".join(f'"{c}"' for c in cols)
+    where = " AND ".join(f'"{c}" IS NOT NULL' for c in cols)
+    parts = [np.empty(0, dtype=np.uint64)]
+    sql = f'SELECT {col_sql} FROM "{table_name}" WHERE {where}'
+    for chunk in pd.read_sql(sql, get_connection(), chunksize=INGEST_CHUNK_ROWS):
+        parts.append(_key_hashes(chunk, list(cols), numeric)[0])
+    return np.sort(np.concatenate(parts))  # searchsorted 조회용 (중복 해시 제거 불필요)
+
+
+def detect_duplicates(
+    df: pd.DataFrame,
+    table_name: str,
+    sample_size: int = DUPLICATE_SAMPLE_KEYS,
+) -> dict:
+    """
+    적재 전 중복 판별. 대상 테이블의 PK·UNIQUE 키마다 저장된 키 해시 집합(캐시)과 대조해 행을 분류.
+    파일 내 중복은 INSERT OR IGNORE와 같이 앞 행이 들어가고 뒤 행이 무시되는 기준.
+    파일에 없는 키 컬럼(자동 증가 PK 등)은 판별하지 않음. 키가 없거나 판별 실패 시 모든 행을 신규로 봄.
+    반환: {"keys", "rows", "new", "duplicate_in_table", "duplicate_in_file",
+          "samples": {"duplicate_in_table": [키 dict, ...], "duplicate_in_file": [...]}, "new_mask", "error"}
+    """
+    table_name = _sanitize_table_name(table_name)
+    n = 0 if df is None else len(df)
+    report = {
+        "keys": [], "rows": n, "new": n, "duplicate_in_table": 0, "duplicate_in_file": 0,
+        "samples": {"duplicate_in_table": [], "duplicate_in_file": []},
+        "new_mask": np.ones(n, dtype=bool), "error": None,
+    }
+    if not n or not DB_PATH.exists():
+        return report
+    try:
+        keys = [k for k in _unique_key_columns(table_name) if set(k) <= set(df.columns)]
+        if not keys:
+            return report
+        types = {r[1]: r[2] for r in _catalog.table_info(table_name)}
+        in_table = np.zeros(n, dtype=bool)
+        hashed = []
+        for cols in keys:
+            h, valid = _key_hashes(df, cols, [_is_numeric_affinity(types.get(c)) for c in cols])
+            pos = np.flatnonzero(valid)
+            stored = cached_call("table_key_hashes", [table_name], _table_key_hashes, table_name, tuple(cols), copy_result=False)
+            if len(stored) and len(h):
+                i = np.minimum(np.searchsorted(stored, h), len(stored) - 1)
+                in_table[pos[stored[i] == h]] = True
+            hashed.append((h, pos))
+        in_file = np.zeros(n, dtype=bool)
+        if len(hashed) == 1:
+            h, pos = hashed[0]
+            cand = ~in_table[pos]
+            dup = pd.Series(h[cand]).duplicated().to_numpy()
+            in_file[pos[cand][dup]] = True
+        else:
+            # 키가 여럿이면 행 순서대로: 어느 키든 앞서 들어간 행과 겹치면 무시
+            row_keys = [dict(zip(pos.tolist(), h.tolist())) for h, pos in hashed]
+            seen = [set() for _ in hashed]
+            for r in np.flatnonzero(~in_table).tolist():
+                ks = [m.get(r) for m in row_keys]
+                if any(k is not None and k in s for k, s in zip(ks, seen)):
+                    in_file[r] = True
+                    continue
+                for k, s in zip(ks, seen):
+                    if k is not None:
+                        s.add(k)
+        key_cols = list(dict.fromkeys(c for k in keys for c in k))
+        report["keys"] = keys
+        report["new_mask"] = ~(in_table | in_file)
+        report["duplicate_in_table"] = int(in_table.sum())
+        report["duplicate_in_file"] = int(in_file.sum())
+        report["new"] = int(report["new_mask"].sum())
+        for name, mask in (("duplicate_in_table", in_table), ("duplicate_in_file", in_file)):
+            rows = np.flatnonzero(mask)[: max(0, int(sample_size))]
+            report["samples"][name] = df.iloc[rows][key_cols].to_dict("records")
+    except Exception as e:
+        report["error"] = str(e).strip() or "중복 판별 오류"
+    return report
+
+
+# ---- 적재 전 제약 검증 (_column_comment·_column_min_max 기준, 컬럼 단위 벡터 연산) ----
+# 예전에는 CHECK·NOT NULL 위반 행이 INSERT OR IGNORE로 조용히 빠지거나, 0건일 때 한 행씩 넣어 보며 원인을 찾았음.
+# 이제 청크 전체를 컬럼별로 한 번에 검사해 위반 행을 INSERT 전에 걸러내고, 사유와 함께 _upload_quarantine에 보관.
+VALIDATION_RULES = {
+    "type": "데이터 타입 불일치",
+    "length": "길이 초과",
+    "scale": "소수 자릿수 초과",
+    "not_null": "필수값 누락",
+    "min": "최솟값 미만",
+    "max": "최댓값 초과",
+    "duplicate": "키 중복",
+}
+VALIDATION_REPORT_ROWS = 1000  # 오류 보고서에 남길 최대 (행, 컬럼) 건수 — 규칙별 건수 집계는 전체 기준
+
+
+def _int_or_none(v) -> int | None:
+    try:
+        return int(float(str(v).strip()))
+    except (ValueError, TypeError):
+        return None
+
+
+def _bound(v) -> float | str | None:
+    """min/max 정의값: 숫자로 읽히면 float, 아니면 문자열 (비어 있으면 None)."""
+    if v is None or not str(v).strip():
+        return None
+    try:
+        return float(str(v).strip())
+    except ValueError:
+        return str(v).strip()
+
+
+def _column_rules(table_name: str, fill_not_null: bool) -> list[dict]:
+    """테이블 컬럼별 검증 규칙 (선언 타입·_column_comment 길이/소수점/Null여부·_column_min_max 범위)."""
+    snap = _catalog.snapshot()
+    meta = snap["columns"].get(table_name, {})
+    min_max = snap["min_max"].get(table_name, {})
+    alias = _rowid_alias_column(table_name)
+    rules = []
+    for _cid, name, decl, notnull, _dflt, pk in _catalog.table_info(table_name):
+        m = meta.get(name, {})
+        u = (decl or "").upper()
+        if "INT" in u:
+            kind = "int"
+        elif _is_numeric_affinity(decl):
+            kind = "real"
+        elif "CHAR" in u or "CLOB" in u or "TEXT" in u:
+            kind = "text"
+        else:
+            kind = None  # BLOB·미지정: 타입 검사 안 함
+        required = bool(pk) and name != alias  # INTEGER PK는 NULL이면 자동 생성
+        if not fill_not_null:
+            required = required or bool(notnull) or str(m.get("null_yn") or "").strip().upper() in ("N", "NO", "아니오")
+        mm = min_max.get(name, {})
+        rules.append({
+            "column": name,
+            "kind": kind,
+            "length": _int_or_none(m.get("data_length")) if kind == "text" else None,
+            "scale": _int_or_none(m.get("scale_val")) if kind == "real" else None,
+            "required": required,
+            "min": _bound(mm.get("min")),
+            "max": _bound(mm.get("max")),
+        })
+    return rules
+
+
+def validate_upload(
+    df: pd.DataFrame,
+    table_name: str,
+    fill_not_null: bool = True,
+    check_duplicates: bool = True,
+    max_report_rows: int = VALIDATION_REPORT_ROWS,
+) -> dict:
+    """
+    적재 전 DataFrame(청크)을 테이블 메타데이터 기준으로 검증. 행 반복 없이 컬럼별 벡터 연산.
+    규칙: type(INTEGER·REAL 컬럼의 숫자 여부·정수 여부), length(TEXT 데이터길이), scale(REAL 소수점),
+    not_null(PK, fill_not_null=False면 NOT NULL·Null여부 N 포함 — 기본은 적재 시 기본값으로 채우는 동작 유지),
+    min/max(_column_min_max, 숫자 정의는 숫자 비교·문자 정의는 문자열 비교), duplicate(PK·UNIQUE, detect_duplicates).
+    파일에 없는 컬럼은 검사하지 않음. 중복 판별은 위반 없는 행만 대상으로 함.
+    반환: {"rows", "valid", "invalid"(제약 위반 행 수), "duplicates"(detect_duplicates 결과),
+          "valid_mask", "invalid_mask", "row_errors"(행별 "컬럼:규칙;" 문자열 배열),
+          "counts": [{"column", "rule", "count"}], "errors": DataFrame(row, column, rule, value, message) — 최대 max_report_rows건,
+          "error"}
+    """
+    table_name = _sanitize_table_name(table_name)
+    n = 0 if df is None else len(df)
+    report = {
+        "rows": n, "valid": n, "invalid": 0, "duplicates": None,
+        "valid_mask": np.ones(n, dtype=bool), "invalid_mask": np.zeros(n, dtype=bool),
+        "row_errors": np.full(n, "", dtype=object), "counts": [],
+        "errors": pd.DataFrame(columns=["row", "column", "rule", "value", "message"]), "error": None,
+    }
+    if not n or not DB_PATH.exists():
+        return report
+    try:
+        bad = np.zeros(n, dtype=bool)
+        row_errors = report["row_errors"]
+        records = []
+
+        def _flag(col, rule, mask, values, detail):
+            cnt = int(mask.sum())
+            if not cnt:
+                return
+            bad[mask] = True
+            row_errors[mask] += f"{col}:{rule};"
+            report["counts"].append({"column": col, "rule": rule, "count": cnt})
+            for i in np.flatnonzero(mask)[: max(0, max_report_rows - len(records))]:
+                v = values[i]
+                records.append({
+                    "row": df.index[i], "column": col, "rule": rule,
+                    "value": None if pd.isna(v) else v, "message": f"{VALIDATION_RULES[rule]} ({detail})",
+                })
+
+        for r in _column_rules(table_name, fill_not_null):
+            col = r["column"]
+            if col not in df.columns:
+                continue
+            s = df[col]
+            if pd.api.types.is_datetime64_any_dtype(s):
+                s = s.dt.strftime("%Y-%m-%d %H:%M:%S")  # 저장 형태(_batch_to_rows)와 같게
+            values = s.to_numpy(dtype=object)
+            present = s.notna().to_numpy()
+            if r["required"]:
+                _flag(col, "not_null", ~present, values, "PK·필수 컬럼")
+            num = None
+            if r["kind"] in ("int", "real"):
+                num = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                is_num = present & ~np.isnan(num)
+                wrong = present & ~is_num
+                if r["kind"] == "int":
+                    wrong = wrong | (is_num & (num != np.floor(num)))
+                _flag(col, "type", wrong, values, "정수" if r["kind"] == "int" else "숫자")
+                ok = is_num & ~wrong
+                if r["scale"] is not None and r["scale"] >= 0:
+                    with np.errstate(invalid="ignore"):
+                        _flag(col, "scale", ok & (np.round(num, r["scale"]) != num), values, f"소수 {r['scale']}자리")
+            text = None
+            if r["length"] is not None and r["length"] > 0:
+                text = s.astype(str).where(present, None) if not present.all() else s.astype(str)
+                lens = text.str.len().to_numpy(dtype="float64", na_value=0)
+                _flag(col, "length", present & (lens > r["length"]), values, f"최대 {r['length']}자")
+            for rule, bound in (("min", r["min"]), ("max", r["max"])):
+                if bound is None:
+                    continue
+                if isinstance(bound, float):
+                    if num is None:
+                        num = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                    with np.errstate(invalid="ignore"):
+                        out = (num < bound) if rule == "min" else (num > bound)
+                    out = out & ~np.isnan(num)
+                    shown = int(bound) if bound == int(bound) else bound
+                else:
+                    if text is None:
+                        text = s.astype(str)
+                    out = ((text < bound) if rule == "min" else (text > bound)).to_numpy(dtype=bool, na_value=False)
+                    out = out & present
+                    shown = bound
+                _flag(col, rule, out, values, f"{'≥' if rule == 'min' else '≤'} {shown}")
+
+        ok_pos = np.flatnonzero(~bad)
+        valid = ~bad
+        if check_duplicates and len(ok_pos):
+            dup = detect_duplicates(df.iloc[ok_pos] if len(ok_pos) < n else df, table_name)
+            report["duplicates"] = {k: v for k, v in dup.items() if k != "new_mask"}
+            valid[ok_pos[~dup["new_mask"]]] = False
+            ndup = dup["duplicate_in_table"] + dup["duplicate_in_file"]
+            if ndup:
+                key = " / ".join(",".join(k) for k in dup["keys"])
+                report["counts"].append({"column": key, "rule": "duplicate", "count": ndup})
+        report["valid_mask"] = valid
+        report["invalid_mask"] = bad
+        report["valid"] = int(valid.sum())
+        report["invalid"] = int(bad.sum())
+        if records:
+            report["errors"] = pd.DataFrame.from_records(records, columns=["row", "column", "rule", "value", "message"])
+    except Exception as e:
+        report["error"] = str(e).strip() or "검증 오류"
+    return report
+
+
+def _quarantine_rows(conn: sqlite3.Connection, table_name: str, df: pd.DataFrame, row_errors) -> int:
+    """검증 위반 행을 격리 테이블에 기록 (호출 측 트랜잭션). row_no는 원본 DataFrame 인덱스."""
+    if df.empty:
+        return 0
+    data = json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))
+    rows = [
+        (table_name, int(idx) if isinstance(idx, (int, np.integer)) else None, err, json.dumps(rec, ensure_ascii=False))
+        for idx, err, rec in zip(df.index, row_errors, data)
+    ]
+    conn.executemany(
+        f"INSERT INTO {QUARANTINE_TABLE} (table_name, row_no, errors, row_data) VALUES (?, ?, ?, ?)", rows
+    )
+    return len(rows)
+
+
+def get_quarantined_rows(table_name: str | None = None, limit: int | None = 1000) -> pd.DataFrame:
+    """격리된 행 조회 (최근 순). 컬럼: id, table_name, row_no, errors, row_data(JSON), created_at."""
+    if not DB_PATH.exists():
+        return pd.DataFrame()
+    sql = f"SELECT id, table_name, row_no, errors, row_data, created_at FROM {QUARANTINE_TABLE}"
+    params: list = []
+    if table_name:
+        sql += " WHERE table_name = ?"
+        params.append(_sanitize_table_name(table_name))
+    sql += " ORDER BY id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    try:
+        return pd.read_sql(sql, get_connection(), params=params)
+    except Exception:
+        return pd.DataFrame()
+
+
+def clear_quarantine(table_name: str | None = None) -> int:
+    """격리 행 삭제 (table_name 없으면 전체). 반환: 삭제 건수."""
+    if not DB_PATH.exists():
+        return 0
+    try:
+        with write_transaction(QUARANTINE_TABLE) as conn:
+            if table_name:
+                cur = conn.execute(f"DELETE FROM {QUARANTINE_TABLE} WHERE table_name = ?", (_sanitize_table_name(table_name),))
+            else:
+                cur = conn.execute(f"DELETE FROM {QUARANTINE_TABLE}")
+        return cur.rowcount
+    except Exception:
+        return 0
+
+
+def _screen_rows(
+    conn: sqlite3.Connection,
+    df: pd.DataFrame,
+    table_name: str,
+    result: dict,
+    validate: bool = True,
+    skip_duplicates: bool = True,
+) -> pd.DataFrame:
+    """
+    적재 경로 공용 (호출 측 트랜잭션 안에서 호출): 제약 검증·중복 판별 후 적재할 행만 반환.
+    위반 행은 격리 테이블에 기록하고 건수·예시를 result에 누적
+    ("invalid", "quarantined", "validation_counts", "validation_errors", "duplicate_*").
+    격리 행이 생기면 커밋 후 mark_tables_changed(QUARANTINE_TABLE)는 호출 측에서.
+    """
+    if not validate and not skip_duplicates:
+        return df
+    if validate:
+        report = validate_upload(df, table_name, check_duplicates=skip_duplicates)
+        dup = report["duplicates"]
+        keep = report["valid_mask"]
+        bad = report["invalid_mask"]
+        if bad.any():
+            result["invalid"] = result.get("invalid", 0) + report["invalid"]
+            result["quarantined"] = result.get("quarantined", 0) + _quarantine_rows(
+                conn, table_name, df[bad], report["row_errors"][bad]
+            )
+            counts = result.setdefault("validation_counts", [])
+            for c in report["counts"]:
+                if c["rule"] == "duplicate":
+                    continue
+                hit = next((x for x in counts if x["column"] == c["column"] and x["rule"] == c["rule"]), None)
+                if hit:
+                    hit["count"] += c["count"]
+                else:
+                    counts.append(dict(c))
+            errors = result.setdefault("validation_errors", [])
+            room = VALIDATION_REPORT_ROWS - len(errors)
+            if room > 0:
+                errors.extend(report["errors"].head(room).to_dict("records"))
+    else:
+        dup = detect_duplicates(df, table_name)
+        keep = dup["new_mask"]
+    if dup:
+        result["duplicate_in_table"] = result.get("duplicate_in_table", 0) + dup["duplicate_in_table"]
+        result["duplicate_in_file"] = result.get("duplicate_in_file", 0) + dup["duplicate_in_file"]
+        samples = result.setdefault("duplicate_samples", {"duplicate_in_table": [], "duplicate_in_file": []})
+        for name, keys in dup["samples"].items():
+            samples[name].extend(keys[: DUPLICATE_SAMPLE_KEYS - len(samples[name])])
+    if keep.all():
+        return df
+    return df[keep]
+
+
+INSERT_BATCH_SIZE = 5000  # executemany 1회당 행 수 (메모리 사용량은 배치 크기에 비례)
+
+
+def _stored_batch(batch: pd.DataFrame, fill_values: dict[str, object]) -> pd.DataFrame:
+    """
+    배치를 실제 저장 값 기준으로 변환: 날짜형은 to_sql과 같은 문자열, NOT NULL 컬럼 결측은 대체값 (나머지 결측은 그대로).
+    바꿀 컬럼이 없으면 batch 그대로 반환 (컬럼 프로파일과 INSERT가 같은 프레임을 씀).
+    """
+    changed = {}
+    for col in batch.columns:
+        s = batch[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = changed[col] = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        fill = fill_values.get(col)
+        if fill is not None:
+            mask = s.isna()
+            if mask.any():
+                changed[col] = s.astype(object).mask(mask, fill)
+    return batch.assign(**changed) if changed else batch
+
+
+def _batch_to_rows(batch: pd.DataFrame, fill_values: dict[str, object]) -> list[tuple]:
+    """
+    배치 DataFrame(대상 테이블 컬럼 순서)을 sqlite3 바인딩용 튜플 목록으로 변환.
+    NOT NULL 컬럼은 대체값으로, 나머지 NaN/NA는 None으로. 날짜형은 to_sql과 같은 문자열 형식.
+    """
+    cols = []
+    for col in batch.columns:
+        s = batch[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        vals = s.tolist()  # numpy 스칼라 → 파이썬 int/float/str
+        mask = s.isna().to_numpy()
+        if mask.any():
+            fill = fill_values.get(col)
+            for i in np.flatnonzero(mask):
+                vals[i] = fill
+        cols.append(vals)
+    return list(zip(*cols)) if cols else []
+
+
+def _insert_batches(
+    conn: sqlite3.Connection,
+    table_name: str,
+    df: pd.DataFrame,
+    or_ignore: bool = True,
+    batch_size: int = INSERT_BATCH_SIZE,
+    on_batch=None,
+    log_changes: bool = True,
+) -> list[dict]:
+    """
+    df를 batch_size 행씩 executemany로 바로 INSERT (임시 테이블 없음). 트랜잭션은 호출 측에서 관리.
+    배치마다 {"batch", "rows", "inserted", "ignored"}를 on_batch(dict)로 전달하고 목록으로 반환.
+    삽입된 행은 같은 트랜잭션에서 변경 로그(I 구간)에 기록. log_changes=False면 호출 측이 기록 (save_table의 R 등).
+    """
+    target_cols = [r[1] for r in _catalog.table_info(table_name)]
+    if not target_cols:
+        raise sqlite3.OperationalError(f"no such table: {table_name}")
+    fill_values = _notnull_fill_values(table_name)
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    col_sql = ", ".join(f'"{c}"' for c in target_cols)
+    sql = f'{verb} INTO "{table_name}" ({col_sql}) VALUES ({", ".join("?" * len(target_cols))})'
+    stats = []
+    batch_size = max(1, int(batch_size))
+    max_before = _max_rowid(conn, table_name)
+    alias = _rowid_alias_column(table_name)
+    alias_pos = target_cols.index(alias) if alias else None
+    keys = [] if alias else None
+    part = _partition_info(conn, table_name)
+    part_pos = target_cols.index(part[0]) if part else None
+    part_counts: Counter = Counter()
+    part_exact = True
+    for no, start in enumerate(range(0, len(df), batch_size), start=1):
+        # 배치 단위로만 reindex·변환 → 원본 전체 복사 없음
+        batch = _stored_batch(df.iloc[start:start + batch_size].reindex(columns=target_cols), fill_values)
+        rows = _batch_to_rows(batch, {})
+        before = conn.total_changes
+        conn.executemany(sql, rows)
+        inserted = conn.total_changes - before
+        if inserted:
+            # 일부만 무시된 배치는 어떤 행이 빠졌는지 알 수 없으므로 근사(exact=0)로 표시
+            # 프로파일은 실제 저장 값(대체값·날짜 문자열 반영) 기준 — 이미 만든 배치 프레임을 그대로 사용
+            _update_column_profile(conn, table_name, batch, exact=inserted == len(rows))
+            if keys is not None:
+                keys.extend(r[alias_pos] for r in rows if isinstance(r[alias_pos], (int, np.integer)))
+            if part_pos is not None:
+                part_counts.update(r[part_pos] for r in rows)
+                part_exact = part_exact and inserted == len(rows)
+        st = {"batch": no, "rows": len(rows), "inserted": inserted, "ignored": len(rows) - inserted}
+        stats.append(st)
+        if on_batch is not None:
+            on_batch(st)
+    if log_changes:
+        log_table_append(conn, table_name, max_before, sum(st["inserted"] for st in stats), keys)
+    if part_counts:
+        _add_partition_counts(conn, table_name, part, part_counts, exact=part_exact)
+    return stats
+
+
+def append_rows(conn: sqlite3.Connection, table_name: str, df: pd.DataFrame, or_ignore: bool = False) -> int:
+    """
+    호출 측 트랜잭션(write_transaction 등) 안에서 DataFrame을 executemany 배치로 기존 테이블에 추가.
+    검증·중복 판별 없이 바로 쓰는 내부 결과 저장용 (변경 로그·컬럼 프로파일은 함께 기록). 반환: 삽입 행 수
+    """
+    if df is None or df.empty:
+        return 0
+    return sum(st["inserted"] for st in _insert_batches(conn, table_name, df, or_ignore=or_ignore))
+
+
+def insert_into_table(
+    df: pd.DataFrame,
+    table_name: str,
+    batch_size: int = INSERT_BATCH_SIZE,
+    on_batch=None,
+    skip_duplicates: bool = True,
+    validate: bool = True,
+    report: dict | None = None,
+) -> tuple[bool, str | None, int]:
+    """
+    기존 테이블에만 데이터를 INSERT(추가). 테이블 생성·재생성·교체 없음.
+    NOT NULL 컬럼의 빈 값(NaN)은 타입에 맞게 기본값(0, 0.0, '')으로 채운 뒤 삽입.
+    UNIQUE/PRIMARY KEY 중복 행은 건너뛰고(INSERT OR IGNORE) 나머지만 적재.
+    validate면 쓰기 전에 validate_upload로 제약 위반 행을 걸러 격리 테이블에 보관, skip_duplicates면 중복 행도 제외.
+    report(dict)를 넘기면 검증·중복 건수와 오류 예시를 누적 ("invalid", "quarantined", "validation_counts" 등).
+    batch_size 행씩 executemany로 한 트랜잭션 안에서 삽입. on_batch(dict)로 배치별 삽입/무시 건수 전달.
+    table_name은 파일명 등에서 추출 후 _sanitize_table_name 적용 권장.
+    반환: (성공 여부, 실패 시 오류 메시지, 실제 삽입된 행 수)
+    """
+    if df is None or df.empty:
+        return False, "데이터가 비어 있습니다.", 0
+    table_name = _sanitize_table_name(table_name)
+    if not DB_PATH.exists():
+        return False, "DB가 없습니다. 먼저 **테이블 생성** 메뉴에서 테이블을 만든 뒤 업로드하세요.", 0
+    existing = list_tables()
+    if table_name not in existing:
+        return False, f"테이블 **{table_name}** 이(가) 없습니다. 먼저 **테이블 생성** 메뉴에서 해당 테이블을 만든 뒤 업로드하세요.", 0
+    report = {} if report is None else report
+    try:
+        stats = []
+        with write_transaction() as conn:
+            df = _screen_rows(conn, df, table_name, report, validate=validate, skip_duplicates=skip_duplicates)
+            if not df.empty:
+                stats = _insert_batches(conn, table_name, df, batch_size=batch_size, on_batch=on_batch)
+        inserted = sum(st["inserted"] for st in stats)
+        if report.get("quarantined"):
+            mark_tables_changed(QUARANTINE_TABLE)
+        if inserted:
+            mark_tables_changed(table_name)
+        if inserted >= ANALYZE_MIN_ROWS:
+            analyze_table(table_name)
+        if inserted:
+            sync_consult_index(table_name)
+        return True, None, inserted
+    except Exception as e:
+        return False, str(e) if str(e).strip() else "스키마가 맞지 않거나 저장 중 오류가 났습니다.", 0
+
+
+INGEST_CHUNK_ROWS = 50_000  # CSV 스트리밍 적재 시 청크당 행 수 (최대 메모리 사용량 기준)
+CSV_NA_VALUES = ["", "#N/A", "null", "None", "nan", ".", "#NULL!"]
+
+
+def _csv_dtype_hints(table_name: str) -> dict[str, str]:
+    """
+    CSV 읽기용 dtype 힌트. _column_comment.data_type(없으면 선언 타입)이 TEXT 계열인 컬럼은 str로 고정해
+    앞자리 0(고객번호·연월 등) 손실과 청크별 타입 추론 차이를 막음. 숫자 컬럼은 pandas 추론에 맡김.
+    """
+    try:
+        data = _catalog.snapshot()
+    except Exception:
+        return {}
+    comments = data["columns"].get(table_name, {})
+    hints = {}
+    for r in _catalog.table_info(table_name):
+        raw = (comments.get(r[1]) or {}).get("data_type") or r[2] or "TEXT"
+        if _normalize_sqlite_type(str(raw).split("(")[0]) == "TEXT":
+            hints[r[1]] = "str"
+    return hints
+
+
+def ingest_csv_stream(
+    file,
+    table_name: str,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    na_values: list[str] | None = None,
+    on_progress=None,
+) -> dict:
+    """
+    CSV를 chunk_rows 행씩 읽어 검증 후 기존 테이블에 INSERT OR IGNORE (한 트랜잭션, 실패 시 전체 롤백).
+    최대 메모리는 파일 크기가 아니라 청크 크기에 비례. file: 경로 또는 바이너리 파일 객체(Streamlit UploadedFile 등).
+    청크마다 validate_upload로 제약 위반 행(격리 테이블로)과 테이블 중복·파일 내 중복 행을 걸러낸 뒤 나머지만 INSERT.
+    on_progress(dict): 청크마다 {"rows", "inserted", "bytes", "total_bytes", "rows_per_sec"} 전달.
+    반환: {"ok", "error", "rows", "inserted", "ignored", "bytes", "elapsed", "preview"(첫 청크 상위 10행), "columns",
+          "duplicate_in_table", "duplicate_in_file", "duplicate_samples",
+          "invalid", "quarantined", "validation_counts", "validation_errors"}
+    """
+    table_name = _sanitize_table_name(table_name)
+    result = {
+        "ok": False, "error": None, "rows": 0, "inserted": 0, "ignored": 0,
+        "bytes": 0, "elapsed": 0.0, "preview": None, "columns": [],
+        "duplicate_in_table": 0, "duplicate_in_file": 0,
+        "duplicate_samples": {"duplicate_in_table": [], "duplicate_in_file": []},
+        "invalid": 0, "quarantined": 0, "validation_counts": [], "validation_errors": [],
+    }
+    if not DB_PATH.exists() or table_name not in list_tables():
+        result["error"] = f"테이블 **{table_name}** 이(가) 없습니다. 먼저 **테이블 생성** 메뉴에서 해당 테이블을 만든 뒤 업로드하세요."
+        return result
+    target_cols = {r[1] for r in _catalog.table_info(table_name)}
+    total_bytes = None
+    if hasattr(file, "seek") and hasattr(file, "tell"):
+        try:
+            file.seek(0, 2)
+            total_bytes = file.tell()
+            file.seek(0)
+        except Exception:
+            total_bytes = None
+    else:
+        try:
+            total_bytes = Path(file).stat().st_size
+        except Exception:
+            total_bytes = None
+    started = time.perf_counter()
+    try:
+        reader = pd.read_csv(
+            file,
+            chunksize=max(1, int(chunk_rows)),
+            dtype=_csv_dtype_hints(table_name),
+            keep_default_na=False,
+            na_values=CSV_NA_VALUES if na_values is None else na_values,
+        )
+        with write_transaction() as conn:
+            for chunk in reader:
+                if result["preview"] is None:
+                    result["preview"] = chunk.head(10).copy()
+                    result["columns"] = list(chunk.columns)
+                    # 검증: 테이블 컬럼과 하나도 겹치지 않으면 잘못된 파일로 보고 중단
+                    if not target_cols.intersection(chunk.columns):
+                        raise ValueError(f"파일 컬럼이 테이블 {table_name}의 컬럼과 일치하지 않습니다: {list(chunk.columns)[:10]}")
+                if chunk.empty:
+                    continue
+                result["rows"] += len(chunk)
+                # 키 집합은 트랜잭션 시작 시점 기준 → 앞 청크와 겹치는 행은 INSERT OR IGNORE가 걸러냄
+                new_rows = _screen_rows(conn, chunk, table_name, result)
+                if not new_rows.empty:
+                    stats = _insert_batches(conn, table_name, new_rows)
+                    result["inserted"] += sum(st["inserted"] for st in stats)
+                if hasattr(file, "tell"):
+                    try:
+                        result["bytes"] = file.tell()
+                    except Exception:
+                        pass
+                elapsed = time.perf_counter() - started
+                if on_progress is not None:
+                    on_progress({
+                        "rows": result["rows"],
+                        "inserted": result["inserted"],
+                        "bytes": result["bytes"],
+                        "total_bytes": total_bytes,
+                        "rows_per_sec": result["rows"] / elapsed if elapsed > 0 else 0.0,
+                    })
+        if result["quarantined"]:
+            mark_tables_changed(QUARANTINE_TABLE)
+        if result["inserted"]:
+            mark_tables_changed(table_name)
+        if total_bytes is not None:
+            result["bytes"] = total_bytes
+        result["ignored"] = result["rows"] - result["inserted"]
+        result["ok"] = result["rows"] > 0
+        if result["inserted"] >= ANALYZE_MIN_ROWS:
+            analyze_table(table_name)
+        if result["inserted"]:
+            sync_consult_index(table_name)
+        if not result["ok"]:
+            result["error"] = "데이터가 비어 있습니다."
+    except Exception as e:
+        result["inserted"] = result["quarantined"] = 0  # 롤백됨
+        result["error"] = str(e).strip() or "스키마가 맞지 않거나 저장 중 오류가 났습니다."
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+INGEST_PARALLEL_MAX_BYTES = 8 * 1024 * 1024  # 이보다 큰 CSV는 병렬 파싱 대신 청크 스트리밍 적재 (대략 INGEST_CHUNK_ROWS 1청크 분량)
+
+
+def _upload_size(data) -> int:
+    """업로드 항목(bytes, 경로, 바이너리 파일 객체) 크기(bytes). 파일 객체는 내용을 읽지 않고 seek으로 계산."""
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if hasattr(data, "seek") and hasattr(data, "tell"):
+        pos = data.tell()
+        data.seek(0, 2)
+        size = data.tell()
+        data.seek(pos)
+        return size
+    return os.path.getsize(data)
+
+
+def _upload_payload(data):
+    """프로세스 풀에 넘길 수 있는 형태(bytes 또는 경로)로 변환. 파일 객체는 이 시점에 처음 읽음."""
+    if hasattr(data, "read"):
+        if hasattr(data, "getvalue"):
+            return data.getvalue()
+        data.seek(0)
+        return data.read()
+    return data
+
+
+def _parse_upload(name: str, data, target_cols: list[str], dtype_hints: dict, na_values: list[str]) -> dict:
+    """
+    (프로세스 풀 작업) 업로드 파일 1개를 파싱·검증해 적재할 DataFrame 반환. DB에는 접근하지 않음.
+    data: 파일 내용(bytes) 또는 경로. 반환: {"df"(대상 컬럼만), "preview", "columns", "error"}
+    """
+    src = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    try:
+        if str(name).lower().endswith(".csv"):
+            df = pd.read_csv(src, dtype=dtype_hints, keep_default_na=False, na_values=na_values)
+        else:
+            df = pd.read_excel(src, na_values=na_values)
+    except Exception as e:
+        return {"df": None, "preview": None, "columns": [], "error": f"파일 읽기 오류: {e}"}
+    out = {"df": None, "preview": df.head(10).copy(), "columns": list(df.columns), "error": None}
+    if df.empty:
+        out["error"] = "데이터가 비어 있습니다."
+    elif not set(target_cols).intersection(df.columns):
+        out["error"] = f"파일 컬럼이 테이블 컬럼과 일치하지 않습니다: {list(df.columns)[:10]}"
+    else:
+        # 테이블에 없는 컬럼은 여기서 버려 프로세스 간 전달량을 줄임
+        keep = set(target_cols)
+        out["df"] = df[[c for c in df.columns if c in keep]]
+    return out
+
+
+def ingest_files(
+    files: list[tuple[str, object]],
+    workers: int | None = None,
+    na_values: list[str] | None = None,
+    refresh_erd: bool = True,
+    on_progress=None,
+) -> list[dict]:
+    """
+    여러 업로드 파일을 병렬 파싱 + 단일 쓰기로 적재. files: [(파일명, bytes·경로·바이너리 파일 객체), ...],
+    테이블명 = 파일명(확장자 제외). 파일 객체는 파싱 직전에야 읽으므로 전체 업로드를 미리 메모리에 올리지 않음.
+    파싱·검증은 프로세스 풀(workers, 기본 CPU 수)에서, INSERT는 호출 스레드 하나가 파일별 트랜잭션으로 순서대로 수행
+    (SQLite 쓰기 잠금은 이 스레드만 잡음). 동시에 파싱 중인 파일은 workers+1개까지 (메모리 상한).
+    INGEST_PARALLEL_MAX_BYTES(약 1청크)보다 큰 CSV는 ingest_csv_stream으로 청크 스트리밍. 풀을 쓸 수 없으면 순차 파싱.
+    끝나면 테이블별 ANALYZE(대량 적재 시)와 ERD JSON 갱신을 한 번씩 실행.
+    on_progress(dict): 파일 처리마다 {"name", "table", "ok", "done", "total", "rows", "elapsed"} 전달.
+        스트리밍 파일은 청크마다 "bytes", "total_bytes", "rows_per_sec"가 추가된 같은 dict를 전달 (done은 완료 파일 수).
+    반환: 파일 순서대로 {"name", "table", "ok", "error", "rows", "inserted", "ignored", "preview", "columns", "elapsed",
+          "duplicate_in_table", "duplicate_in_file", "duplicate_samples",
+          "invalid", "quarantined", "validation_counts", "validation_errors", "parallel_error"} (위반·중복 행은 쓰기 전에 걸러냄)
+          parallel_error: 프로세스 풀을 못 쓰거나 풀이 깨져 이 파일을 순차 파싱했으면 그 사유, 아니면 None.
+    """
+    na_values = CSV_NA_VALUES if na_values is None else na_values
+    existing = set(list_tables()) if DB_PATH.exists() else set()
+    results, parse_jobs, stream_jobs = [], [], []
+    for i, (name, data) in enumerate(files):
+        table = _sanitize_table_name(Path(name).stem)
+        results.append({
+            "name": name, "table": table, "ok": False, "error": None, "rows": 0, "inserted": 0,
+            "ignored": 0, "preview": None, "columns": [], "elapsed": 0.0,
+            "duplicate_in_table": 0, "duplicate_in_file": 0,
+            "duplicate_samples": {"duplicate_in_table": [], "duplicate_in_file": []},
+            "invalid": 0, "quarantined": 0, "validation_counts": [], "validation_errors": [], "parallel_error": None,
+        })
+        if table not in existing:
+            results[i]["error"] = f"테이블 **{table}** 이(가) 없습니다. 먼저 **테이블 생성** 메뉴에서 해당 테이블을 만든 뒤 업로드하세요."
+            continue
+        if str(name).lower().endswith(".csv") and _upload_size(data) > INGEST_PARALLEL_MAX_BYTES:
+            stream_jobs.append(i)
+        else:
+            parse_jobs.append(i)
+
+    inserted_by_table: dict[str, int] = {}
+    done = [0]
+
+    def _job_args(i):
+        table = results[i]["table"]
+        cols = [r[1] for r in _catalog.table_info(table)]
+        hints = _csv_dtype_hints(table) if results[i]["name"].lower().endswith(".csv") else None
+        return files[i][0], _upload_payload(files[i][1]), cols, hints, na_values
+
+    def _finish(i):
+        res = results[i]
+        res["ignored"] = res["rows"] - res["inserted"]
+        done[0] += 1
+        if on_progress is not None:
+            on_progress({
+                "name": res["name"], "table": res["table"], "ok": res["ok"],
+                "done": done[0], "total": len(files), "rows": res["rows"], "elapsed": res["elapsed"],
+            })
+
+    def _write(i, parsed: dict):
+        """단일 쓰기: 파싱 결과를 파일별 트랜잭션 하나로 INSERT."""
+        res = results[i]
+        started = time.perf_counter()
+        res.update(preview=parsed["preview"], columns=parsed["columns"], error=parsed["error"])
+        if parsed["df"] is not None:
+            table = res["table"]
+            try:
+                res["rows"] = len(parsed["df"])
+                with write_transaction() as conn:
+                    new_rows = _screen_rows(conn, parsed["df"], table, res)
+                    if not new_rows.empty:
+                        stats = _insert_batches(conn, table, new_rows)
+                        res["inserted"] = sum(st["inserted"] for st in stats)
+                if res["quarantined"]:
+                    mark_tables_changed(QUARANTINE_TABLE)
+                res["ok"] = True
+                if res["inserted"]:
+                    mark_tables_changed(table)
+                    inserted_by_table[table] = inserted_by_table.get(table, 0) + res["inserted"]
+            except Exception as e:
+                res["rows"] = res["quarantined"] = 0
+                res["error"] = str(e).strip() or "스키마가 맞지 않거나 저장 중 오류가 났습니다."
+        res["elapsed"] = time.perf_counter() - started
+        _finish(i)
+
+    n_workers = max(1, min(workers or os.cpu_count() or 1, len(parse_jobs)))
+    pool = None
+    queue = list(parse_jobs)
+    if n_workers > 1:
+        try:
+            # Streamlit 서버는 다중 스레드 → fork는 잡힌 잠금·스레드별 SQLite 연결까지 복제하므로 spawn
+            pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"))
+        except Exception as e:
+            for i in queue:
+                results[i]["parallel_error"] = f"병렬 파싱을 시작하지 못해 순차 처리: {e}"
+    if pool is not None:
+        pending = {}
+        try:
+            with pool:
+                while queue or pending:
+                    # 파싱 중 + 쓰기 대기 파일 수를 workers+1개로 제한
+                    while queue and len(pending) <= n_workers:
+                        i = queue.pop(0)
+                        pending[pool.submit(_parse_upload, *_job_args(i))] = i
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        i = pending.pop(fut)
+                        try:
+                            parsed = fut.result()
+                        except Exception:
+                            # 풀 손상(BrokenProcessPool 등) → 이 파일은 아래에서 순차 처리
+                            queue.insert(0, i)
+                            raise
+                        _write(i, parsed)
+        except Exception as e:
+            queue = sorted(set(queue) | set(pending.values()))
+            for i in queue:
+                results[i]["parallel_error"] = f"병렬 파싱 중 오류로 순차 처리: {type(e).__name__}: {(str(e).strip().splitlines() or [''])[0]}"
+    for i in queue:
+        _write(i, _parse_upload(*_job_args(i)))
+
+    for i in stream_jobs:
+        name, data = files[i]
+        res = results[i]
+        src = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+        started = time.perf_counter()
+        chunk_progress = None
+        if on_progress is not None:
+            def chunk_progress(p, _res=res, _started=started):
+                on_progress({
+                    **p, "name": _res["name"], "table": _res["table"], "ok": True,
+                    "done": done[0], "total": len(files), "elapsed": time.perf_counter() - _started,
+                })
+        streamed = ingest_csv_stream(src, res["table"], na_values=na_values, on_progress=chunk_progress)
+        res.update({k: streamed[k] for k in res if k in streamed and k not in ("name", "table")})
+        _finish(i)
+
+    for table, n in inserted_by_table.items():
+        if n >= ANALYZE_MIN_ROWS:
+            analyze_table(table)
+        if n:
+            sync_consult_index(table)
+    if refresh_erd and any(r["ok"] for r in results):
+        try:
+            refresh_erd_tables_json()
+        except Exception:
+            pass
+    return results
+
+
+def insert_one_row_and_get_error(df_one_row: pd.DataFrame, table_name: str) -> str | None:
+    """
     한 행만 INSERT (OR IGNORE 없이) 시도하여 실패 시 SQLite 오류 메시지 반환.
     0건일 때 원인 파악용. 성공 시 None 반환.
     """
-    if df_one_row is None or df_one_row.empty:
-        return "데이터가 비어 있습니다."
-    table_name = _sanitize_table_name(table_name)
+    if df_one_row is None or df_one_row.empty:
+        return "데이터가 비어 있습니다."
+    table_name = _sanitize_table_name(table_name)
+    if not DB_PATH.exists():
+        return None
+    try:
+        with write_transaction(table_name) as conn:
+            _insert_batches(conn, table_name, df_one_row.head(1), or_ignore=False)
+        return None
+    except Exception as e:
+        return str(e).strip() or "알 수 없는 오류"
+
+
+def create_table_from_schema(
+    table_name: str,
+    columns: list[dict],
+    table_name_ko: str | None = None,
+) -> tuple[bool, str, str | None]:
+    """
+    엑셀 양식 등에서 추출한 스키마로 빈 테이블 생성.
+    columns: [ {"컬럼명": "id", "속성명": "식별자", "데이터타입": "INTEGER", "PK": True, ... }, ... ]
+    table_name_ko: 테이블 한글명(엔티티명). 있으면 _table_comment에 저장.
+    컬럼 한글명은 각 col의 "컬럼 한글명" 또는 "속성명"으로 _column_comment에 저장.
+    반환: (성공여부, 실행한 CREATE SQL, 오류메시지 또는 None)
+    """
+    if not columns:
+        return False, "", "컬럼 정의가 비어 있습니다."
+    table_name = _sanitize_table_name(table_name)
+    # PK 컬럼 개수·이름 수집 (복수 PK일 때 테이블 수준 PRIMARY KEY 사용)
+    pk_names = []
+    for col in columns:
+        cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
+        pk_val = col.get("PK") if "PK" in col else col.get("pk")
+        pk = pk_val is True if isinstance(pk_val, bool) else _is_truthy(pk_val)
+        if pk:
+            pk_names.append(cname)
+    multi_pk = len(pk_names) >= 2
+
+    parts = []
+    for col in columns:
+        cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
+        raw_type = (col.get("type") or col.get("데이터타입", "TEXT"))
+        if raw_type is None or (isinstance(raw_type, float) and pd.isna(raw_type)):
+            raw_type = "TEXT"
+        ctype = _normalize_sqlite_type(str(raw_type).strip().upper())
+        pk_val = col.get("PK") if "PK" in col else col.get("pk")
+        pk = pk_val is True if isinstance(pk_val, bool) else _is_truthy(pk_val)
+        null_yn = str((col.get("Null여부") if "Null여부" in col else col.get("notnull")) or "").strip().upper()
+        notnull = null_yn in ("N", "NO", "아니오")
+        default = col.get("DEFAULT") if "DEFAULT" in col else col.get("default")
+        if default is not None and isinstance(default, float) and pd.isna(default):
+            default = None
+        if default is not None and str(default).strip() == "":
+            default = None
+        # 데이터길이: TEXT일 때 길이 제한 (CHECK)
+        data_len = col.get("데이터길이") if "데이터길이" in col else col.get("data_length")
+        length_val = None
+        if data_len is not None and not (isinstance(data_len, float) and pd.isna(data_len)):
+            try:
+                length_val = int(float(str(data_len).strip()))
+            except (ValueError, TypeError):
+                pass
+        # 소수점: REAL일 때 소수 자릿수 제한 (CHECK)
+        scale_raw = col.get("소수점") if "소수점" in col else col.get("scale")
+        scale_val = None
+        if scale_raw is not None and not (isinstance(scale_raw, float) and pd.isna(scale_raw)):
+            try:
+                scale_val = int(float(str(scale_raw).strip()))
+            except (ValueError, TypeError):
+                pass
+        seg = f'"{cname}" {ctype}'
+        # PK: 단일일 때만 컬럼 수준 PRIMARY KEY (AUTOINCREMENT는 INTEGER 단일 PK만)
+        if pk and not multi_pk:
+            if ctype == "INTEGER":
+                seg += " PRIMARY KEY AUTOINCREMENT"
+            else:
+                seg += " PRIMARY KEY"
+        if notnull and "PRIMARY KEY" not in seg:
+            seg += " NOT NULL"
+        if default is not None and str(default).strip():
+            dval = str(default).strip()
+            if dval.upper() in ("CURRENT_TIMESTAMP", "CURRENT_DATE", "CURRENT_TIME"):
+                seg += f" DEFAULT {dval}"
+            elif ctype == "INTEGER" or ctype == "REAL":
+                try:
+                    float(dval)
+                    seg += f" DEFAULT {dval}"
+                except ValueError:
+                    seg += f" DEFAULT '{_sql_quote_string(dval)}'"
+            else:
+                seg += f" DEFAULT '{_sql_quote_string(dval)}'"
+        if ctype == "TEXT" and length_val is not None and length_val > 0:
+            seg += f' CHECK(length("{cname}") <= {length_val})'
+        if ctype == "REAL" and scale_val is not None and scale_val >= 0:
+            seg += f' CHECK("{cname}" = round("{cname}", {scale_val}))'
+        parts.append(seg)
+    if multi_pk:
+        parts.append("PRIMARY KEY (" + ", ".join(f'"{n}"' for n in pk_names) + ")")
+    sql = f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n  ' + ",\n  ".join(parts) + "\n)"
+    # 컬럼 한글명 + 데이터타입/데이터길이/소수점/PK/Null여부/DEFAULT (executemany 1회)
+    comment_rows = []
+    for col in columns:
+        cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
+        name_ko = col.get("컬럼 한글명") or col.get("속성명")
+        if name_ko is not None and not (isinstance(name_ko, float) and pd.isna(name_ko)):
+            name_ko = str(name_ko).strip() or None
+        else:
+            name_ko = None
+        raw_type = col.get("type") or col.get("데이터타입")
+        data_type = None if raw_type is None or (isinstance(raw_type, float) and pd.isna(raw_type)) else str(raw_type).strip() or None
+        data_len = col.get("데이터길이") or col.get("data_length")
+        data_length = None if data_len is None or (isinstance(data_len, float) and pd.isna(data_len)) else str(data_len).strip() or None
+        scale_raw = col.get("소수점") or col.get("scale")
+        scale_val = None if scale_raw is None or (isinstance(scale_raw, float) and pd.isna(scale_raw)) else str(scale_raw).strip() or None
+        pk_val = col.get("PK") if "PK" in col else col.get("pk")
+        pk = "Y" if (pk_val is True or _is_truthy(pk_val)) else "N"
+        null_yn = col.get("Null여부") or col.get("notnull")
+        null_yn = None if null_yn is None or (isinstance(null_yn, float) and pd.isna(null_yn)) else str(null_yn).strip() or None
+        default_val = col.get("DEFAULT") or col.get("default")
+        default_val = None if default_val is None or (isinstance(default_val, float) and pd.isna(default_val)) else str(default_val).strip() or None
+        comment_rows.append((table_name, cname, name_ko, data_type, data_length, scale_val, pk, null_yn, default_val))
+    try:
+        # create_tables_from_schema 안에서 호출되면 SAVEPOINT로 바깥 트랜잭션에 합류
+        with write_transaction(table_name, metadata=True) as conn:
+            conn.execute(sql)
+            conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} (name) VALUES (?)", (table_name,))
+            # 테이블 한글명 저장
+            if table_name_ko is not None and str(table_name_ko).strip():
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {TABLE_COMMENT_TABLE} (table_name, name_ko) VALUES (?, ?)",
+                    (table_name, str(table_name_ko).strip()),
+                )
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {COLUMN_COMMENT_TABLE}
+                    (table_name, column_name, name_ko, data_type, data_length, scale_val, pk, null_yn, default_val)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                comment_rows,
+            )
+            # 고객키·BASE_YM 인덱스 (한글명 저장 후 — '고객번호' 한글명으로도 고객키 판별)
+            ensure_key_indexes(conn, table_name)
+        return True, sql, None
+    except Exception as e:
+        return False, sql, str(e)
+
+
+def create_tables_from_schema(tables: list[tuple]) -> list[tuple[str, bool, str, str | None]]:
+    """
+    스키마 워크북 전체(테이블 여러 개)를 한 트랜잭션으로 생성.
+    tables: [(테이블명, 테이블 한글명 또는 None, columns), ...] — columns는 create_table_from_schema와 같은 형식.
+    테이블마다 SAVEPOINT로 실행해 실패한 테이블만 되돌리고 나머지는 한 번에 커밋 (카탈로그 무효화도 1회).
+    반환: [(테이블명, 성공여부, CREATE SQL, 오류메시지 또는 None), ...]
+    """
+    results = []
+    try:
+        with write_transaction(metadata=True):
+            for item in tables:
+                tname, tname_ko, columns = item[0], item[1] if len(item) > 2 else None, item[-1]
+                ok, sql, err = create_table_from_schema(tname, columns, table_name_ko=tname_ko)
+                results.append((_sanitize_table_name(tname), ok, sql, err))
+    except Exception as e:
+        # 커밋 실패 → 전체 롤백
+        return [(t, False, sql, err or str(e)) for t, _ok, sql, err in results]
+    return results
+
+
+def _normalize_sqlite_type(raw: str) -> str:
+    """엑셀 데이터타입 문자열을 SQLite 타입으로 정규화."""
+    u = raw.upper().strip()
+    if not u or u in ("NAN", "NAT"):
+        return "TEXT"
+    if u in ("TEXT", "VARCHAR", "CHAR", "STRING", "NVARCHAR", "VARCHAR2", "CHARACTER", "문자"):
+        return "TEXT"
+    if u in ("INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "NUMBER", "NUMERIC", "정수"):
+        return "INTEGER"
+    if u in ("REAL", "FLOAT", "DOUBLE", "DECIMAL", "실수"):
+        return "REAL"
+    if u in ("BLOB", "BINARY"):
+        return "BLOB"
+    if u in ("DATE", "DATETIME", "TIMESTAMP", "날짜", "일시"):
+        return "TEXT"
+    return "TEXT"
+
+
+def _sql_quote_string(s: str) -> str:
+    """SQL 홑따옴표 리터럴용 이스케이프. ' → '' 로 하나만 치환하고, 이미 '' 인 부분은 다시 넣지 않아 홑따옴표 과다 방지."""
+    if not s:
+        return s
+    # 이미 ''(이스케이프된 따옴표)를 플레이스홀더로 치환 후, ' → '' 처리, 마지막에 플레이스홀더를 '' 로 복원
+    _ph = "\uE000"
+    return s.replace("''", _ph).replace("'", "''").replace(_ph, "''")
+
+
+def _is_truthy(v) -> bool:
+    """PK/Null여부 등 엑셀 값이 Y/예/1/TRUE 등인지."""
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return False
+    s = str(v).strip().upper()
+    return s in ("Y", "YES", "예", "1", "TRUE", "T", "O", "○")
+
+
+def get_table_comment(table_name: str) -> str | None:
+    """테이블 한글명 반환. 없으면 None."""
+    if not DB_PATH.exists():
+        return None
+    table_name = _sanitize_table_name(table_name)
+    try:
+        return _catalog.snapshot()["table_comments"].get(table_name)
+    except Exception:
+        return None
+
+
+def get_column_comments(table_name: str) -> dict[str, str]:
+    """테이블별 컬럼 한글명 매핑. { column_name: name_ko }"""
+    if not DB_PATH.exists():
+        return {}
+    table_name = _sanitize_table_name(table_name)
+    try:
+        cols = _catalog.snapshot()["columns"].get(table_name, {})
+        return {c: m["name_ko"] for c, m in cols.items() if m["name_ko"]}
+    except Exception:
+        return {}
+
+
+def get_column_data_lengths(table_name: str) -> dict[str, int]:
+    """
+    _column_comment의 data_length 조회. { column_name: max_length } (없거나 숫자 변환 실패 시 제외).
+    샘플 데이터 생성 시 해당 길이를 넘지 않도록 참고용.
+    """
+    if not DB_PATH.exists():
+        return {}
+    table_name = _sanitize_table_name(table_name)
+    try:
+        cols = _catalog.snapshot()["columns"].get(table_name, {})
+        out = {}
+        for c, m in cols.items():
+            if m["data_length"] is None or m["data_length"] == "":
+                continue
+            try:
+                n = int(float(str(m["data_length"]).strip()))
+                if n > 0:
+                    out[c] = n
+            except (ValueError, TypeError):
+                pass
+        return out
+    except Exception:
+        return {}
+
+
+def save_column_min_max_batch(rows: list[dict]) -> tuple[int, str | None]:
+    """
+    테이블·컬럼별 min/max 정의를 DB에 저장(INSERT OR REPLACE).
+    rows: [{"table_name": str, "column_name": str, "min_val": str|None, "max_val": str|None}, ...]
+    반환: (저장 건수, 오류 메시지 또는 None)
+    """
+    if not rows:
+        return 0, None
+    params = []
+    for r in rows:
+        t = _sanitize_table_name((r.get("table_name") or r.get("테이블명") or "").strip())
+        c = _sanitize_column_name((r.get("column_name") or r.get("컬럼명") or "").strip())
+        if not t or not c:
+            continue
+        min_v = r.get("min_val") or r.get("min") or r.get("MIN") or r.get("최소")
+        max_v = r.get("max_val") or r.get("max") or r.get("MAX") or r.get("최대")
+        if min_v is not None and isinstance(min_v, float) and pd.isna(min_v):
+            min_v = None
+        if max_v is not None and isinstance(max_v, float) and pd.isna(max_v):
+            max_v = None
+        min_s = None if min_v is None else str(min_v).strip() or None
+        max_s = None if max_v is None else str(max_v).strip() or None
+        params.append((t, c, min_s, max_s))
+    try:
+        with write_transaction(COLUMN_MIN_MAX_TABLE, metadata=True) as conn:
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {COLUMN_MIN_MAX_TABLE}
+                    (table_name, column_name, min_val, max_val) VALUES (?, ?, ?, ?)""",
+                params,
+            )
+        return len(params), None
+    except Exception as e:
+        return 0, str(e)
+
+
+def get_column_min_max(table_name: str | None = None) -> dict:
+    """
+    컬럼별 min/max 조회.
+    table_name이 있으면 { column_name: {"min": str|None, "max": str|None} }
+    없으면 { table_name: { column_name: {"min", "max"} } }
+    """
+    if not DB_PATH.exists():
+        return {}
+    try:
+        min_max = _catalog.snapshot()["min_max"]
+        if table_name:
+            t = _sanitize_table_name(table_name)
+            return {c: dict(v) for c, v in min_max.get(t, {}).items()}
+        return {t: {c: dict(v) for c, v in cols.items()} for t, cols in min_max.items()}
+    except Exception:
+        return {}
+
+
+@_cached_read(_table_arg)
+def get_table_row_count(table_name: str) -> int:
+    """테이블의 현재 행 수 반환. 테이블이 없거나 오류 시 0."""
+    if not table_name or not DB_PATH.exists():
+        return 0
+    table_name = _sanitize_table_name(table_name)
+    try:
+        conn = get_connection()
+        cur = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"')
+        n = cur.fetchone()[0]
+        return n
+    except Exception:
+        return 0
+
+
+# ---- 컴팩트 dtype (스키마·메타데이터 기준으로 조회 결과 메모리 축소) ----
+# 정수: 선언 길이(_column_comment.data_length·타입의 (n))·_column_min_max 범위와 실제 값 범위를 모두 담는 가장 작은 int8/16/32.
+# 텍스트: 유일값 비율이 낮으면 category (고객키·PK·파티션 컬럼, 긴 자유 입력, 대부분 숫자인 컬럼 제외).
+# 실수: float32는 선택 (정밀도 7자리). 결측이 있는 정수 컬럼은 float 그대로 둠 (nullable Int는 ML 전처리와 맞지 않음).
+COMPACT_CATEGORY_MAX_RATIO = 0.5   # 유일값 수 / 행 수가 이 이하인 텍스트 컬럼만 category
+COMPACT_TEXT_MAX_LENGTH = 100      # 선언 길이가 이보다 긴 텍스트는 category 대상에서 제외
+_COMPACT_INT_DTYPES = (np.int8, np.int16, np.int32)
+
+
+def _declared_int_range(decl: str | None, meta: dict, mm: dict) -> tuple[float, float] | None:
+    """메타데이터상 정수 컬럼이 가질 수 있는 범위. _column_min_max 숫자 범위 우선, 없으면 선언 자릿수(±10^n-1)."""
+    lo, hi = _bound(mm.get("min")), _bound(mm.get("max"))
+    if isinstance(lo, float) and isinstance(hi, float):
+        return lo, hi
+    digits = _int_or_none(meta.get("data_length"))
+    if digits is None:
+        m = re.search(r"\((\d+)", decl or "")
+        digits = int(m.group(1)) if m else None
+    if digits and 0 < digits < 19:
+        return -(10 ** digits - 1), 10 ** digits - 1
+    return None
+
+
+def compact_dtypes(df: pd.DataFrame, table_name: str | None = None, float32: bool = False) -> tuple[pd.DataFrame, dict]:
+    """
+    DataFrame 컬럼을 더 작은 dtype으로 변환 (값은 그대로). table_name이 있으면 선언 타입·한글명 메타·min/max·프로파일 참고.
+    반환: (변환된 DataFrame, {"before", "after", "saved"(바이트), "ratio", "columns": {컬럼: "int64→int8", ...}})
+    """
+    report = {"before": 0, "after": 0, "saved": 0, "ratio": 1.0, "columns": {}}
+    if df is None or df.empty:
+        return df, report
+    before = int(df.memory_usage(index=True, deep=True).sum())
+    info, meta, min_max, profile, keys = {}, {}, {}, {}, set()
+    if table_name:
+        table_name = _sanitize_table_name(table_name)
+        rows = _catalog.table_info(table_name)
+        info = {r[1]: r[2] for r in rows}
+        snap = _catalog.snapshot()
+        meta = snap["columns"].get(table_name, {})
+        min_max = snap["min_max"].get(table_name, {})
+        profile = get_column_profile(table_name)
+        keys = {r[1] for r in rows if r[5]}
+    n = len(df)
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        dt = s.dtype
+        new = None
+        if pd.api.types.is_bool_dtype(dt):
+            pass
+        elif isinstance(dt, np.dtype) and dt.kind in "iu" and dt.itemsize > 1:
+            lo, hi = s.min(), s.max()
+            rng = _declared_int_range(info.get(col), meta.get(col, {}), min_max.get(col, {}))
+            if rng:
+                lo, hi = min(lo, rng[0]), max(hi, rng[1])
+            for cand in _COMPACT_INT_DTYPES:
+                ii = np.iinfo(cand)
+                if ii.min <= lo and hi <= ii.max:
+                    if np.dtype(cand).itemsize < dt.itemsize:
+                        new = s.astype(cand)
+                    break
+        elif isinstance(dt, np.dtype) and dt == np.float64:
+            if float32 and not (s.abs() > np.finfo(np.float32).max).any():
+                new = s.astype(np.float32)
+        elif pd.api.types.is_object_dtype(dt) or pd.api.types.is_string_dtype(dt):
+            p = profile.get(col) or {}
+            length = _int_or_none(meta.get(col, {}).get("data_length"))
+            skip = (
+                col in keys
+                or _is_customer_key(col, meta.get(col, {}).get("name_ko"))
+                or str(col).upper() in PARTITION_COLUMNS
+                or (length is not None and length > COMPACT_TEXT_MAX_LENGTH)
+                or (p.get("non_null") and (p.get("numeric") or 0) >= p["non_null"] // 2 + 1)
+                or (p.get("distinct") or 0) > COMPACT_CATEGORY_MAX_RATIO * max(n, p.get("rows") or 0)
+            )
+            if not skip and s.nunique(dropna=True) <= COMPACT_CATEGORY_MAX_RATIO * n:
+                new = s.astype("category")
+        if new is not None:
+            out[col] = new
+            report["columns"][col] = f"{dt}→{new.dtype}"
+    if out:
+        df = df.assign(**out)
+    after = int(df.memory_usage(index=True, deep=True).sum())
+    report.update(before=before, after=after, saved=before - after, ratio=round(before / after, 2) if after else 1.0)
+    return df, report
+
+
+def load_table(
+    table_name: str,
+    limit: int | None = None,
+    compact: bool = False,
+    float32: bool = False,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    descending: bool = False,
+    distinct: bool = False,
+) -> pd.DataFrame | None:
+    """지정한 테이블명의 데이터를 DataFrame으로 반환. 없거나 오류 시 None. limit 지정 시 해당 행 수만 읽음(통계 등 빠른 조회용).
+    전체 조회이고 COLUMNAR_MIN_ROWS 이상이면 컬럼형 스냅샷(load_table_columnar)에서 읽음. 그 외 전체 조회는 분석 엔진이
+    duckdb(attach)면 DuckDB로 읽음.
+    columns/where/order_by/distinct는 SQLite에서 실행 (필요한 컬럼·행만 읽음):
+    columns는 읽을 컬럼 목록 (테이블에 없는 컬럼은 무시, 남는 게 없으면 None),
+    where는 count_table_rows와 같은 [(컬럼, 연산자, 값), ...] (값은 바인딩 파라미터, 연산자는 FILTER_OPS),
+    order_by는 컬럼 하나 또는 목록 (descending이면 모두 내림차순), distinct=True면 SELECT DISTINCT.
+    compact=True면 compact_dtypes로 작은 dtype 변환 (float32는 실수 컬럼까지), 절감량은 df.attrs["compact"].
+    스냅샷에서 읽는 전체 조회는 결과 캐시를 거치지 않고 mmap 프레임을 그대로 반환 (복사·캐시 이중 보관 없음,
+    compact면 변환 결과만 새로 만듦). 그 외 조회는 결과 캐시 사용."""
+    plain = columns is None and not where and not order_by and not distinct
+    if plain and (limit is None or limit <= 0) and table_name and DB_PATH.exists():
+        df = load_table_columnar(_sanitize_table_name(table_name), min_rows=COLUMNAR_MIN_ROWS)
+        if df is not None:
+            if compact:
+                df, report = compact_dtypes(df, table_name, float32=float32)
+                df.attrs["compact"] = report
+            return df
+    return _load_table_cached(table_name, limit, compact, float32, columns, where, order_by, descending, distinct)
+
+
+@_cached_read(_table_arg)
+def _load_table_cached(
+    table_name: str,
+    limit: int | None = None,
+    compact: bool = False,
+    float32: bool = False,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    descending: bool = False,
+    distinct: bool = False,
+) -> pd.DataFrame | None:
+    df = _load_table(table_name, limit, columns, where, order_by, descending, distinct)
+    if compact and df is not None:
+        df, report = compact_dtypes(df, table_name, float32=float32)
+        df.attrs["compact"] = report
+    return df
+
+
+def _load_table(
+    table_name: str,
+    limit: int | None = None,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    descending: bool = False,
+    distinct: bool = False,
+) -> pd.DataFrame | None:
+    if not table_name or not DB_PATH.exists():
+        return None
+    table_name = _sanitize_table_name(table_name)
+    try:
+        plain = columns is None and not where and not order_by and not distinct
+        if plain and (limit is None or limit <= 0):
+            # 컬럼형 스냅샷은 load_table에서 먼저 확인 (캐시 밖) → 여기서는 DuckDB/SQLite만
+            df = _duck_query(f'SELECT * FROM "{table_name}"', tables=[table_name], mirror=False)
+            if df is not None:
+                return df if not df.empty else None
+        built = _select_sql(table_name, columns, where, order_by, descending, distinct)
+        if built is None:
+            return None
+        q, params = built
+        if limit is not None and limit > 0:
+            q += f" LIMIT {int(limit)}"
+        conn = get_connection()
+        df = pd.read_sql(q, conn, params=params)
+        return df if not df.empty else None
+    except Exception:
+        return None
+
+
+def _select_sql(
+    table_name: str,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    descending: bool = False,
+    distinct: bool = False,
+) -> tuple[str, list] | None:
+    """load_table·load_table_iter 공용 SELECT 작성. 남는 컬럼이 없으면 None, 없는 정렬·조건 컬럼은 ValueError."""
+    names = {r[1] for r in _catalog.table_info(table_name)}
+    select = "*"
+    if columns is not None:
+        picked = list(dict.fromkeys(c for c in columns if c in names))
+        if not picked:
+            return None
+        select = ", ".join(f'"{c}"' for c in picked)
+    where_sql, params = _build_filter_clause(table_name, where)
+    q = f'SELECT {"DISTINCT " if distinct else ""}{select} FROM "{table_name}" {where_sql}'
+    if order_by:
+        keys = [order_by] if isinstance(order_by, str) else list(order_by)
+        for c in keys:
+            if c not in names:
+                raise ValueError(f"컬럼 없음: {c}")
+        direction = "DESC" if descending else "ASC"
+        q += " ORDER BY " + ", ".join(f'"{c}" {direction}' for c in keys)
+    return q, params
+
+
+def load_table_iter(
+    table_name: str,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    descending: bool = False,
+):
+    """
+    테이블을 chunk_rows 행씩 DataFrame으로 내보내는 제너레이터 (커서 fetchmany, 최대 메모리는 청크 크기에 비례).
+    columns/where/order_by는 load_table과 같고 SQLite에서 실행. 결과 캐시·컬럼형 스냅샷은 쓰지 않음.
+    테이블이 없거나 남는 컬럼이 없으면 아무것도 내보내지 않음. 읽는 도중 오류는 그대로 전달
+    (일부 청크만 처리한 결과를 전체로 오인하지 않도록). 청크마다 dtype 추론은 따로 하므로 청크 간 dtype이 다를 수 있음.
+    """
+    if not table_name or not DB_PATH.exists():
+        return
+    table_name = _sanitize_table_name(table_name)
+    if not _catalog.table_info(table_name):
+        return
+    built = _select_sql(table_name, columns, where, order_by, descending)
+    if built is None:
+        return
+    q, params = built
+    cur = get_connection().cursor()  # 호출 측의 다른 조회·쓰기와 커서를 공유하지 않도록 전용 커서
+    try:
+        cur.execute(q, params)
+        names = [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(max(1, int(chunk_rows)))
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=names)
+    finally:
+        cur.close()
+
+
+def export_table_csv(
+    table_name: str,
+    dest,
+    columns: list | None = None,
+    where: list | None = None,
+    order_by: str | list | None = None,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    encoding: str = "utf-8-sig",
+) -> dict:
+    """
+    load_table_iter로 청크씩 읽어 CSV로 내보냄 (테이블 크기와 무관하게 메모리 일정). dest: 경로 또는 텍스트 파일 객체.
+    반환: {"ok", "rows", "error"}
+    """
+    out = {"ok": False, "rows": 0, "error": None}
+    try:
+        fh = open(dest, "w", encoding=encoding, newline="") if isinstance(dest, (str, Path)) else contextlib.nullcontext(dest)
+        with fh as f:
+            for chunk in load_table_iter(table_name, chunk_rows, columns=columns, where=where, order_by=order_by):
+                chunk.to_csv(f, index=False, header=out["rows"] == 0)
+                out["rows"] += len(chunk)
+        out["ok"] = True
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
+# ---- 컬럼형 스냅샷 (분석용 전체 조회를 .npy 메모리 맵으로) ----
+# data/columnar/<테이블>/<빌드ID>/ 아래 컬럼별 파일, <테이블>/current.json에 현재 빌드·검증 정보.
+# 숫자 컬럼: int64/float64 .npy (NULL은 NaN) → mmap으로 복사 없이 DataFrame 구성.
+# 텍스트·혼합 컬럼: int32 코드 .npy + 사전 JSON (코드 0 = NULL) → 코드로 take.
+# 이 모듈의 쓰기는 mark_tables_changed()에서 스냅샷을 지우고, 다음 전체 조회 때 다시 만듦.
+# 외부 쓰기는 행 수·MAX(rowid) 비교로 감지 (행 수가 같은 UPDATE는 감지 못 함 → build_columnar_snapshot으로 재생성).
+COLUMNAR_DIR_NAME = "columnar"
+COLUMNAR_MIN_ROWS = 200_000  # load_table 전체 조회 시 이 행 수 이상인 테이블만 스냅샷 사용
+COLUMNAR_FETCH_ROWS = 100_000  # 스냅샷 생성 시 fetchmany 단위
+COLUMNAR_RMTREE_RETRIES = 3  # 이전 빌드 폴더 삭제 재시도 횟수 (Windows에서 매핑 중인 파일)
+_columnar = {"enabled": True}
+_columnar_lock = threading.Lock()  # 스냅샷 생성 직렬화
+
+
+def set_columnar_snapshots(enabled: bool) -> bool:
+    """컬럼형 스냅샷 사용 여부 설정. 반환: 이전 설정."""
+    prev = _columnar["enabled"]
+    _columnar["enabled"] = bool(enabled)
+    return prev
+
+
+def _columnar_dir(table_name: str) -> Path:
+    return DB_PATH.parent / COLUMNAR_DIR_NAME / table_name
+
+
+def _rmtree_retry(path: Path) -> bool:
+    """
+    디렉터리 삭제. Windows는 아직 매핑된(.npy mmap) 파일을 지우지 못하므로 잠깐 쉬며 COLUMNAR_RMTREE_RETRIES번 시도.
+    반환: 삭제 여부 (남은 폴더는 다음 빌드의 _sweep_columnar_builds가 다시 정리).
+    """
+    for attempt in range(COLUMNAR_RMTREE_RETRIES):
+        try:
+            shutil.rmtree(path)
+            return True
+        except FileNotFoundError:
+            return True
+        except OSError:
+            if attempt + 1 < COLUMNAR_RMTREE_RETRIES:
+                time.sleep(0.1 * (attempt + 1))
+    return False
+
+
+def _sweep_columnar_builds(table_name: str, keep: str | None = None) -> int:
+    """테이블 스냅샷 폴더에서 keep 외 빌드 폴더 삭제 (이전에 못 지운 것 포함). 반환: 삭제하지 못한 폴더 수."""
+    try:
+        olds = [d for d in _columnar_dir(table_name).iterdir() if d.is_dir() and d.name != keep]
+    except OSError:
+        return 0
+    return sum(not _rmtree_retry(d) for d in olds)
+
+
+def _invalidate_columnar(table_names):
+    """테이블 스냅샷 삭제 (열려 있는 mmap은 닫힐 때까지 유효). manifest부터 지워 못 지운 빌드가 다시 쓰이지 않게 함."""
+    root = DB_PATH.parent / COLUMNAR_DIR_NAME
+    if not root.exists():
+        return
+    for t in table_names:
+        with contextlib.suppress(OSError):
+            (root / t / "current.json").unlink()
+        _rmtree_retry(root / t)
+
+
+def _columnar_manifest(table_name: str) -> tuple[dict | None, int]:
+    """
+    유효한 스냅샷의 manifest와 행 수 반환. 스냅샷이 없거나 오래됐으면 (None, 현재 행 수).
+    유효 조건: 컬럼 목록 일치, 같은 프로세스 빌드면 테이블 버전 일치. 빌드 이후 외부 쓰기 epoch이 그대로면
+    DB 조회 없이 유효, 아니면(다른 프로세스 빌드 포함) 행 수·MAX(rowid) 비교.
+    """
+    conn = get_connection()
+
+    def _counts():
+        return conn.execute(f'SELECT COUNT(*), MAX(rowid) FROM "{table_name}"').fetchone()
+
+    try:
+        with open(_columnar_dir(table_name) / "current.json", encoding="utf-8") as f:
+            m = json.load(f)
+    except (OSError, ValueError):
+        return None, _counts()[0]
+    if [c["name"] for c in m["columns"]] != [r[1] for r in _catalog.table_info(table_name)]:
+        return None, _counts()[0]
+    if m["pid"] == os.getpid():
+        with _version_lock:
+            version = _table_versions.get(table_name, 0)
+        if m["version"] != version:
+            return None, _counts()[0]
+        if m["epoch"] == _external_write_epoch():
+            return m, m["rows"]
+    rows, max_rowid = _counts()
+    if m["rows"] != rows or m["max_rowid"] != max_rowid:
+        return None, rows
+    return m, rows
+
+
+def build_columnar_snapshot(table_name: str) -> bool:
+    """
+    테이블을 읽어 컬럼형 스냅샷 생성 (읽기 트랜잭션 1개 안에서 타입 조사 + 데이터 기록).
+    BLOB 값이 있거나 빈 테이블이면 만들지 않음 (False).
+    """
+    if not table_name or not DB_PATH.exists():
+        return False
+    table_name = _sanitize_table_name(table_name)
+    cols = [r[1] for r in _catalog.table_info(table_name)]
+    if not cols:
+        return False
+    with _columnar_lock:
+        conn = sqlite3.connect(str(DB_PATH), isolation_level=None)
+        build_dir = None
+        try:
+            conn.execute("BEGIN")
+            epoch = _external_write_epoch()
+            with _version_lock:
+                version = _table_versions.get(table_name, 0)
+            # typeof 정렬 순서 blob < integer < null < real < text → 컬럼별 MAX(typeof)와 COUNT로 dtype 결정
+            exprs = ["COUNT(*)", "MAX(rowid)"]
+            for c in cols:
+                exprs += [f'MAX(typeof("{c}"))', f'COUNT("{c}")']
+            head = conn.execute(f'SELECT {", ".join(exprs)} FROM "{table_name}"').fetchone()
+            n, max_rowid = head[0], head[1]
+            if not n:
+                return False
+            kinds = []
+            for i in range(len(cols)):
+                top, non_null = head[2 + 2 * i], head[3 + 2 * i]
+                # pd.read_sql과 같은 dtype: 정수만(결측 없음) int64, 숫자+결측 float64, 문자 포함 사전 인코딩
+                # (BLOB이 섞이면 아래 변환에서 실패 → 스냅샷 없이 SQL 조회)
+                if top == "blob":
+                    return False
+                if top == "text":
+                    kinds.append("dict")
+                elif top == "integer":
+                    kinds.append("int64")
+                elif non_null:
+                    kinds.append("float64")
+                else:
+                    kinds.append("null")
+            build_id = f"{time.time_ns():x}"
+            build_dir = _columnar_dir(table_name) / build_id
+            build_dir.mkdir(parents=True, exist_ok=True)
+            arrays, lookups, values = {}, {}, {}
+            for i, k in enumerate(kinds):
+                if k == "null":
+                    continue
+                dtype = np.int32 if k == "dict" else k
+                arrays[i] = np.lib.format.open_memmap(build_dir / f"{i}.npy", mode="w+", dtype=dtype, shape=(n,))
+                if k == "dict":
+                    lookups[i], values[i] = {}, []
+            cur = conn.execute(f'SELECT {", ".join(chr(34) + c + chr(34) for c in cols)} FROM "{table_name}"')
+            pos = 0
+            while True:
+                rows = cur.fetchmany(COLUMNAR_FETCH_ROWS)
+                if not rows:
+                    break
+                m = len(rows)
+                for i, col_values in enumerate(zip(*rows)):
+                    k = kinds[i]
+                    if k in ("int64", "float64"):
+                        arrays[i][pos:pos + m] = np.array(col_values, dtype=k)  # None → NaN
+                    elif k == "dict":
+                        codes, uniques = pd.factorize(np.array(col_values, dtype=object))
+                        lookup, vals = lookups[i], values[i]
+                        mapping = np.zeros(len(uniques) + 1, dtype=np.int32)  # 마지막 칸 = NULL(factorize -1)
+                        for j, u in enumerate(uniques):
+                            code = lookup.get(u)
+                            if code is None:
+                                vals.append(u)
+                                code = lookup[u] = len(vals)
+                            mapping[j] = code
+                        arrays[i][pos:pos + m] = mapping[codes]
+                pos += m
+            conn.execute("COMMIT")
+            if pos != n:
+                raise RuntimeError("스냅샷 행 수 불일치")
+            columns = []
+            for i, (c, k) in enumerate(zip(cols, kinds)):
+                a = arrays.get(i)
+                if k == "dict":
+                    with open(build_dir / f"{i}.dict.json", "w", encoding="utf-8") as f:
+                        json.dump(values[i], f, ensure_ascii=False)
+                    non_null, distinct = int(np.count_nonzero(a)), len(values[i])
+                elif k == "float64":
+                    non_null, distinct = int(np.count_nonzero(~np.isnan(a))), int(pd.Series(a, copy=False).nunique())
+                elif k == "int64":
+                    non_null, distinct = n, int(pd.Series(a, copy=False).nunique())
+                else:
+                    non_null = distinct = 0
+                if a is not None:
+                    a.flush()
+                columns.append({"name": c, "kind": k, "non_null": non_null, "distinct": distinct})
+            del arrays
+            manifest = {
+                "table": table_name, "build": build_id, "rows": n, "max_rowid": max_rowid,
+                "pid": os.getpid(), "version": version, "epoch": epoch, "columns": columns,
+            }
+            tmp = _columnar_dir(table_name) / "current.json.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp, _columnar_dir(table_name) / "current.json")
+            _sweep_columnar_builds(table_name, keep=build_id)
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if build_dir is not None:
+                _rmtree_retry(build_dir)
+            return False
+        finally:
+            conn.close()
+
+
+def _read_columnar(table_name: str, m: dict) -> pd.DataFrame:
+    """manifest 기준 스냅샷을 DataFrame으로 (숫자 컬럼은 copy-on-write mmap, 복사 없음)."""
+    d = _columnar_dir(table_name) / m["build"]
+    n = m["rows"]
+    data = {}
+    for i, c in enumerate(m["columns"]):
+        k = c["kind"]
+        if k in ("int64", "float64"):
+            data[c["name"]] = np.load(d / f"{i}.npy", mmap_mode="c").view(np.ndarray)  # 버퍼는 mmap 그대로 공유
+        elif k == "dict":
+            codes = np.load(d / f"{i}.npy", mmap_mode="r")
+            with open(d / f"{i}.dict.json", encoding="utf-8") as f:
+                vals = json.load(f)
+            cats = pd.Series(vals, dtype=object if not vals else None)  # pd.read_sql과 같은 추론 (문자만이면 str, 혼합이면 object)
+            if cats.dtype == object:
+                lut = np.empty(len(vals) + 1, dtype=object)
+                lut[1:] = vals
+                data[c["name"]] = lut[codes]
+            else:
+                data[c["name"]] = cats.array.take(codes.astype(np.intp) - 1, allow_fill=True)
+        else:
+            data[c["name"]] = np.full(n, None, dtype=object)
+    return pd.DataFrame(data, copy=False)
+
+
+def load_table_columnar(table_name: str, min_rows: int = 0) -> pd.DataFrame | None:
+    """
+    컬럼형 스냅샷으로 테이블 전체 로드. 스냅샷이 없거나 오래됐으면 새로 만든 뒤 로드.
+    행 수가 min_rows 미만이면 만들지 않고 None (호출 측에서 SQL로 조회). 사용 안 함·생성 불가 시 None.
+    반환 DataFrame의 숫자 컬럼은 읽기 전용 파일의 copy-on-write 메모리 맵 (수정해도 스냅샷은 그대로).
+    """
+    if not _columnar["enabled"] or not table_name or not DB_PATH.exists():
+        return None
+    table_name = _sanitize_table_name(table_name)
+    try:
+        m, rows = _columnar_manifest(table_name)
+        if m is None:
+            if not rows or rows < min_rows or not build_columnar_snapshot(table_name):
+                return None
+            m, _ = _columnar_manifest(table_name)
+            if m is None:
+                return None
+        return _read_columnar(table_name, m)
+    except Exception:
+        return None
+
+
+# ---- 분석 엔진 (선택: DuckDB — 대용량 스캔·조인·집계를 벡터화·멀티코어로) ----
+# CRM_ANALYTIC_ENGINE=duckdb (환경변수) 또는 set_analytic_engine("duckdb")로 선택. 기본 sqlite, 쓰기는 항상 SQLite.
+# attach: DuckDB sqlite 확장으로 SQLite 파일을 읽기 전용 ATTACH (복사 없음, 항상 최신).
+# mirror: 확장을 쓸 수 없으면(오프라인 등) 조회 대상 테이블을 프로세스 메모리 DuckDB로 복사 (컬럼형 스냅샷에서 읽음).
+#         테이블 버전·외부 쓰기 epoch이 바뀌면 다시 복사. 복사본에는 원본 행 순서를 rowid 컬럼으로 둠.
+# duckdb 미설치·쿼리 오류(타입이 섞인 컬럼 등)면 그 호출만 SQLite로 처리 — 반환 형태는 같음.
+ANALYTIC_ENGINES = ("sqlite", "duckdb")
+_analytic = {
+    "engine": os.environ.get("CRM_ANALYTIC_ENGINE", "sqlite").strip().lower() or "sqlite",
+    "threads": None,     # DuckDB 스레드 수 (None = 전체 코어)
+    "conn": None,
+    "path": None,
+    "mode": None,        # "attach" | "mirror"
+    "schema": None,      # attach 시점의 SQLite schema_version (바뀌면 다시 ATTACH)
+    "mirrored": {},      # mirror 모드: 테이블 → (테이블 버전, 외부 쓰기 epoch)
+    "queries": 0,
+    "fallbacks": 0,
+    "last_error": None,
+}
+_analytic_lock = threading.RLock()
+
+
+def _close_duck():
+    conn = _analytic["conn"]
+    _analytic.update(conn=None, path=None, mode=None, schema=None, mirrored={})
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def set_analytic_engine(engine: str, threads: int | None = None) -> dict:
+    """분석 엔진 선택 ("sqlite" | "duckdb"). 열린 DuckDB 연결은 닫고 다음 조회 때 다시 엶. 반환: get_analytic_engine_info()"""
+    engine = (engine or "sqlite").strip().lower()
+    if engine not in ANALYTIC_ENGINES:
+        raise ValueError(f"지원하지 않는 분석 엔진: {engine} ({', '.join(ANALYTIC_ENGINES)})")
+    with _analytic_lock:
+        _close_duck()
+        _analytic.update(engine=engine, threads=threads)
+    return get_analytic_engine_info()
+
+
+def get_analytic_engine_info() -> dict:
+    """설정 엔진, DuckDB 연결 방식(attach/mirror), DuckDB 조회 수·SQLite 대체 수, 마지막 오류."""
+    with _analytic_lock:
+        return {k: _analytic[k] for k in ("engine", "mode", "queries", "fallbacks", "last_error")} | {
+            "mirrored": sorted(_analytic["mirrored"]),
+        }
+
+
+def _mirror_table(conn, table_name: str):
+    """mirror 모드: 테이블 복사본이 현재 버전이 아니면 컬럼형 스냅샷(없으면 SQL)에서 다시 복사."""
+    epoch = _external_write_epoch()
+    with _version_lock:
+        token = (_table_versions.get(table_name, 0), epoch)
+    if _analytic["mirrored"].get(table_name) == token:
+        return
+    df = load_table_columnar(table_name)
+    if df is None:
+        df = pd.read_sql(f'SELECT * FROM "{table_name}"', get_connection())
+    if "rowid" not in {str(c).lower() for c in df.columns}:
+        df = df.assign(rowid=np.arange(1, len(df) + 1, dtype=np.int64))
+    conn.register("_mirror_src", df)
+    try:
+        conn.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT * FROM _mirror_src')
+    finally:
+        conn.unregister("_mirror_src")
+    _analytic["mirrored"][table_name] = token
+
+
+def _duck_cursor(tables: list[str], mirror: bool = True):
+    """
+    DuckDB 커서 (현재 스레드용). 엔진이 sqlite거나 mirror 모드에서 mirror=False면 None.
+    mirror 모드에서는 tables를 먼저 최신 복사본으로 맞춤.
+    """
+    if _analytic["engine"] != "duckdb" or not DB_PATH.exists():
+        return None
+    with _analytic_lock:
+        conn = _analytic["conn"]
+        if conn is None or _analytic["path"] != str(DB_PATH):
+            _close_duck()
+            import duckdb
+
+            conn = duckdb.connect(":memory:")
+            if _analytic["threads"]:
+                conn.execute(f"SET threads = {int(_analytic['threads'])}")
+            mode = "mirror"
+            try:
+                try:
+                    conn.execute("LOAD sqlite")
+                except duckdb.Error:
+                    conn.execute("INSTALL sqlite")
+                    conn.execute("LOAD sqlite")
+                mode = "attach"
+            except duckdb.Error as e:
+                _analytic["last_error"] = str(e)
+            _analytic.update(conn=conn, path=str(DB_PATH), mode=mode)
+        if _analytic["mode"] == "attach":
+            sv = get_connection().execute("PRAGMA schema_version").fetchone()[0]
+            if _analytic["schema"] != sv:
+                if _analytic["schema"] is not None:
+                    conn.execute("USE memory")
+                    conn.execute("DETACH crm")
+                path = str(DB_PATH).replace("'", "''")
+                conn.execute(f"ATTACH '{path}' AS crm (TYPE SQLITE, READ_ONLY)")
+                _analytic["schema"] = sv
+            cur = conn.cursor()
+            cur.execute("USE crm")
+            return cur
+        if not mirror:
+            return None
+        for t in tables:
+            _mirror_table(conn, t)
+        return conn.cursor()
+
+
+def _duck_query(sql: str, params=(), tables: list[str] | None = None, mirror: bool = True) -> pd.DataFrame | None:
+    """분석 엔진이 duckdb면 DuckDB로 실행한 DataFrame, 아니거나 실패하면 None (호출 측에서 SQLite로 실행)."""
+    if _analytic["engine"] != "duckdb":
+        return None
+    try:
+        cur = _duck_cursor(tables or [], mirror=mirror)
+        if cur is None:
+            return None
+        try:
+            df = cur.execute(sql, list(params)).df()
+        finally:
+            cur.close()
+        with _analytic_lock:
+            _analytic["queries"] += 1
+        return df
+    except Exception as e:
+        with _analytic_lock:
+            _analytic["fallbacks"] += 1
+            _analytic["last_error"] = str(e)
+        return None
+
+
+def _duckdb_sql(sql: str) -> str:
+    """SQLite 방언 → DuckDB: 텍스트 컬럼 숫자 비교용 CAST(... AS REAL)을 TRY_CAST(... AS DOUBLE)로 (변환 불가 값은 NULL)."""
+    return re.sub(r'CAST\(("[^"]+") AS REAL\)', r"TRY_CAST(\1 AS DOUBLE)", sql)
+
+
+# ---- 인덱스 (고객키·BASE_YM 자동 인덱스, ANALYZE, EXPLAIN QUERY PLAN 기반 점검) ----
+
+CUSTOMER_KEY_COLUMNS = ("CSTNO", "CUST_NO", "CUST_ID", "CUSTOMER_ID", "고객_ID", "고객번호")  # 대소문자 무시
+PARTITION_COLUMNS = ("BASE_YM",)
+ANALYZE_MIN_ROWS = 10_000  # 이 건수 이상 적재 시 ANALYZE로 플래너 통계 갱신
+
+
+def _is_customer_key(column_name: str, name_ko: str | None = None) -> bool:
+    upper = (column_name or "").upper()
+    if upper in {c.upper() for c in CUSTOMER_KEY_COLUMNS}:
+        return True
+    return bool(name_ko) and ("고객번호" in name_ko or "고객ID" in name_ko.replace(" ", "").upper())
+
+
+def _index_name(table_name: str, column: str) -> str:
+    return f"ix_{table_name}_{column}"
+
+
+def _key_index_columns(conn: sqlite3.Connection, table_name: str) -> list[str]:
+    """인덱스 대상 컬럼: 고객키로 보이는 컬럼 + BASE_YM. 단일 PK(이미 인덱스 있음)는 제외."""
+    info = conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    try:
+        comments = dict(conn.execute(
+            f"SELECT column_name, name_ko FROM {COLUMN_COMMENT_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchall())
+    except sqlite3.Error:
+        comments = {}
+    pk_cols = [r[1] for r in info if r[5]]
+    out = []
+    for r in info:
+        col = r[1]
+        if len(pk_cols) == 1 and col == pk_cols[0]:
+            continue
+        if _is_customer_key(col, comments.get(col)) or col.upper() in PARTITION_COLUMNS:
+            out.append(col)
+    return out
+
+
+def ensure_key_indexes(conn: sqlite3.Connection, table_name: str) -> list[str]:
+    """
+    고객키(CSTNO·customer_id·고객_ID 등)·BASE_YM 컬럼에 인덱스가 없으면 생성 (CREATE INDEX IF NOT EXISTS).
+    호출 측 트랜잭션 안에서 실행. 반환: 대상 인덱스명 목록
+    """
+    names = []
+    for col in _key_index_columns(conn, table_name):
+        name = _index_name(table_name, col)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table_name}" ("{col}")')
+        names.append(name)
+    return names
+
+
+def create_key_indexes(table_name: str) -> list[str]:
+    """ensure_key_indexes를 자체 트랜잭션으로 실행 후 ANALYZE. 반환: 인덱스명 목록 (오류 시 [])."""
+    if not table_name or not DB_PATH.exists():
+        return []
+    table_name = _sanitize_table_name(table_name)
+    try:
+        with write_transaction() as conn:
+            names = ensure_key_indexes(conn, table_name)
+        analyze_table(table_name)
+        return names
+    except Exception:
+        return []
+
+
+def analyze_table(table_name: str) -> bool:
+    """ANALYZE로 테이블·인덱스 통계(sqlite_stat1) 갱신 — 대량 적재 후 플래너가 인덱스를 고르도록."""
+    if not table_name or not DB_PATH.exists():
+        return False
+    try:
+        with write_transaction() as conn:
+            conn.execute(f'ANALYZE "{_sanitize_table_name(table_name)}"')
+        return True
+    except Exception:
+        return False
+
+
+def explain_query_plan(sql: str, params: tuple | list = ()) -> list[str]:
+    """EXPLAIN QUERY PLAN 결과의 detail 문자열 목록. 오류 시 []."""
+    try:
+        conn = get_connection()
+        # EXPLAIN 문은 스키마 변경 후에도 캐시된 준비문을 재사용하므로 schema_version을 키에 포함
+        ver = conn.execute("PRAGMA schema_version").fetchone()[0]
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql} /* schema {ver} */", params).fetchall()]
+    except Exception:
+        return []
+
+
+def _app_query_templates(table_name: str) -> list[tuple[str, str | None, tuple]]:
+    """앱이 생성하는 대표 조회 형태 (SQL, 대상 컬럼, 파라미터): 고객키 단건 조회·조인, BASE_YM 최신/필터."""
+    info = _catalog.table_info(table_name)
+    comments = get_column_comments(table_name)
+    out = []
+    for r in info:
+        col = r[1]
+        if _is_customer_key(col, comments.get(col)):
+            out.append((f'SELECT * FROM "{table_name}" t WHERE t."{col}" = ?', col, ("0",)))
+            for other in list_tables():
+                if other == table_name:
+                    continue
+                other_cols = [x[1] for x in _catalog.table_info(other)]
+                if col in other_cols:
+                    out.append((
+                        f'SELECT COUNT(*) FROM "{other}" o JOIN "{table_name}" t ON t."{col}" = o."{col}"',
+                        col, (),
+                    ))
+        elif col.upper() in PARTITION_COLUMNS:
+            out.append((f'SELECT MAX(t."{col}") FROM "{table_name}" t', col, ()))
+            out.append((f'SELECT * FROM "{table_name}" t WHERE t."{col}" = ?', col, ("0",)))
+    return out
+
+
+def advise_indexes(table_names: list[str] | None = None) -> list[dict]:
+    """
+    앱 조회 형태별 EXPLAIN QUERY PLAN을 읽어 인덱스 검색(SEARCH)이 하나도 없이 전체 스캔(SCAN)하는 경우를 보고.
+    조인 시 SQLite가 매번 만드는 AUTOMATIC 인덱스는 인덱스 없음으로 간주.
+    반환: [ {"table", "column", "sql", "plan": [..], "suggestion": "CREATE INDEX ..."}, ... ] (문제 없으면 [])
+    """
+    out = []
+    for tname in table_names or list_tables():
+        for sql, col, params in _app_query_templates(tname):
+            plan = explain_query_plan(sql, params)
+            searched = any(line.startswith("SEARCH") and "AUTOMATIC" not in line for line in plan)
+            full_scan = bool(plan) and not searched
+            if full_scan:
+                out.append({
+                    "table": tname,
+                    "column": col,
+                    "sql": sql,
+                    "plan": plan,
+                    "suggestion": f'CREATE INDEX "{_index_name(tname, col)}" ON "{tname}" ("{col}")',
+                })
+    return out
+
+
+# ---- BASE_YM 파티션 (파티션 카탈로그·최신/기간 조회·월 단위 교체) ----
+# PARTITION_COLUMNS 컬럼(인덱스 있음)을 파티션 키로 보고, 값별 행 수를 _partition_catalog에 쓰기와 같은 트랜잭션에서 갱신.
+# 파티션 값이 NULL인 행은 어느 파티션에도 세지 않음. 외부 쓰기로 어긋나면 refresh_partition_catalog로 재계산.
+PARTITION_IN_CHUNK = 500  # 파티션 값 IN (...) 재계산 시 한 번에 넘기는 값 수
+
+
+def _partition_info(conn: sqlite3.Connection, table_name: str) -> tuple[str, bool] | None:
+    """(파티션 컬럼명, 숫자 친화성 여부). 파티션 컬럼이 없으면 None. 마이그레이션 중에도 쓰므로 conn으로 직접 조회."""
+    for r in conn.execute(f'PRAGMA table_info("{table_name}")').fetchall():
+        if (r[1] or "").upper() in PARTITION_COLUMNS:
+            return r[1], _is_numeric_affinity(r[2])
+    return None
+
+
+def partition_column(table_name: str) -> str | None:
+    """테이블의 파티션 컬럼명 (BASE_YM 등, 대소문자 무시). 없으면 None."""
+    if not table_name or not DB_PATH.exists():
+        return None
+    for r in _catalog.table_info(_sanitize_table_name(table_name)):
+        if (r[1] or "").upper() in PARTITION_COLUMNS:
+            return r[1]
+    return None
+
+
+def _partition_key(value, numeric: bool):
+    """파티션 값을 SQLite에 저장되는 형태로 맞춤 (숫자 친화성 컬럼의 '202401' → 202401, 텍스트 컬럼의 202401 → '202401')."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if numeric:
+        try:
+            f = float(value)
+            return int(f) if f.is_integer() else f
+        except (TypeError, ValueError):
+            return str(value)
+    return value if isinstance(value, str) else str(value)
+
+
+def _add_partition_counts(
+    conn: sqlite3.Connection, table_name: str, part: tuple[str, bool], counts: Counter, exact: bool = True
+):
+    """
+    삽입된 행의 파티션 값별 건수를 카탈로그에 반영 (호출 측 트랜잭션 안에서).
+    exact=False(일부 행이 중복으로 무시된 배치 포함)면 건드린 파티션만 인덱스로 다시 셈.
+    """
+    col, numeric = part
+    merged: Counter = Counter()
+    for v, n in counts.items():
+        key = _partition_key(v, numeric)
+        if key is not None:
+            merged[key] += n
+    if not merged:
+        return
+    if not exact:
+        _recount_partitions(conn, table_name, list(merged))
+        return
+    conn.executemany(
+        f"""INSERT INTO {PARTITION_CATALOG_TABLE} (table_name, partition_col, part_value, row_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (table_name, part_value) DO UPDATE SET
+                row_count = row_count + excluded.row_count,
+                updated_at = datetime('now', 'localtime')""",
+        [(table_name, col, k, n) for k, n in merged.items()],
+    )
+
+
+def _recount_partitions(conn: sqlite3.Connection, table_name: str, values: list | None = None):
+    """
+    파티션 행 수를 테이블에서 GROUP BY로 다시 셈 (BASE_YM 인덱스 사용). values가 없으면 테이블 전체.
+    행이 0건이 된 파티션은 카탈로그에서 삭제. 호출 측 트랜잭션 안에서 실행.
+    """
+    part = _partition_info(conn, table_name)
+    if part is None:
+        _delete_partitions(conn, [table_name])
+        return
+    col = part[0]
+    if values is None:
+        conn.execute(f"DELETE FROM {PARTITION_CATALOG_TABLE} WHERE table_name = ?", (table_name,))
+        rows = conn.execute(
+            f'SELECT "{col}", COUNT(*) FROM "{table_name}" WHERE "{col}" IS NOT NULL GROUP BY "{col}"'
+        ).fetchall()
+    else:
+        rows = []
+        for start in range(0, len(values), PARTITION_IN_CHUNK):
+            chunk = values[start:start + PARTITION_IN_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            conn.execute(
+                f"DELETE FROM {PARTITION_CATALOG_TABLE} WHERE table_name = ? AND part_value IN ({marks})",
+                [table_name, *chunk],
+            )
+            rows += conn.execute(
+                f'SELECT "{col}", COUNT(*) FROM "{table_name}" WHERE "{col}" IN ({marks}) GROUP BY "{col}"', chunk
+            ).fetchall()
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {PARTITION_CATALOG_TABLE} (table_name, partition_col, part_value, row_count) "
+        "VALUES (?, ?, ?, ?)",
+        [(table_name, col, v, n) for v, n in rows],
+    )
+
+
+def _delete_partitions(conn: sqlite3.Connection, table_names: list[str]):
+    conn.executemany(f"DELETE FROM {PARTITION_CATALOG_TABLE} WHERE table_name = ?", [(t,) for t in table_names])
+
+
+def refresh_partition_catalog(table_name: str) -> int:
+    """외부 쓰기 등으로 어긋난 파티션 카탈로그를 테이블 기준으로 재계산. 반환: 파티션 수 (오류 시 -1)."""
+    if not table_name or not DB_PATH.exists():
+        return -1
+    table_name = _sanitize_table_name(table_name)
+    try:
+        with write_transaction() as conn:
+            _recount_partitions(conn, table_name)
+            return conn.execute(
+                f"SELECT COUNT(*) FROM {PARTITION_CATALOG_TABLE} WHERE table_name = ?", (table_name,)
+            ).fetchone()[0]
+    except Exception:
+        return -1
+
+
+def get_partitions(table_name: str) -> list[dict]:
+    """파티션 목록 (값 오름차순). 반환: [ {"partition", "rows", "updated_at"}, ... ] — 카탈로그만 읽음."""
+    if not table_name or not DB_PATH.exists():
+        return []
+    try:
+        rows = get_connection().execute(
+            f"SELECT part_value, row_count, updated_at FROM {PARTITION_CATALOG_TABLE} "
+            "WHERE table_name = ? ORDER BY part_value",
+            (_sanitize_table_name(table_name),),
+        ).fetchall()
+        return [{"partition": v, "rows": n, "updated_at": u} for v, n, u in rows]
+    except Exception:
+        return []
+
+
+def latest_partition(table_name: str):
+    """최신(최대) 파티션 값. 카탈로그에 없으면 MAX(BASE_YM) (인덱스 끝 한 건만 읽음). 파티션 컬럼·행이 없으면 None."""
+    col = partition_column(table_name)
+    if col is None:
+        return None
+    table_name = _sanitize_table_name(table_name)
+    try:
+        conn = get_connection()
+        row = conn.execute(
+            f"SELECT MAX(part_value) FROM {PARTITION_CATALOG_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        if row and row[0] is not None:
+            return row[0]
+        return conn.execute(f'SELECT MAX("{col}") FROM "{table_name}"').fetchone()[0]
+    except Exception:
+        return None
+
+
+@_cached_read(_table_arg)
+def load_table_partitions(
+    table_name: str,
+    start=None,
+    end=None,
+    latest_only: bool = False,
+    columns: list[str] | None = None,
+    compact: bool = False,
+    float32: bool = False,
+) -> pd.DataFrame | None:
+    """
+    파티션 단위 조회: latest_only면 최신 파티션만, 아니면 start~end(양끝 포함, 한쪽만 지정 가능) 파티션.
+    compact·float32는 load_table과 같음 (절감량은 df.attrs["compact"]).
+    BASE_YM 인덱스를 타는 WHERE로 필요한 달만 읽음 (분석 엔진이 duckdb면 DuckDB로). columns로 읽을 컬럼 제한.
+    파티션 컬럼이 없거나 행이 없으면 None.
+    """
+    col = partition_column(table_name)
+    if col is None:
+        return None
+    table_name = _sanitize_table_name(table_name)
+    numeric = _is_numeric_affinity(next((r[2] for r in _catalog.table_info(table_name) if r[1] == col), None))
+    valid = [r[1] for r in _catalog.table_info(table_name)]
+    # 컬럼을 명시 (DuckDB mirror 복사본의 rowid 컬럼 제외)
+    col_sql = ", ".join(f'"{c}"' for c in (columns or valid) if c in valid) or ", ".join(f'"{c}"' for c in valid)
+    where, params = [], []
+    if latest_only:
+        latest = latest_partition(table_name)
+        if latest is None:
+            return None
+        where.append(f'"{col}" = ?')
+        params.append(latest)
+    else:
+        if start is not None:
+            where.append(f'"{col}" >= ?')
+            params.append(_partition_key(start, numeric))
+        if end is not None:
+            where.append(f'"{col}" <= ?')
+            params.append(_partition_key(end, numeric))
+    q = f'SELECT {col_sql} FROM "{table_name}"'
+    if where:
+        q += " WHERE " + " AND ".join(where)
+    try:
+        df = _duck_query(q, params, tables=[table_name])
+        if df is None:
+            df = pd.read_sql(q, get_connection(), params=params)
+        if df.empty:
+            return None
+        if compact:
+            df, report = compact_dtypes(df, table_name, float32=float32)
+            df.attrs["compact"] = report
+        return df
+    except Exception:
+        return None
+
+
+def replace_partition(
+    table_name: str,
+    df: pd.DataFrame,
+    partition=None,
+    validate: bool = True,
+    report: dict | None = None,
+) -> tuple[bool, str | None, int]:
+    """
+    파티션(한 달) 하나만 한 트랜잭션으로 교체: 해당 BASE_YM 행 DELETE → df INSERT. 다른 달은 그대로.
+    partition을 주지 않으면 df의 파티션 컬럼 값(한 가지여야 함)을 쓰고, df에 파티션 컬럼이 없으면 partition 값으로 채움.
+    validate면 insert_into_table과 같이 제약 위반 행을 격리. 실패하면 기존 파티션은 그대로 남음.
+    반환: (성공 여부, 실패 시 오류 메시지, 삽입된 행 수)
+    """
+    if df is None or df.empty:
+        return False, "데이터가 비어 있습니다.", 0
+    if not DB_PATH.exists():
+        return False, "DB가 없습니다.", 0
+    table_name = _sanitize_table_name(table_name)
+    if table_name not in list_tables():
+        return False, f"테이블 **{table_name}** 이(가) 없습니다.", 0
+    col = partition_column(table_name)
+    if col is None:
+        return False, f"테이블 **{table_name}** 에 파티션 컬럼({', '.join(PARTITION_COLUMNS)})이 없습니다.", 0
+    numeric = _is_numeric_affinity(next((r[2] for r in _catalog.table_info(table_name) if r[1] == col), None))
+    src = next((c for c in df.columns if str(c).upper() == col.upper()), None)
+    values = {_partition_key(v, numeric) for v in df[src].dropna().unique()} if src is not None else set()
+    key = _partition_key(partition, numeric) if partition is not None else None
+    if key is None:
+        if len(values) != 1:
+            return False, f"{col} 값이 한 가지여야 합니다 (현재 {len(values)}가지). partition을 지정하세요.", 0
+        key = values.pop()
+    elif values - {key}:
+        return False, f"{col} 값이 지정한 파티션({key})과 다른 행이 있습니다.", 0
+    df = df.rename(columns={src: col}) if src is not None and src != col else df.copy()
+    df[col] = key
+    report = {} if report is None else report
+    try:
+        with write_transaction(table_name, QUARANTINE_TABLE) as conn:
+            rowids = [r[0] for r in conn.execute(f'SELECT rowid FROM "{table_name}" WHERE "{col}" = ?', (key,))]
+            if rowids:
+                conn.execute(f'DELETE FROM "{table_name}" WHERE "{col}" = ?', (key,))
+                for lo, hi, n in _runs(rowids):
+                    _log_change(conn, table_name, "D", lo, hi, n)
+                # 삭제분은 누적 프로파일에서 뺄 수 없으므로 근사로 표시 (rebuild_column_profile로 재계산)
+                conn.execute(f"UPDATE {COLUMN_PROFILE_TABLE} SET exact = 0 WHERE table_name = ?", (table_name,))
+                _recount_partitions(conn, table_name, [key])
+            # 캐시된 키 해시에는 방금 지운 행이 남아 있으므로 중복 판별은 INSERT OR IGNORE에 맡김
+            df = _screen_rows(conn, df, table_name, report, validate=validate, skip_duplicates=False)
+            stats = _insert_batches(conn, table_name, df) if not df.empty else []
+        inserted = sum(st["inserted"] for st in stats)
+        if inserted >= ANALYZE_MIN_ROWS:
+            analyze_table(table_name)
+        sync_consult_index(table_name)
+        return True, None, inserted
+    except Exception as e:
+        return False, str(e) if str(e).strip() else "파티션 교체 중 오류가 났습니다.", 0
+
+
+# ---- 상담 전문 검색 (FTS5 색인 _fts_<테이블>, 변경 로그로 증분 동기화) ----
+# 상담 테이블(테이블명·한글명에 "상담")의 텍스트 컬럼(_column_comment 한글명·선언 길이 기준)을 고객키와 함께 FTS5에 색인.
+# 한글은 조사가 붙어 공백 단위 토큰으로는 "연체가"·"연체를"이 갈리고, trigram 토크나이저는 세 글자 미만 검색어("연체", "파산")를
+# 찾지 못함 → 한글 구간을 2글자씩 겹쳐 자른 토큰(+ 마지막 글자)으로 unicode61에 색인하고, 검색어는 같은 토큰의 구문으로 변환.
+# 색인 rowid = 원본 rowid. _text_index_catalog.version 이후 _change_log의 I/U/D 구간만 다시 색인하고,
+# R(전체 교체)·테이블 삭제·로그 정리로 이어지지 않으면 전체 재색인. 동기화는 적재 함수가 커밋 후에만 수행하고,
+# 검색은 색인을 읽기만 함 (뒤처진 색인은 get_consult_index_info의 stale로 표시).
+CONSULT_TABLE_HINTS = ("상담",)
+CONSULT_TEXT_HINTS = ("내용", "메모", "요약", "비고", "특이", "CONTENT", "MEMO", "NOTE", "TEXT", "CNTN", "RMK")
+CONSULT_TEXT_EXCLUDE = ("일자", "일시", "번호", "코드", "구분", "유형", "ID")
+CONSULT_TEXT_MIN_LENGTH = 100  # 한글명 힌트가 없어도 선언 길이가 이 이상인 텍스트 컬럼은 색인
+CONSULT_RISK_TERMS = ("연체", "파산", "개인회생", "연기 요청")  # 상담 위험 키워드 기본값
+CONSULT_INDEX_BATCH = 5_000  # 색인 시 원본 fetchmany·INSERT 단위
+CONSULT_SNIPPET_CHARS = 30  # 스니펫에서 일치 위치 앞뒤로 보여줄 글자 수
+_HANGUL = "가-힣ㄱ-ㆎ"
+_TEXT_RUN = re.compile(f"([{_HANGUL}]+)|([^\\W_{_HANGUL}]+)")
+_consult_index_lock = threading.Lock()
+_consult_search_errors: dict[str, str] = {}  # 테이블 → 마지막 검색 실패 메시지 (성공하면 지움, get_consult_index_info로 노출)
+
+
+def _fts_table(table_name: str) -> str:
+    return f"_fts_{table_name}"
+
+
+def _consult_tokens(text) -> list[str]:
+    """색인용 토큰: 한글 구간은 2글자씩 겹쳐 자르고 마지막 글자를 덧붙임 (한 글자 검색어의 접두 일치용), 그 외 단어는 소문자 그대로."""
+    out = []
+    for ko, other in _TEXT_RUN.findall(str(text)):
+        if ko:
+            out.extend(ko[i:i + 2] for i in range(len(ko) - 1))
+            out.append(ko[-1])
+        else:
+            out.append(other.lower())
+    return out
+
+
+def _consult_match(terms) -> str | None:
+    """검색어(문자열 또는 목록) → FTS5 MATCH 식. 검색어끼리 OR, 검색어 안 단어끼리 AND. 두 글자 이상 한글은 토큰 구문, 그 외는 접두 일치."""
+    exprs = []
+    for term in [terms] if isinstance(terms, str) else list(terms or []):
+        parts = []
+        for ko, other in _TEXT_RUN.findall(str(term)):
+            if ko and len(ko) > 1:
+                parts.append('"' + " ".join(ko[i:i + 2] for i in range(len(ko) - 1)) + '"')
+            else:
+                parts.append('"' + (ko or other.lower()) + '"*')
+        if parts:
+            exprs.append("(" + " AND ".join(parts) + ")")
+    return " OR ".join(exprs) or None
+
+
+def consult_text_columns(table_name: str) -> tuple[str | None, list[str]]:
+    """
+    상담 테이블의 (고객키 컬럼, 색인 대상 텍스트 컬럼 목록). 상담 테이블이 아니거나 텍스트 컬럼이 없으면 (None, []).
+    텍스트 컬럼: 숫자 친화성이 아니고 컬럼명·한글명에 CONSULT_TEXT_HINTS가 있거나 선언 길이가 CONSULT_TEXT_MIN_LENGTH 이상.
+    """
+    if not table_name or not DB_PATH.exists():
+        return None, []
+    table_name = _sanitize_table_name(table_name)
+    try:
+        snap = _catalog.snapshot()
+        title = f"{table_name} {snap['table_comments'].get(table_name) or ''}"
+        if not any(h in title for h in CONSULT_TABLE_HINTS):
+            return None, []
+        meta = snap["columns"].get(table_name, {})
+        cust, texts = None, []
+        for r in _catalog.table_info(table_name):
+            col = r[1]
+            m = meta.get(col) or {}
+            ko = m.get("name_ko") or ""
+            if cust is None and _is_customer_key(col, ko):
+                cust = col
+                continue
+            if _is_numeric_affinity(m.get("data_type") or r[2]):
+                continue
+            label = f"{col} {ko}".upper()
+            if any(h in label for h in CONSULT_TEXT_EXCLUDE):
+                continue
+            if any(h in label for h in CONSULT_TEXT_HINTS) or (_int_or_none(m.get("data_length")) or 0) >= CONSULT_TEXT_MIN_LENGTH:
+                texts.append(col)
+        return cust, texts
+    except Exception:
+        return None, []
+
+
+def _index_consult_rows(
+    conn: sqlite3.Connection, table_name: str, cust_col: str | None, text_cols: list[str], where: str = "", params=()
+) -> int:
+    """원본 행을 읽어 색인에 추가 (호출 측 트랜잭션 안에서). 텍스트가 모두 비어 있는 행은 건너뜀. 반환: 색인한 행 수."""
+    cust_sql = f'"{cust_col}"' if cust_col else "NULL"
+    col_sql = ", ".join(f'"{c}"' for c in text_cols)
+    cur = conn.cursor()
+    try:
+        cur.execute(f'SELECT rowid, {cust_sql}, {col_sql} FROM "{table_name}" {where}', params)
+        n = 0
+        while True:
+            rows = cur.fetchmany(CONSULT_INDEX_BATCH)
+            if not rows:
+                return n
+            batch = []
+            for r in rows:
+                tokens = [t for v in r[2:] if v is not None for t in _consult_tokens(v)]
+                if tokens:
+                    batch.append((r[0], " ".join(tokens), r[1]))
+            conn.executemany(f'INSERT INTO "{_fts_table(table_name)}" (rowid, grams, cust) VALUES (?, ?, ?)', batch)
+            n += len(batch)
+    finally:
+        cur.close()
+
+
+def _delete_consult_index(conn: sqlite3.Connection, table_names: list[str]):
+    for t in table_names:
+        conn.execute(f'DROP TABLE IF EXISTS "{_fts_table(t)}"')
+    conn.executemany(f"DELETE FROM {TEXT_INDEX_CATALOG_TABLE} WHERE table_name = ?", [(t,) for t in table_names])
+
+
+def _change_log_gap(conn: sqlite3.Connection, since: int) -> bool:
+    """since 이후 기록 일부가 prune_change_log로 지워졌는지 (version은 빈틈 없이 증가)."""
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGE_LOG_TABLE,)).fetchone()
+    if not seq or seq[0] <= since:
+        return False
+    lo = conn.execute(f"SELECT MIN(version) FROM {CHANGE_LOG_TABLE}").fetchone()[0]
+    return lo is None or lo > since + 1
+
+
+def _sync_consult_table(table_name: str, rebuild: bool) -> dict:
+    out = {"table": table_name, "indexed": 0, "deleted": 0, "rebuilt": False, "rows": 0, "error": None}
+    conn = get_connection()
+    state = conn.execute(
+        f"SELECT customer_col, text_cols, version, row_count FROM {TEXT_INDEX_CATALOG_TABLE} WHERE table_name = ?",
+        (table_name,),
+    ).fetchone()
+    cust, cols = consult_text_columns(table_name) if table_name in _catalog.snapshot()["existing"] else (None, [])
+    if not cols:
+        if state:
+            with write_transaction() as conn:
+                _delete_consult_index(conn, [table_name])
+        return out
+    with write_transaction() as conn:
+        changes = get_changes_since(state[2], table_name) if state else []
+        full = (
+            rebuild or not state or state[0] != cust or json.loads(state[1] or "[]") != cols
+            or any(ch["op"] == "R" or ch["rowid_from"] is None for ch in changes)
+            or _change_log_gap(conn, state[2])
+        )
+        if not full and not changes:
+            out["rows"] = state[3]
+            return out
+        version = get_change_version()
+        fts = _fts_table(table_name)
+        if full:
+            conn.execute(f'DROP TABLE IF EXISTS "{fts}"')
+            conn.execute(f'CREATE VIRTUAL TABLE "{fts}" USING fts5(grams, cust UNINDEXED, tokenize = "unicode61")')
+            out["indexed"] = out["rows"] = _index_consult_rows(conn, table_name, cust, cols)
+            out["rebuilt"] = True
+        else:
+            for lo, hi in sorted({(ch["rowid_from"], ch["rowid_to"]) for ch in changes}):
+                out["deleted"] += conn.execute(f'DELETE FROM "{fts}" WHERE rowid BETWEEN ? AND ?', (lo, hi)).rowcount
+                out["indexed"] += _index_consult_rows(conn, table_name, cust, cols, "WHERE rowid BETWEEN ? AND ?", (lo, hi))
+            out["rows"] = state[3] + out["indexed"] - out["deleted"]
+        conn.execute(
+            f"""INSERT INTO {TEXT_INDEX_CATALOG_TABLE} (table_name, customer_col, text_cols, version, row_count, updated_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+                ON CONFLICT(table_name) DO UPDATE SET customer_col = excluded.customer_col, text_cols = excluded.text_cols,
+                    version = excluded.version, row_count = excluded.row_count, updated_at = excluded.updated_at""",
+            (table_name, cust, json.dumps(cols, ensure_ascii=False), version, out["rows"]),
+        )
+    return out
+
+
+def sync_consult_index(table_name: str | None = None, rebuild: bool = False) -> list[dict]:
+    """
+    상담 전문 검색 색인을 변경 로그 기준으로 최신화 (table_name 없으면 모든 상담 테이블 + 원본이 사라진 색인 정리).
+    rebuild=True면 전체 재색인. 반환: [ {"table", "indexed", "deleted", "rebuilt", "rows", "error"}, ... ]
+    """
     if not DB_PATH.exists():
-        return None
+        return []
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(f'PRAGMA table_info("{table_name}")')
-        target_cols = [r[1] for r in cur.fetchall()]
-        df_reindexed = df_one_row.reindex(columns=[c for c in target_cols if c in df_one_row.columns]).reindex(columns=target_cols)
-        df_filled = _fill_notnull_columns_for_insert(df_reindexed, conn, table_name)
-        tmp_name = "_tmp_append_one"
-        df_filled.to_sql(tmp_name, conn, if_exists="replace", index=False)
-        conn.execute(f'INSERT INTO "{table_name}" SELECT * FROM "{tmp_name}"')
-        conn.execute(f'DROP TABLE "{tmp_name}"')
-        conn.commit()
-        conn.close()
-        return None
-    except Exception as e:
-        return str(e).strip() or "알 수 없는 오류"
+        if table_name:
+            tables = [_sanitize_table_name(table_name)]
+        else:
+            indexed = [r[0] for r in get_connection().execute(f"SELECT table_name FROM {TEXT_INDEX_CATALOG_TABLE}")]
+            tables = list(dict.fromkeys([t for t in list_tables() if consult_text_columns(t)[1]] + indexed))
+    except Exception:
+        return []
+    out = []
+    with _consult_index_lock:
+        for t in tables:
+            try:
+                out.append(_sync_consult_table(t, rebuild))
+            except Exception as e:
+                out.append({"table": t, "indexed": 0, "deleted": 0, "rebuilt": False, "rows": 0, "error": str(e)})
+    return out
 
 
-def create_table_from_schema(
-    table_name: str,
-    columns: list[dict],
-    table_name_ko: str | None = None,
-) -> tuple[bool, str, str | None]:
+def get_consult_index_info() -> list[dict]:
     """
-    엑셀 양식 등에서 추출한 스키마로 빈 테이블 생성.
-    columns: [ {"컬럼명": "id", "속성명": "식별자", "데이터타입": "INTEGER", "PK": True, ... }, ... ]
-    table_name_ko: 테이블 한글명(엔티티명). 있으면 _table_comment에 저장.
-    컬럼 한글명은 각 col의 "컬럼 한글명" 또는 "속성명"으로 _column_comment에 저장.
-    반환: (성공여부, 실행한 CREATE SQL, 오류메시지 또는 None)
+    색인된 상담 테이블 목록: [ {"table", "customer_col", "text_cols", "rows", "version", "updated_at", "stale", "search_error"}, ... ]
+    stale: 색인 이후 원본 변경이 변경 로그에 있음 (sync_consult_index 전까지 검색 결과에 빠짐).
+    search_error: 마지막 search_consult가 이 테이블에서 실패했으면 그 메시지 (결과가 일부만 반환됨), 아니면 None.
     """
-    if not columns:
-        return False, "", "컬럼 정의가 비어 있습니다."
-    table_name = _sanitize_table_name(table_name)
-    # PK 컬럼 개수·이름 수집 (복수 PK일 때 테이블 수준 PRIMARY KEY 사용)
-    pk_names = []
-    for col in columns:
-        cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
-        pk_val = col.get("PK") if "PK" in col else col.get("pk")
-        pk = pk_val is True if isinstance(pk_val, bool) else _is_truthy(pk_val)
-        if pk:
-            pk_names.append(cname)
-    multi_pk = len(pk_names) >= 2
+    if not DB_PATH.exists():
+        return []
+    try:
+        rows = get_connection().execute(
+            f"""SELECT c.table_name, c.customer_col, c.text_cols, c.row_count, c.version, c.updated_at,
+                    (SELECT MAX(l.version) FROM {CHANGE_LOG_TABLE} l WHERE l.table_name = c.table_name)
+                FROM {TEXT_INDEX_CATALOG_TABLE} c ORDER BY c.table_name"""
+        ).fetchall()
+    except Exception:
+        return []
+    return [
+        {
+            "table": t, "customer_col": c, "text_cols": json.loads(cols or "[]"), "rows": n, "version": v,
+            "updated_at": at, "stale": latest is not None and latest > v, "search_error": _consult_search_errors.get(t),
+        }
+        for t, c, cols, n, v, at, latest in rows
+    ]
 
-    parts = []
-    for col in columns:
-        cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
-        raw_type = (col.get("type") or col.get("데이터타입", "TEXT"))
-        if raw_type is None or (isinstance(raw_type, float) and pd.isna(raw_type)):
-            raw_type = "TEXT"
-        ctype = _normalize_sqlite_type(str(raw_type).strip().upper())
-        pk_val = col.get("PK") if "PK" in col else col.get("pk")
-        pk = pk_val is True if isinstance(pk_val, bool) else _is_truthy(pk_val)
-        null_yn = str((col.get("Null여부") if "Null여부" in col else col.get("notnull")) or "").strip().upper()
-        notnull = null_yn in ("N", "NO", "아니오")
-        default = col.get("DEFAULT") if "DEFAULT" in col else col.get("default")
-        if default is not None and isinstance(default, float) and pd.isna(default):
-            default = None
-        if default is not None and str(default).strip() == "":
-            default = None
-        # 데이터길이: TEXT일 때 길이 제한 (CHECK)
-        data_len = col.get("데이터길이") if "데이터길이" in col else col.get("data_length")
-        length_val = None
-        if data_len is not None and not (isinstance(data_len, float) and pd.isna(data_len)):
-            try:
-                length_val = int(float(str(data_len).strip()))
-            except (ValueError, TypeError):
-                pass
-        # 소수점: REAL일 때 소수 자릿수 제한 (CHECK)
-        scale_raw = col.get("소수점") if "소수점" in col else col.get("scale")
-        scale_val = None
-        if scale_raw is not None and not (isinstance(scale_raw, float) and pd.isna(scale_raw)):
-            try:
-                scale_val = int(float(str(scale_raw).strip()))
-            except (ValueError, TypeError):
-                pass
-        seg = f'"{cname}" {ctype}'
-        # PK: 단일일 때만 컬럼 수준 PRIMARY KEY (AUTOINCREMENT는 INTEGER 단일 PK만)
-        if pk and not multi_pk:
-            if ctype == "INTEGER":
-                seg += " PRIMARY KEY AUTOINCREMENT"
-            else:
-                seg += " PRIMARY KEY"
-        if notnull and "PRIMARY KEY" not in seg:
-            seg += " NOT NULL"
-        if default is not None and str(default).strip():
-            dval = str(default).strip()
-            if dval.upper() in ("CURRENT_TIMESTAMP", "CURRENT_DATE", "CURRENT_TIME"):
-                seg += f" DEFAULT {dval}"
-            elif ctype == "INTEGER" or ctype == "REAL":
-                try:
-                    float(dval)
-                    seg += f" DEFAULT {dval}"
-                except ValueError:
-                    seg += f" DEFAULT '{_sql_quote_string(dval)}'"
-            else:
-                seg += f" DEFAULT '{_sql_quote_string(dval)}'"
-        if ctype == "TEXT" and length_val is not None and length_val > 0:
-            seg += f' CHECK(length("{cname}") <= {length_val})'
-        if ctype == "REAL" and scale_val is not None and scale_val >= 0:
-            seg += f' CHECK("{cname}" = round("{cname}", {scale_val}))'
-        parts.append(seg)
-    if multi_pk:
-        parts.append("PRIMARY KEY (" + ", ".join(f'"{n}"' for n in pk_names) + ")")
-    sql = f'CREATE TABLE IF NOT EXISTS "{table_name}" (\n  ' + ",\n  ".join(parts) + "\n)"
+
+def _consult_search_tables(table_name: str | None) -> list[str]:
+    """검색 대상 색인 테이블 (색인을 읽기만 함, 동기화는 적재 쪽에서). table_name 없으면 색인된 모든 상담 테이블."""
+    names = [i["table"] for i in get_consult_index_info()]
+    if table_name:
+        return [t for t in names if t == _sanitize_table_name(table_name)]
+    return names
+
+
+def _customer_key_variants(values) -> list:
+    """고객키 비교용 값 목록 (색인의 cust는 원본 저장 타입 그대로라 '101'과 101을 모두 넣음)."""
+    out = []
+    for v in values:
+        if isinstance(v, np.generic):
+            v = v.item()
+        out.append(v)
+        if isinstance(v, str) and v.strip().lstrip("-").isdigit():
+            out.append(int(v))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out.append(str(int(v)) if float(v).is_integer() else str(v))
+    return list(dict.fromkeys(out))
+
+
+def consult_keyword_hits(
+    terms=CONSULT_RISK_TERMS, customers: list | None = None, table_name: str | None = None
+) -> dict | None:
+    """
+    검색어별 고객별 상담 일치 건수. customers 지정 시 해당 고객만.
+    반환: { 고객키: {검색어: 건수} } (일치 없는 고객·검색어는 생략). 색인된 상담 테이블이 없거나 오류 시 None.
+    """
+    tables = _consult_search_tables(table_name)
+    if not tables:
+        return None
+    keys = _customer_key_variants(customers) if customers is not None else None
+    out: dict = {}
     try:
-        _ensure_dir()
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        _ensure_comment_tables(conn)
-        conn.execute(sql)
-        conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} (name) VALUES (?)", (table_name,))
-        # 테이블 한글명 저장
-        if table_name_ko is not None and str(table_name_ko).strip():
-            conn.execute(
-                f"INSERT OR REPLACE INTO {TABLE_COMMENT_TABLE} (table_name, name_ko) VALUES (?, ?)",
-                (table_name, str(table_name_ko).strip()),
-            )
-        # 컬럼 한글명 + 데이터타입/데이터길이/소수점/PK/Null여부/DEFAULT 저장
-        for col in columns:
-            cname = _sanitize_column_name(col.get("name") or col.get("컬럼명", "col"))
-            name_ko = col.get("컬럼 한글명") or col.get("속성명")
-            if name_ko is not None and not (isinstance(name_ko, float) and pd.isna(name_ko)):
-                name_ko = str(name_ko).strip() or None
-            else:
-                name_ko = None
-            raw_type = col.get("type") or col.get("데이터타입")
-            data_type = None if raw_type is None or (isinstance(raw_type, float) and pd.isna(raw_type)) else str(raw_type).strip() or None
-            data_len = col.get("데이터길이") or col.get("data_length")
-            data_length = None if data_len is None or (isinstance(data_len, float) and pd.isna(data_len)) else str(data_len).strip() or None
-            scale_raw = col.get("소수점") or col.get("scale")
-            scale_val = None if scale_raw is None or (isinstance(scale_raw, float) and pd.isna(scale_raw)) else str(scale_raw).strip() or None
-            pk_val = col.get("PK") if "PK" in col else col.get("pk")
-            pk = "Y" if (pk_val is True or _is_truthy(pk_val)) else "N"
-            null_yn = col.get("Null여부") or col.get("notnull")
-            null_yn = None if null_yn is None or (isinstance(null_yn, float) and pd.isna(null_yn)) else str(null_yn).strip() or None
-            default_val = col.get("DEFAULT") or col.get("default")
-            default_val = None if default_val is None or (isinstance(default_val, float) and pd.isna(default_val)) else str(default_val).strip() or None
-            conn.execute(
-                f"""INSERT OR REPLACE INTO {COLUMN_COMMENT_TABLE}
-                    (table_name, column_name, name_ko, data_type, data_length, scale_val, pk, null_yn, default_val)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (table_name, cname, name_ko, data_type, data_length, scale_val, pk, null_yn, default_val),
-            )
-        conn.commit()
-        conn.close()
-        return True, sql, None
-    except Exception as e:
-        return False, sql, str(e)
+        conn = get_connection()
+        info = {i["table"]: i for i in get_consult_index_info()}
+        for t in tables:
+            fts, cust_col = _fts_table(t), info[t]["customer_col"]
+            if keys is not None and not (cust_col and keys):
+                continue
+            for term in [terms] if isinstance(terms, str) else list(terms):
+                match = _consult_match(term)
+                if not match:
+                    continue
+                sql = f'SELECT cust, COUNT(*) FROM "{fts}" WHERE "{fts}" MATCH ?'
+                if keys is not None:
+                    # 고객 지정: 원본의 고객키 인덱스로 rowid를 좁힌 뒤 일치 확인 (일치 행 전체의 cust를 읽지 않음)
+                    sql += f' AND rowid IN (SELECT rowid FROM "{t}" WHERE "{cust_col}" IN ({", ".join("?" * len(keys))}))'
+                sql += " GROUP BY cust"
+                for cust, n in conn.execute(sql, [match] + (keys or [])).fetchall():
+                    hits = out.setdefault(cust, {})
+                    hits[term] = hits.get(term, 0) + n
+        return out
+    except Exception:
+        return None
 
 
-def _normalize_sqlite_type(raw: str) -> str:
-    """엑셀 데이터타입 문자열을 SQLite 타입으로 정규화."""
-    u = raw.upper().strip()
-    if not u or u in ("NAN", "NAT"):
-        return "TEXT"
-    if u in ("TEXT", "VARCHAR", "CHAR", "STRING", "NVARCHAR", "VARCHAR2", "CHARACTER", "문자"):
-        return "TEXT"
-    if u in ("INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "NUMBER", "NUMERIC", "정수"):
-        return "INTEGER"
-    if u in ("REAL", "FLOAT", "DOUBLE", "DECIMAL", "실수"):
-        return "REAL"
-    if u in ("BLOB", "BINARY"):
-        return "BLOB"
-    if u in ("DATE", "DATETIME", "TIMESTAMP", "날짜", "일시"):
-        return "TEXT"
-    return "TEXT"
+def top_consult_customers(terms, limit: int = 20, table_name: str | None = None) -> list[dict]:
+    """검색어(여러 개면 OR) 언급 상담이 많은 고객 순. 반환: [ {"customer", "hits"}, ... ]"""
+    match = _consult_match(terms)
+    if not match:
+        return []
+    counts: Counter = Counter()
+    try:
+        conn = get_connection()
+        for t in _consult_search_tables(table_name):
+            fts = _fts_table(t)
+            counts.update(dict(conn.execute(
+                f'SELECT cust, COUNT(*) FROM "{fts}" WHERE "{fts}" MATCH ? AND cust IS NOT NULL GROUP BY cust', (match,)
+            ).fetchall()))
+    except Exception:
+        return []
+    return [{"customer": c, "hits": n} for c, n in counts.most_common(max(1, int(limit)))]
 
 
-def _sql_quote_string(s: str) -> str:
-    """SQL 홑따옴표 리터럴용 이스케이프. ' → '' 로 하나만 치환하고, 이미 '' 인 부분은 다시 넣지 않아 홑따옴표 과다 방지."""
-    if not s:
-        return s
-    # 이미 ''(이스케이프된 따옴표)를 플레이스홀더로 치환 후, ' → '' 처리, 마지막에 플레이스홀더를 '' 로 복원
-    _ph = "\uE000"
-    return s.replace("''", _ph).replace("'", "''").replace(_ph, "''")
+def search_consult(
+    terms,
+    customer=None,
+    limit: int = 20,
+    table_name: str | None = None,
+    width: int = CONSULT_SNIPPET_CHARS,
+    mark: tuple[str, str] = ("**", "**"),
+) -> list[dict]:
+    """
+    검색어 일치 상담 (관련도 순)과 원문 스니펫. customer 지정 시 해당 고객만.
+    스니펫은 원문에서 첫 일치 위치 앞뒤 width자, 일치 부분은 mark로 감쌈.
+    테이블 하나에서 오류가 나면 그 테이블만 건너뛰고 get_consult_index_info의 search_error에 기록 (반환은 항상 limit 이하).
+    반환: [ {"table", "rowid", "customer", "column", "snippet"}, ... ]
+    """
+    match = _consult_match(terms)
+    if not match:
+        return []
+    words = [w for term in ([terms] if isinstance(terms, str) else terms) for w in str(term).split() if w]
+    pattern = re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)), re.IGNORECASE)
+    out = []
+    limit = max(1, int(limit))
+    try:
+        conn = get_connection()
+        info = {i["table"]: i for i in get_consult_index_info()}
+        tables = _consult_search_tables(table_name)
+    except Exception:
+        return []
+    for t in tables:
+        if customer is not None and not info[t]["customer_col"]:
+            continue
+        found = []
+        try:
+            fts, cols = _fts_table(t), info[t]["text_cols"]
+            sql = f'SELECT rowid, cust FROM "{fts}" WHERE "{fts}" MATCH ?'
+            params: list = [match]
+            if customer is not None:
+                keys = _customer_key_variants([customer])
+                sql += f' AND rowid IN (SELECT rowid FROM "{t}" WHERE "{info[t]["customer_col"]}" IN ({", ".join("?" * len(keys))}))'
+                params += keys
+            hits = conn.execute(sql + f" ORDER BY rank LIMIT {limit}", params).fetchall()
+            col_sql = ", ".join(f'"{c}"' for c in cols)
+            texts = {
+                r[0]: r[1:] for r in conn.execute(
+                    f'SELECT rowid, {col_sql} FROM "{t}" WHERE rowid IN ({", ".join("?" * len(hits))})', [h[0] for h in hits]
+                ).fetchall()
+            } if hits else {}
+            for rowid, cust in hits:
+                values = texts.get(rowid) or ()
+                col, snippet = (cols[0] if cols else None), ""
+                for c, v in zip(cols, values):
+                    m = pattern.search(str(v)) if v is not None else None
+                    if m:
+                        v = str(v)
+                        lo, hi = max(0, m.start() - width), min(len(v), m.end() + width)
+                        snippet = (
+                            ("…" if lo else "") + v[lo:m.start()] + mark[0] + m.group(0) + mark[1]
+                            + v[m.end():hi] + ("…" if hi < len(v) else "")
+                        )
+                        col = c
+                        break
+                else:
+                    first = next((str(v) for v in values if v is not None), "")
+                    snippet = first[: 2 * width] + ("…" if len(first) > 2 * width else "")
+                found.append({"table": t, "rowid": rowid, "customer": cust, "column": col, "snippet": snippet})
+        except Exception as e:
+            # 이 테이블만 건너뜀 → get_consult_index_info()의 search_error로 확인
+            _consult_search_errors[t] = str(e).strip() or type(e).__name__
+            continue
+        _consult_search_errors.pop(t, None)
+        out.extend(found)
+    return out[:limit]
 
 
-def _is_truthy(v) -> bool:
-    """PK/Null여부 등 엑셀 값이 Y/예/1/TRUE 등인지."""
-    if v is None or (isinstance(v, float) and pd.isna(v)):
-        return False
-    s = str(v).strip().upper()
-    return s in ("Y", "YES", "예", "1", "TRUE", "T", "O", "○")
+# ---- 서버 측 페이지 조회 (데이터 보기) ----
 
+FILTER_OPS = ("=", "!=", ">", ">=", "<", "<=", "LIKE", "NOT LIKE", "IS NULL", "IS NOT NULL")
 
-def get_table_comment(table_name: str) -> str | None:
-    """테이블 한글명 반환. 없으면 None."""
-    if not DB_PATH.exists():
-        return None
+
+def _build_filter_clause(table_name: str, filters: list | None) -> tuple[str, list]:
+    """
+    filters: [(column, op, value), ...] → ("WHERE ...", params). op는 FILTER_OPS만 허용.
+    테이블에 없는 컬럼·허용되지 않은 연산자는 ValueError. 조건이 없으면 ("", []).
+    """
+    if not filters:
+        return "", []
+    cols = {r[1] for r in _catalog.table_info(table_name)}
+    parts, params = [], []
+    for f in filters:
+        col, op = f[0], str(f[1]).upper().strip()
+        if col not in cols:
+            raise ValueError(f"컬럼 없음: {col}")
+        if op not in FILTER_OPS:
+            raise ValueError(f"지원하지 않는 조건: {op}")
+        if op in ("IS NULL", "IS NOT NULL"):
+            parts.append(f'"{col}" {op}')
+        else:
+            parts.append(f'"{col}" {op} ?')
+            params.append(f[2] if len(f) > 2 else None)
+    return "WHERE " + " AND ".join(parts), params
+
+
+@_cached_read(_table_arg)
+def count_table_rows(table_name: str, filters: list | None = None) -> int:
+    """조건(filters)에 맞는 행 수. 조건이 없으면 get_table_row_count와 같음. 오류 시 0."""
+    if not table_name or not DB_PATH.exists():
+        return 0
     table_name = _sanitize_table_name(table_name)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(
-            f"SELECT name_ko FROM {TABLE_COMMENT_TABLE} WHERE table_name = ?",
-            (table_name,),
-        )
-        row = cur.fetchone()
-        conn.close()
-        return row[0] if row and row[0] else None
+        where, params = _build_filter_clause(table_name, filters)
+        conn = get_connection()
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}" {where}', params).fetchone()[0]
     except Exception:
-        return None
+        return 0
 
 
-def get_column_comments(table_name: str) -> dict[str, str]:
-    """테이블별 컬럼 한글명 매핑. { column_name: name_ko }"""
-    if not DB_PATH.exists():
-        return {}
+@_cached_read(_table_arg)
+def query_table_page(
+    table_name: str,
+    page_size: int = 50,
+    order_by: str | None = None,
+    descending: bool = False,
+    filters: list | None = None,
+    after: tuple | None = None,
+    offset: int = 0,
+) -> dict:
+    """
+    테이블의 한 페이지만 SQL로 조회 (전체 로드 없음).
+    정렬: order_by 컬럼 + rowid(동일 값 구분). after(이전 페이지 마지막 행의 커서)가 있으면 keyset,
+    없으면 OFFSET(페이지 점프용)으로 시작 위치 지정.
+    반환: {"df": DataFrame, "next_after": 다음 페이지 커서 또는 None, "sql": 실행 SQL}
+    """
+    out = {"df": pd.DataFrame(), "next_after": None, "sql": ""}
+    if not table_name or not DB_PATH.exists():
+        return out
     table_name = _sanitize_table_name(table_name)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(
-            f"SELECT column_name, name_ko FROM {COLUMN_COMMENT_TABLE} WHERE table_name = ?",
-            (table_name,),
+        cols = [r[1] for r in _catalog.table_info(table_name)]
+        if order_by and order_by not in cols:
+            raise ValueError(f"컬럼 없음: {order_by}")
+        where, params = _build_filter_clause(table_name, filters)
+        conds = [where[len("WHERE "):]] if where else []
+        if after is not None:
+            if order_by:
+                v, rid = after
+                if not descending:  # ASC: NULL 먼저
+                    if v is None:
+                        conds.append(f'(("{order_by}" IS NULL AND rowid > ?) OR "{order_by}" IS NOT NULL)')
+                        params.append(rid)
+                    else:
+                        conds.append(f'("{order_by}" > ? OR ("{order_by}" = ? AND rowid > ?))')
+                        params.extend([v, v, rid])
+                else:  # DESC: NULL 마지막
+                    if v is None:
+                        conds.append(f'("{order_by}" IS NULL AND rowid < ?)')
+                        params.append(rid)
+                    else:
+                        conds.append(f'("{order_by}" < ? OR ("{order_by}" = ? AND rowid < ?) OR "{order_by}" IS NULL)')
+                        params.extend([v, v, rid])
+            else:
+                conds.append("rowid > ?")
+                params.append(after[-1])
+        direction = "DESC" if descending else "ASC"
+        order_sql = (f'"{order_by}" {direction}, rowid {direction}' if order_by else "rowid ASC")
+        sql = (
+            f'SELECT rowid AS "__rowid__", * FROM "{table_name}"'
+            + (" WHERE " + " AND ".join(conds) if conds else "")
+            + f" ORDER BY {order_sql} LIMIT {max(1, int(page_size))}"
         )
-        out = {row[0]: row[1] for row in cur.fetchall() if row[1]}
-        conn.close()
+        if after is None and offset:
+            sql += f" OFFSET {max(0, int(offset))}"
+        conn = get_connection()
+        df = pd.read_sql(sql, conn, params=params)
+        out["sql"] = sql
+        if len(df) == max(1, int(page_size)):
+            last = df.iloc[-1]
+            rid = int(last["__rowid__"])
+            v = last[order_by] if order_by else None
+            if order_by and pd.isna(v):
+                v = None
+            elif hasattr(v, "item"):
+                v = v.item()
+            out["next_after"] = (v, rid) if order_by else (rid,)
+        out["df"] = df.drop(columns=["__rowid__"])
         return out
     except Exception:
-        return {}
+        return out
 
 
-def get_column_data_lengths(table_name: str) -> dict[str, int]:
+@_cached_read(_table_arg)
+def get_table_column_stats(table_name: str, sample_rows: int | None = None) -> list[dict]:
     """
-    _column_comment의 data_length 조회. { column_name: max_length } (없거나 숫자 변환 실패 시 제외).
-    샘플 데이터 생성 시 해당 길이를 넘지 않도록 참고용.
+    컬럼별 건수·결측 수·유일값 수를 SQL 한 번으로 집계 (전체 로드 없음). 유효한 컬럼형 스냅샷이 있으면 그 통계 사용.
+    sample_rows 지정 시 앞쪽 N행만 집계 (대용량 테이블 빠른 확인용).
+    반환: [ {"name", "type", "non_null", "nulls", "distinct"}, ... ]
     """
-    if not DB_PATH.exists():
-        return {}
+    if not table_name or not DB_PATH.exists():
+        return []
     table_name = _sanitize_table_name(table_name)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        _ensure_comment_tables(conn)
-        cur = conn.execute(
-            f"SELECT column_name, data_length FROM {COLUMN_COMMENT_TABLE} WHERE table_name = ? AND data_length IS NOT NULL AND data_length != ''",
-            (table_name,),
-        )
-        out = {}
-        for row in cur.fetchall():
-            try:
-                n = int(float(str(row[1]).strip()))
-                if n > 0:
-                    out[row[0]] = n
-            except (ValueError, TypeError):
-                pass
-        conn.close()
+        info = _catalog.table_info(table_name)
+        if not info:
+            return []
+        if not sample_rows and _columnar["enabled"]:
+            # 유효한 컬럼형 스냅샷이 있으면 생성 시 계산해 둔 건수·유일값 사용
+            m, total = _columnar_manifest(table_name)
+            if m is not None:
+                return [
+                    {
+                        "name": r[1],
+                        "type": (r[2] or "TEXT").upper(),
+                        "non_null": c["non_null"],
+                        "nulls": total - c["non_null"],
+                        "distinct": c["distinct"],
+                    }
+                    for r, c in zip(info, m["columns"])
+                ]
+        src = f'"{table_name}"'
+        if sample_rows:
+            src = f'(SELECT * FROM "{table_name}" LIMIT {int(sample_rows)})'
+        exprs = ["COUNT(*)"]
+        for r in info:
+            exprs.append(f'COUNT("{r[1]}")')
+            exprs.append(f'COUNT(DISTINCT "{r[1]}")')
+        sql = f"SELECT {', '.join(exprs)} FROM {src}"
+        # 앞쪽 N행 표본은 행 순서가 있는 SQLite에서, 전체 집계는 분석 엔진이 duckdb면 DuckDB에서
+        duck = None if sample_rows else _duck_query(sql, tables=[table_name])
+        row = duck.iloc[0].tolist() if duck is not None else get_connection().execute(sql).fetchone()
+        total = row[0]
+        out = []
+        for i, r in enumerate(info):
+            non_null, distinct = row[1 + 2 * i], row[2 + 2 * i]
+            out.append({
+                "name": r[1],
+                "type": (r[2] or "TEXT").upper(),
+                "non_null": int(non_null),
+                "nulls": int(total - non_null),
+                "distinct": int(distinct),
+            })
         return out
     except Exception:
-        return {}
+        return []
+
+
+# ---- 고객 세그 건수 (SQL 실행) ----
+
+SEGMENT_JOIN_KEYS = ("CSTNO", "customer_id", "고객_id", "고객_ID", "id")  # 다중 테이블 INTERSECT 키 후보 (순서대로)
+
+
+def _is_numeric_affinity(decl_type: str | None) -> bool:
+    """SQLite 선언 타입이 INTEGER/REAL/NUMERIC 친화성인지 (TEXT·BLOB·미지정이면 False)."""
+    u = (decl_type or "").upper()
+    if not u or "CHAR" in u or "CLOB" in u or "TEXT" in u or "BLOB" in u:
+        return False
+    return True
+
+
+def format_sql_with_params(sql: str, params: list | tuple) -> str:
+    """? 자리에 파라미터를 리터럴로 채운 표시용 SQL (복사해 그대로 실행 가능)."""
+    it = iter(params or [])
+
+    def _lit(_m):
+        v = next(it, None)
+        if v is None:
+            return "NULL"
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return repr(v)
+        return "'" + str(v).replace("'", "''") + "'"
+
+    return re.sub(r"\?", _lit, sql)
 
 
-def save_column_min_max_batch(rows: list[dict]) -> tuple[int, str | None]:
+def count_segment_customers(conditions_by_table: dict[str, list[tuple[str, dict]]]) -> dict:
     """
-    테이블·컬럼별 min/max 정의를 DB에 저장(INSERT OR REPLACE).
-    rows: [{"table_name": str, "column_name": str, "min_val": str|None, "max_val": str|None}, ...]
-    반환: (저장 건수, 오류 메시지 또는 None)
+    테이블별 조건 {테이블: [(컬럼, interval), ...]}을 파라미터 SQL로 만들어 SQLite에서 건수 계산.
+    interval: {"low", "high"} → BETWEEN, {"value"} → =. TEXT 컬럼의 구간은 CAST(... AS REAL)로 숫자 비교.
+    단일 테이블은 조건에 맞는 행 수, 다중 테이블은 공통 고객키(SEGMENT_JOIN_KEYS)로 테이블별 DISTINCT 키를 INTERSECT한 고객 수.
+    공통 키가 없으면 첫 테이블 건수. 분석 엔진이 duckdb면 같은 SQL을 DuckDB로 실행 (sql은 SQLite 기준으로 표시).
+    반환: {"count", "sql", "params", "elapsed_ms", "join_key", "engine", "notes": [주석 문자열]}
     """
-    if not rows:
-        return 0, None
-    try:
-        _ensure_dir()
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        _ensure_comment_tables(conn)
-        cur = conn.cursor()
-        saved = 0
-        for r in rows:
-            t = _sanitize_table_name((r.get("table_name") or r.get("테이블명") or "").strip())
-            c = _sanitize_column_name((r.get("column_name") or r.get("컬럼명") or "").strip())
-            if not t or not c:
+    out = {"count": 0, "sql": "", "params": [], "elapsed_ms": 0.0, "join_key": None, "engine": "sqlite", "notes": []}
+    if not DB_PATH.exists():
+        out["notes"].append("DB에 테이블이 없습니다.")
+        return out
+    existing = set(list_tables())
+    parts = []  # (table, where_sql, params)
+    for tname, cols_intervals in conditions_by_table.items():
+        if tname not in existing:
+            out["notes"].append(f"테이블 '{tname}' 없음")
+            continue
+        types = {r[1]: r[2] for r in _catalog.table_info(tname)}
+        conds, params = [], []
+        for col, iv in cols_intervals:
+            if col not in types:
+                out["notes"].append(f"{tname}.{col} (컬럼 없음)")
                 continue
-            min_v = r.get("min_val") or r.get("min") or r.get("MIN") or r.get("최소")
-            max_v = r.get("max_val") or r.get("max") or r.get("MAX") or r.get("최대")
-            if min_v is not None and isinstance(min_v, float) and pd.isna(min_v):
-                min_v = None
-            if max_v is not None and isinstance(max_v, float) and pd.isna(max_v):
-                max_v = None
-            min_s = None if min_v is None else str(min_v).strip() or None
-            max_s = None if max_v is None else str(max_v).strip() or None
-            cur.execute(
-                f"""INSERT OR REPLACE INTO {COLUMN_MIN_MAX_TABLE}
-                    (table_name, column_name, min_val, max_val) VALUES (?, ?, ?, ?)""",
-                (t, c, min_s, max_s),
-            )
-            saved += 1
-        conn.commit()
-        conn.close()
-        return saved, None
-    except Exception as e:
-        return 0, str(e)
+            ref = f'"{col}"' if _is_numeric_affinity(types[col]) else f'CAST("{col}" AS REAL)'
+            if "low" in iv and "high" in iv:
+                try:
+                    lo, hi = float(iv["low"]), float(iv["high"])
+                except (TypeError, ValueError):
+                    out["notes"].append(f"{tname}.{col} (구간 파싱 실패)")
+                    continue
+                conds.append(f"{ref} BETWEEN ? AND ?")
+                params.extend([lo, hi])
+            elif "value" in iv:
+                conds.append(f'"{col}" = ?')
+                params.append(str(iv["value"]))
+            else:
+                out["notes"].append(f"{tname}.{col} (조건 없음)")
+        parts.append((tname, " AND ".join(conds), params))
+    if not parts:
+        return out
 
+    if len(parts) > 1:
+        for k in SEGMENT_JOIN_KEYS:
+            if all(k in {r[1] for r in _catalog.table_info(t)} for t, _, _ in parts):
+                out["join_key"] = k
+                break
+        if out["join_key"] is None:
+            out["notes"].append("다중 테이블(조인 키 미검출). 첫 테이블 기준 건수.")
+            parts = parts[:1]
 
-def get_column_min_max(table_name: str | None = None) -> dict:
-    """
-    컬럼별 min/max 조회.
-    table_name이 있으면 { column_name: {"min": str|None, "max": str|None} }
-    없으면 { table_name: { column_name: {"min", "max"} } }
-    """
-    if not DB_PATH.exists():
-        return {}
+    def _where(w):
+        return f" WHERE {w}" if w else ""
+
+    if len(parts) == 1:
+        tname, where, params = parts[0]
+        sql = f'SELECT COUNT(*) FROM "{tname}"{_where(where)}'
+    else:
+        k = out["join_key"]
+        subs = [f'SELECT "{k}" FROM "{t}"{_where(w)}' for t, w, _ in parts]
+        sql = "SELECT COUNT(*) FROM (\n  " + "\n  INTERSECT\n  ".join(subs) + "\n)"
+        params = [p for _, _, ps in parts for p in ps]
+    out["sql"], out["params"] = sql, params
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        _ensure_comment_tables(conn)
-        if table_name:
-            t = _sanitize_table_name(table_name)
-            cur = conn.execute(
-                f"SELECT column_name, min_val, max_val FROM {COLUMN_MIN_MAX_TABLE} WHERE table_name = ?",
-                (t,),
-            )
-            out = {row[0]: {"min": row[1], "max": row[2]} for row in cur.fetchall()}
+        started = time.perf_counter()
+        duck = _duck_query(_duckdb_sql(sql), params, tables=[t for t, _, _ in parts])
+        if duck is not None:
+            out["count"] = int(duck.iloc[0, 0])
+            out["engine"] = "duckdb"
         else:
-            cur = conn.execute(
-                f"SELECT table_name, column_name, min_val, max_val FROM {COLUMN_MIN_MAX_TABLE}"
-            )
-            out = {}
-            for row in cur.fetchall():
-                t, c, mn, mx = row[0], row[1], row[2], row[3]
-                if t not in out:
-                    out[t] = {}
-                out[t][c] = {"min": mn, "max": mx}
-        conn.close()
-        return out
-    except Exception:
-        return {}
+            out["count"] = get_connection().execute(sql, params).fetchone()[0]
+        out["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        out["notes"].append(f"실행 오류: {e}")
+    return out
 
 
-def get_table_row_count(table_name: str) -> int:
-    """테이블의 현재 행 수 반환. 테이블이 없거나 오류 시 0."""
-    if not table_name or not DB_PATH.exists():
-        return 0
-    table_name = _sanitize_table_name(table_name)
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"')
-        n = cur.fetchone()[0]
-        conn.close()
-        return n
-    except Exception:
-        return 0
+# ---- 고객별 집계 (GROUP BY 1회로 고객 요약) ----
 
+SUMMARY_TEXT_LIMIT = 200  # 고객별 텍스트 이어붙이기 최대 길이
 
-def load_table(table_name: str, limit: int | None = None) -> pd.DataFrame | None:
-    """지정한 테이블명의 데이터를 DataFrame으로 반환. 없거나 오류 시 None. limit 지정 시 해당 행 수만 읽음(통계 등 빠른 조회용)."""
-    if not table_name or not DB_PATH.exists():
+
+def _duck_aggregate_by_customer(
+    table_name: str, key_column: str, sums: list[str], texts: list[str], firsts: list[str], lasts: list[str], limit: int
+) -> pd.DataFrame | None:
+    """aggregate_by_customer의 DuckDB 버전 (GROUP BY 한 번에 first/last까지). 엔진이 sqlite거나 실패하면 None."""
+    if _analytic["engine"] != "duckdb":
+        return None
+    k = f'"{key_column}"'
+    selects = [k, 'COUNT(*) AS "_rows"']
+    selects += [f'COALESCE(SUM("{c}"), 0) AS "{c}"' for c in sums]
+    selects += [
+        f"COALESCE(substr(string_agg(CAST(\"{c}\" AS VARCHAR), ' ' ORDER BY rowid), 1, {limit}), '') AS \"{c}\""
+        for c in texts
+    ]
+    done = set(sums) | set(texts)
+    for cols, pick in ((firsts, "arg_min"), (lasts, "arg_max")):
+        for c in cols:
+            if c not in done:
+                done.add(c)
+                selects.append(f'{pick}("{c}", rowid) FILTER (WHERE "{c}" IS NOT NULL) AS "{c}"')
+    return _duck_query(
+        f'SELECT {", ".join(selects)} FROM "{table_name}" WHERE {k} IS NOT NULL GROUP BY {k}', tables=[table_name]
+    )
+
+
+@_cached_read(_table_arg)
+def aggregate_by_customer(
+    table_name: str,
+    key_column: str,
+    columns: list[str] | None = None,
+    sum_columns: list[str] | None = None,
+    text_columns: list[str] | None = None,
+    first_columns: list[str] | None = None,
+    last_columns: list[str] | None = None,
+    text_limit: int = SUMMARY_TEXT_LIMIT,
+) -> pd.DataFrame | None:
+    """
+    고객키(key_column)별로 테이블을 한 번에 집계해 DataFrame 반환 (고객마다 테이블을 다시 필터링하지 않음).
+    columns: 선언 타입이 숫자 친화성이면 SUM, 그 외(텍스트)는 GROUP_CONCAT. 타입 미지정 컬럼은 프로파일상 전부 숫자일 때 SUM.
+    sum_columns / text_columns: 집계 방식을 직접 지정. text는 rowid 순으로 공백 연결 후 text_limit 자로 자름.
+    first_columns / last_columns: 고객별 첫/마지막(rowid 기준) NULL 아닌 값.
+    반환 컬럼: key_column, "_rows"(행 수), 지정 컬럼들. 키가 NULL인 행은 제외. 없거나 오류 시 None.
+    분석 엔진이 duckdb면 같은 집계를 DuckDB 한 번으로 (first/last는 arg_min/arg_max).
+    """
+    if not table_name or not key_column or not DB_PATH.exists():
         return None
     table_name = _sanitize_table_name(table_name)
+    types = {r[1]: r[2] for r in _catalog.table_info(table_name)}
+    if key_column not in types:
+        return None
+
+    def _valid(cols):
+        return [c for c in dict.fromkeys(cols or []) if c in types and c != key_column]
+
+    sums, texts = _valid(sum_columns), _valid(text_columns)
+    auto = [c for c in _valid(columns) if c not in sums and c not in texts]
+    if auto:
+        profile = get_column_profile(table_name)
+        for c in auto:
+            p = profile.get(c) or {}
+            numeric = _is_numeric_affinity(types[c]) if types[c] else 0 < (p.get("numeric") or 0) == p.get("non_null")
+            (sums if numeric else texts).append(c)
+    limit = max(1, int(text_limit))
+    k = f'"{key_column}"'
+    out = _duck_aggregate_by_customer(
+        table_name, key_column, sums, texts, _valid(first_columns), _valid(last_columns), limit
+    )
+    if out is not None:
+        return out
+    selects = [k, 'COUNT(*) AS "_rows"']
+    selects += [f'COALESCE(SUM("{c}"), 0) AS "{c}"' for c in sums]
+    selects += [f"COALESCE(substr(GROUP_CONCAT(\"{c}\", ' '), 1, {limit}), '') AS \"{c}\"" for c in texts]
+    src = f'"{table_name}"'
+    if texts:
+        # GROUP_CONCAT 순서는 입력 순서를 따르므로 키·rowid 순으로 정렬된 입력을 사용
+        src = f'(SELECT * FROM "{table_name}" WHERE {k} IS NOT NULL ORDER BY {k}, rowid)'
     try:
-        conn = sqlite3.connect(DB_PATH)
-        q = f'SELECT * FROM "{table_name}"'
-        if limit is not None and limit > 0:
-            q += f" LIMIT {int(limit)}"
-        df = pd.read_sql(q, conn)
-        conn.close()
-        return df if not df.empty else None
+        conn = get_connection()
+        out = pd.read_sql_query(f"SELECT {', '.join(selects)} FROM {src} WHERE {k} IS NOT NULL GROUP BY {k}", conn)
+        for cols, pick in ((first_columns, "MIN"), (last_columns, "MAX")):
+            for c in _valid(cols):
+                if c in out.columns:
+                    continue
+                # SQLite: MIN/MAX 집계와 함께 쓴 일반 컬럼은 그 행의 값을 가짐
+                part = pd.read_sql_query(
+                    f'SELECT {k}, "{c}", {pick}(rowid) AS "_rid" FROM "{table_name}" '
+                    f'WHERE {k} IS NOT NULL AND "{c}" IS NOT NULL GROUP BY {k}',
+                    conn,
+                )
+                out = out.merge(part[[key_column, c]], on=key_column, how="left")
+        return out
     except Exception:
         return None
 
@@ -625,12 +4338,14 @@ def clear_table(table_name: str) -> bool:
         return True
     table_name = _sanitize_table_name(table_name)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
-        conn.execute(f"DELETE FROM {META_TABLE} WHERE name = ?", (table_name,))
-        conn.commit()
-        conn.close()
+        with write_transaction(table_name, metadata=True) as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            conn.execute(f"DELETE FROM {META_TABLE} WHERE name = ?", (table_name,))
+            _delete_column_profile(conn, [table_name])
+            _delete_partitions(conn, [table_name])
+            _delete_consult_index(conn, [table_name])
+            _log_change(conn, table_name, "D")
+        _remigrate_if_managed(conn, [table_name])
         return True
     except Exception:
         return False
@@ -641,58 +4356,22 @@ def clear_all_tables() -> bool:
     if not DB_PATH.exists():
         return True
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        for row in conn.execute(f"SELECT name FROM {META_TABLE}").fetchall():
-            name = row[0]
-            conn.execute(f'DROP TABLE IF EXISTS "{name}"')
-        conn.execute(f"DELETE FROM {META_TABLE}")
-        conn.commit()
-        conn.close()
+        with write_transaction(metadata=True) as conn:
+            dropped = [row[0] for row in conn.execute(f"SELECT name FROM {META_TABLE}").fetchall()]
+            for name in dropped:
+                conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+                _log_change(conn, name, "D")
+            conn.execute(f"DELETE FROM {META_TABLE}")
+            _delete_column_profile(conn, dropped)
+            _delete_partitions(conn, dropped)
+            _delete_consult_index(conn, dropped)
+        mark_tables_changed(*dropped)
+        _remigrate_if_managed(conn, dropped)
         return True
     except Exception:
         return False
 
 
-def _ensure_extraction_tables(conn: sqlite3.Connection):
-    """조회 조건·조회 결과 테이블이 없으면 생성 (감사 컬럼 포함)."""
-    conn.execute(f"""
-        CREATE TABLE IF NOT EXISTS {TABLE_EXTRACTION_CRITERIA} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            {COL_CREATED_DATE} TEXT,
-            {COL_CREATED_TIME} TEXT,
-            {COL_CREATED_BY} TEXT,
-            {COL_UPDATED_DATE} TEXT,
-            {COL_UPDATED_TIME} TEXT,
-            {COL_UPDATED_BY} TEXT,
-            {COL_CRITERIA_PROFITABILITY_MIN} INTEGER,
-            {COL_CRITERIA_SOUNDNESS_MIN} INTEGER,
-            {COL_CRITERIA_RISK_MAX} INTEGER
-        )
-    """)
-    conn.execute(f"""
-        CREATE TABLE IF NOT EXISTS {TABLE_EXTRACTION_RESULT} (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            {COL_CRITERIA_ID} INTEGER NOT NULL REFERENCES {TABLE_EXTRACTION_CRITERIA}(id),
-            {COL_CREATED_DATE} TEXT,
-            {COL_CREATED_TIME} TEXT,
-            {COL_CREATED_BY} TEXT,
-            {COL_UPDATED_DATE} TEXT,
-            {COL_UPDATED_TIME} TEXT,
-            {COL_UPDATED_BY} TEXT,
-            {COL_CUSTOMER_ID} TEXT,
-            {COL_CUSTOMER_NAME} TEXT,
-            {COL_PROFITABILITY_SCORE} INTEGER,
-            {COL_SOUNDNESS_SCORE} INTEGER,
-            {COL_RISK_SCORE} INTEGER,
-            {COL_AI_REASONING} TEXT
-        )
-    """)
-    for name in (TABLE_EXTRACTION_CRITERIA, TABLE_EXTRACTION_RESULT):
-        conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (name) VALUES (?)", (name,))
-    conn.commit()
-
-
 def save_extraction_run(
     criteria: dict,
     result_list: list[dict],
@@ -711,29 +4390,27 @@ def save_extraction_run(
     now = datetime.now()
     cd, ct = now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")
     try:
-        _ensure_dir()
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        _ensure_extraction_tables(conn)
-        cur = conn.execute(
-            f"""
-            INSERT INTO {TABLE_EXTRACTION_CRITERIA} (
-                {COL_CREATED_DATE}, {COL_CREATED_TIME}, {COL_CREATED_BY},
-                {COL_UPDATED_DATE}, {COL_UPDATED_TIME}, {COL_UPDATED_BY},
-                {COL_CRITERIA_PROFITABILITY_MIN}, {COL_CRITERIA_SOUNDNESS_MIN}, {COL_CRITERIA_RISK_MAX}
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                cd, ct, created_by or "",
-                cd, ct, updated_by or "",
-                criteria.get("수익성 이상"),
-                criteria.get("건전성 이상"),
-                criteria.get("리스크 이하"),
-            ),
-        )
-        criteria_id = cur.lastrowid
-        for c in result_list:
-            conn.execute(
+        with write_transaction(TABLE_EXTRACTION_CRITERIA, TABLE_EXTRACTION_RESULT) as conn:
+            before_result = _max_rowid(conn, TABLE_EXTRACTION_RESULT)
+            cur = conn.execute(
+                f"""
+                INSERT INTO {TABLE_EXTRACTION_CRITERIA} (
+                    {COL_CREATED_DATE}, {COL_CREATED_TIME}, {COL_CREATED_BY},
+                    {COL_UPDATED_DATE}, {COL_UPDATED_TIME}, {COL_UPDATED_BY},
+                    {COL_CRITERIA_PROFITABILITY_MIN}, {COL_CRITERIA_SOUNDNESS_MIN}, {COL_CRITERIA_RISK_MAX}
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    cd, ct, created_by or "",
+                    cd, ct, updated_by or "",
+                    criteria.get("수익성 이상"),
+                    criteria.get("건전성 이상"),
+                    criteria.get("리스크 이하"),
+                ),
+            )
+            criteria_id = cur.lastrowid
+            _log_change(conn, TABLE_EXTRACTION_CRITERIA, "I", criteria_id, criteria_id, 1)
+            conn.executemany(
                 f"""
                 INSERT INTO {TABLE_EXTRACTION_RESULT} (
                     {COL_CRITERIA_ID}, {COL_CREATED_DATE}, {COL_CREATED_TIME}, {COL_CREATED_BY},
@@ -743,20 +4420,23 @@ def save_extraction_run(
                     {COL_AI_REASONING}
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                (
-                    criteria_id, cd, ct, created_by or "", cd, ct, updated_by or "",
-                    c.get("고객_ID"), c.get("고객명"),
-                    c.get("수익성"), c.get("건전성"), c.get("리스크"),
-                    ai_reasoning or "",
-                ),
+                [
+                    (
+                        criteria_id, cd, ct, created_by or "", cd, ct, updated_by or "",
+                        c.get("고객_ID"), c.get("고객명"),
+                        c.get("수익성"), c.get("건전성"), c.get("리스크"),
+                        ai_reasoning or "",
+                    )
+                    for c in result_list
+                ],
             )
-        conn.commit()
-        conn.close()
+            log_table_append(conn, TABLE_EXTRACTION_RESULT, before_result, len(result_list))
         return True
     except Exception:
         return False
 
 
+@_cached_read(lambda: [TABLE_EXTRACTION_CRITERIA, TABLE_EXTRACTION_RESULT])
 def load_extraction_result_with_criteria() -> pd.DataFrame | None:
     """
     extraction_result와 extraction_criteria를 criteria_id로 조인한 결과 반환.
@@ -765,7 +4445,7 @@ def load_extraction_result_with_criteria() -> pd.DataFrame | None:
     if not DB_PATH.exists():
         return None
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         q = f"""
             SELECT r.*,
                    c.{COL_CREATED_DATE} AS criteria_created_date,
@@ -778,7 +4458,6 @@ def load_extraction_result_with_criteria() -> pd.DataFrame | None:
             ORDER BY r.{COL_CRITERIA_ID} DESC, r.id
         """
         df = pd.read_sql(q, conn)
-        conn.close()
         return df if not df.empty else None
     except Exception:
         return None
@@ -810,16 +4489,16 @@ def clear_uploaded_data(table_name: str | None = None) -> bool:
 
 # --- ERD 시각화 연동: 테이블·컬럼 스키마 조회 및 JSON 파일 갱신 ---
 
+@_cached_read(_table_arg)
 def table_has_rows(table_name: str) -> bool:
     """테이블에 1건 이상 있는지만 확인 (전체 로드 없이 빠르게)."""
     table_name = _sanitize_table_name(table_name)
     if not table_name or not DB_PATH.exists():
         return False
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cur = conn.execute(f'SELECT 1 FROM "{table_name}" LIMIT 1')
         has = cur.fetchone() is not None
-        conn.close()
         return has
     except Exception:
         return False
@@ -832,20 +4511,313 @@ def update_ml_crm_segment_interpretations(run_key: str, updates: list[tuple]) ->
     """
     if not run_key or not DB_PATH.exists():
         return False
+    if not updates:
+        return True
     try:
-        conn = sqlite3.connect(DB_PATH)
-        for seg_cd, interpretation in updates:
-            conn.execute(
+        with write_transaction(ML_SEGMENTS_TABLE) as conn:
+            conn.executemany(
                 f"""UPDATE {ML_SEGMENTS_TABLE} SET SEGMENT_INTERPRETATION = ? WHERE RUN_KEY = ? AND SEGMENT_CD = ?""",
-                (interpretation or "", run_key, seg_cd),
+                [(interpretation or "", run_key, seg_cd) for seg_cd, interpretation in updates],
             )
-        conn.commit()
-        conn.close()
+            # 갱신된 행 rowid를 한 번에 조회해 연속 구간 단위로 변경 로그 기록
+            codes = list({seg_cd for seg_cd, _ in updates})
+            rowids = []
+            for start in range(0, len(codes), 500):
+                part = codes[start:start + 500]
+                rowids += [r[0] for r in conn.execute(
+                    f"SELECT rowid FROM {ML_SEGMENTS_TABLE} WHERE RUN_KEY = ? AND SEGMENT_CD IN ({', '.join('?' * len(part))})",
+                    [run_key, *part],
+                ).fetchall()]
+            for lo, hi, n in _runs(rowids):
+                _log_change(conn, ML_SEGMENTS_TABLE, "U", lo, hi, n)
+        return True
+    except Exception:
+        return False
+
+
+# ---- ML 실행 카탈로그·보존 정책 (ML_CRM_RUNS, 오래된 실행 정리 + incremental VACUUM) ----
+ML_RUN_KEEP_RUNS = 10   # 최근 N개 실행은 유지
+ML_RUN_KEEP_DAYS = 90   # N일 이내 실행은 유지 (둘 중 하나라도 해당하면 유지, 최신 실행은 항상 유지)
+VACUUM_STEP_PAGES = 2000  # incremental_vacuum 한 번에 반환하는 페이지 수 (쓰기 잠금을 짧게 여러 번)
+_retention_lock = threading.Lock()
+
+
+def register_ml_run(
+    conn: sqlite3.Connection,
+    run_key: str,
+    row_count: int,
+    created_date: str | None = None,
+    created_time: str | None = None,
+    source_tables: list[str] | None = None,
+):
+    """
+    ML 실행 메타데이터를 카탈로그에 기록 (결과 저장과 같은 호출 측 트랜잭션 안에서).
+    일반 INSERT — 이미 있는 RUN_KEY면 IntegrityError로 트랜잭션 전체가 롤백됨 (다른 실행 결과와 섞이지 않도록).
+    """
+    conn.execute(
+        f"""INSERT INTO {ML_RUNS_TABLE} (RUN_KEY, ROW_CNT, SOURCE_TABLES, CREATED_DATE, CREATED_TIME)
+            VALUES (?, ?, ?, ?, ?)""",
+        (run_key, int(row_count), json.dumps(source_tables or [], ensure_ascii=False), created_date, created_time),
+    )
+    conn.execute(f"INSERT OR IGNORE INTO {META_TABLE} (name) VALUES (?)", (ML_RUNS_TABLE,))
+
+
+def next_ml_run_key(day: str, conn: sqlite3.Connection | None = None) -> str:
+    """day(YYYYMMDD) + 4자리 일련번호. 카탈로그 PK 범위 조회로 그날 마지막 키만 읽음."""
+    conn = conn or get_connection()
+    last = conn.execute(
+        f"SELECT MAX(RUN_KEY) FROM {ML_RUNS_TABLE} WHERE RUN_KEY BETWEEN ? AND ?", (day + "0000", day + "9999")
+    ).fetchone()[0]
+    seq = int(str(last)[8:12]) + 1 if last and str(last)[8:12].isdigit() else 1
+    return day + str(seq).zfill(4)
+
+
+def list_ml_runs() -> list[dict]:
+    """ML 실행 목록 (최신순). 반환: [ {"run_key", "rows", "source_tables", "created_date", "created_time"}, ... ]"""
+    if not DB_PATH.exists():
+        return []
+    try:
+        rows = get_connection().execute(
+            f"SELECT RUN_KEY, ROW_CNT, SOURCE_TABLES, CREATED_DATE, CREATED_TIME FROM {ML_RUNS_TABLE} ORDER BY RUN_KEY DESC"
+        ).fetchall()
+        return [
+            {"run_key": k, "rows": n, "source_tables": json.loads(src or "[]"), "created_date": d, "created_time": t}
+            for k, n, src, d, t in rows
+        ]
+    except Exception:
+        return []
+
+
+def latest_ml_run_key() -> str | None:
+    """가장 최근 RUN_KEY (카탈로그 PK 끝 한 건). 없으면 None."""
+    if not DB_PATH.exists():
+        return None
+    try:
+        return get_connection().execute(f"SELECT MAX(RUN_KEY) FROM {ML_RUNS_TABLE}").fetchone()[0]
+    except Exception:
+        return None
+
+
+@_cached_read(lambda *a, **k: [ML_RESULTS_TABLE, ML_RUNS_TABLE])
+def load_ml_results(run_key: str | None = None, cstno=None) -> pd.DataFrame | None:
+    """
+    실행 하나의 등급 결과 (run_key 없으면 최신 실행). cstno를 주면 그 고객 한 건만.
+    (RUN_KEY, CSTNO) 인덱스로 해당 실행 행만 읽음. CREATED_DATE·CREATED_TIME이 비어 있으면 카탈로그 값으로 채움.
+    """
+    run_key = run_key or latest_ml_run_key()
+    if not run_key:
+        return None
+    try:
+        conn = get_connection()
+        q = f"SELECT * FROM {ML_RESULTS_TABLE} WHERE RUN_KEY = ?"
+        params = [run_key]
+        if cstno is not None:
+            q += " AND CSTNO = ?"
+            params.append(cstno)
+        df = pd.read_sql(q, conn, params=params)
+        if df.empty:
+            return None
+        meta = conn.execute(
+            f"SELECT CREATED_DATE, CREATED_TIME FROM {ML_RUNS_TABLE} WHERE RUN_KEY = ?", (run_key,)
+        ).fetchone()
+        if meta:
+            for col, val in zip(("CREATED_DATE", "CREATED_TIME"), meta):
+                if col in df.columns:
+                    df[col] = df[col].fillna(val) if val is not None else df[col]
+        return df
+    except Exception:
+        return None
+
+
+def _expired_ml_runs(conn: sqlite3.Connection, keep_runs: int | None, keep_days: int | None) -> list[str]:
+    """보존 정책 밖의 RUN_KEY 목록. 생성 일자가 없는 예전 실행은 RUN_KEY 앞 8자리(YYYYMMDD)로 판단."""
+    if keep_runs is None and keep_days is None:
+        return []
+    cutoff = (
+        conn.execute("SELECT date('now', 'localtime', ?)", (f"-{int(keep_days)} days",)).fetchone()[0]
+        if keep_days is not None else None
+    )
+    runs = conn.execute(f"SELECT RUN_KEY, CREATED_DATE FROM {ML_RUNS_TABLE} ORDER BY RUN_KEY DESC").fetchall()
+    out = []
+    for i, (key, day) in enumerate(runs):
+        if i == 0 or (keep_runs is not None and i < keep_runs):
+            continue
+        key = str(key)
+        day = day or (f"{key[:4]}-{key[4:6]}-{key[6:8]}" if len(key) >= 8 else "")
+        if cutoff is not None and day >= cutoff:
+            continue
+        out.append(key)
+    return out
+
+
+def prune_ml_runs(keep_runs: int | None = ML_RUN_KEEP_RUNS, keep_days: int | None = ML_RUN_KEEP_DAYS) -> dict:
+    """
+    보존 정책(최근 keep_runs개 또는 keep_days일 이내 유지) 밖의 실행을 결과·범주·카탈로그에서 한 트랜잭션으로 삭제.
+    None인 기준은 쓰지 않음 (둘 다 None이면 아무것도 지우지 않음). 삭제 행은 변경 로그에 D 구간으로 기록.
+    반환: {"runs": 삭제 실행 수, "rows": 삭제 결과 행 수, "error"}
+    """
+    out = {"runs": 0, "rows": 0, "error": None}
+    if not DB_PATH.exists():
+        return out
+    try:
+        with write_transaction(ML_RESULTS_TABLE, ML_SEGMENTS_TABLE, ML_RUNS_TABLE) as conn:
+            expired = _expired_ml_runs(conn, keep_runs, keep_days)
+            for key in expired:
+                for tname in (ML_RESULTS_TABLE, ML_SEGMENTS_TABLE):
+                    rowids = [r[0] for r in conn.execute(f"SELECT rowid FROM {tname} WHERE RUN_KEY = ?", (key,))]
+                    if not rowids:
+                        continue
+                    conn.execute(f"DELETE FROM {tname} WHERE RUN_KEY = ?", (key,))
+                    for lo, hi, n in _runs(rowids):
+                        _log_change(conn, tname, "D", lo, hi, n)
+                    if tname == ML_RESULTS_TABLE:
+                        out["rows"] += len(rowids)
+                conn.execute(f"DELETE FROM {ML_RUNS_TABLE} WHERE RUN_KEY = ?", (key,))
+            if out["rows"]:
+                # 삭제분은 누적 프로파일에서 뺄 수 없으므로 근사로 표시
+                conn.execute(f"UPDATE {COLUMN_PROFILE_TABLE} SET exact = 0 WHERE table_name = ?", (ML_RESULTS_TABLE,))
+            out["runs"] = len(expired)
+    except Exception as e:
+        out["error"] = str(e)
+    return out
+
+
+def incremental_vacuum(max_pages: int | None = None, convert: bool = False) -> int:
+    """
+    빈 페이지(freelist)를 파일에서 반환. auto_vacuum=INCREMENTAL인 DB는 VACUUM_STEP_PAGES씩 나눠 반환 (잠금을 짧게).
+    예전 DB(auto_vacuum=NONE)는 convert=True일 때만 전체 VACUUM 한 번으로 INCREMENTAL 전환 (파일 전체 재작성 — 한가할 때).
+    전환하지 않은 DB의 빈 페이지는 파일 크기는 그대로지만 다음 적재에서 재사용됨.
+    max_pages: 반환할 최대 페이지 수 (None = 전부). 반환: 반환한 페이지 수 (-1 = 오류)
+    """
+    if not DB_PATH.exists():
+        return 0
+    try:
+        conn = get_connection()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not convert:
+                return 0
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return before
+        target = before if max_pages is None else min(before, int(max_pages))
+        freed = 0
+        while freed < target:
+            step = min(VACUUM_STEP_PAGES, target - freed)
+            conn.execute(f"PRAGMA incremental_vacuum({step})").fetchall()  # 끝까지 읽어야 실제로 반환됨
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if before - left <= freed:
+                break
+            freed = before - left
+        return freed
+    except Exception:
+        return -1
+
+
+def schedule_ml_retention(
+    keep_runs: int | None = ML_RUN_KEEP_RUNS, keep_days: int | None = ML_RUN_KEEP_DAYS
+) -> bool:
+    """prune_ml_runs + incremental_vacuum을 백그라운드 스레드(자체 연결)에서 실행. 이미 실행 중이면 건너뜀. 반환: 시작 여부"""
+    if not _retention_lock.acquire(blocking=False):
+        return False
+
+    def _work():
+        try:
+            if prune_ml_runs(keep_runs, keep_days)["runs"]:
+                incremental_vacuum()
+        finally:
+            close_connection()
+            _retention_lock.release()
+
+    try:
+        threading.Thread(target=_work, name="ml-retention", daemon=True).start()
         return True
     except Exception:
+        _retention_lock.release()
         return False
 
 
+# ---- 고객 단건 조회 (고객키 인덱스로 고객 한 명의 행 + 최신 실행 등급) ----
+# 고객 상세 화면이 고객을 바꿀 때마다 테이블 전체를 읽지 않도록, 고객키 컬럼(ensure_key_indexes가 인덱스 생성)에 대해
+# 테이블마다 인덱스 조회 1회 + ML_CRM_RESULTS (RUN_KEY, CSTNO) 인덱스 조회 1회. 테이블 크기와 무관하게 고객 행 수에 비례.
+CUSTOMER_POINT_ROWS = 100  # 고객 한 명 조회 시 테이블당 최대 행 수 (최근 rowid 순)
+_CUSTOMER_POINT_SKIP = (ML_RESULTS_TABLE, ML_SEGMENTS_TABLE, ML_RUNS_TABLE)  # 등급은 grades로 따로 반환
+
+
+def customer_key_column(table_name: str) -> str | None:
+    """테이블의 고객키 컬럼 (_is_customer_key 기준, 컬럼 한글명 포함). 없으면 None."""
+    if not table_name or not DB_PATH.exists():
+        return None
+    table_name = _sanitize_table_name(table_name)
+    try:
+        comments = {c: m["name_ko"] for c, m in _catalog.snapshot()["columns"].get(table_name, {}).items()}
+        for r in _catalog.table_info(table_name):
+            if _is_customer_key(r[1], comments.get(r[1])):
+                return r[1]
+    except Exception:
+        pass
+    return None
+
+
+def get_customer_grades(cust_id, run_key: str | None = None) -> dict | None:
+    """고객 한 명의 ML 등급 (run_key 없으면 최신 실행). 범주명(SEGMENT_NM)은 ML_CRM_SEGMENTS에서. 없으면 None."""
+    if cust_id is None or not DB_PATH.exists():
+        return None
+    run_key = run_key or latest_ml_run_key()
+    if not run_key:
+        return None
+    keys = _customer_key_variants([cust_id])
+    try:
+        cur = get_connection().execute(
+            f"""SELECT r.*, s.SEGMENT_NM FROM {ML_RESULTS_TABLE} r
+                LEFT JOIN {ML_SEGMENTS_TABLE} s ON s.RUN_KEY = r.RUN_KEY AND s.SEGMENT_CD = r.SEGMENT_CD
+                WHERE r.RUN_KEY = ? AND r.CSTNO IN ({", ".join("?" * len(keys))}) LIMIT 1""",
+            [run_key] + keys,
+        )
+        row = cur.fetchone()
+        return dict(zip([d[0] for d in cur.description], row)) if row else None
+    except Exception:
+        return None
+
+
+def get_customer_detail(
+    cust_id, tables: list[str] | None = None, limit: int = CUSTOMER_POINT_ROWS, run_key: str | None = None
+) -> dict:
+    """
+    고객 한 명의 행을 고객키로 연결된 모든 테이블(tables 없으면 list_tables 전체)에서 인덱스로 조회 + 최신 실행 등급.
+    테이블마다 최근 limit행을 rowid 오름차순으로 반환. 고객키 컬럼이 없는 테이블·행이 없는 테이블은 생략.
+    반환: {"customer", "tables": {테이블: DataFrame}, "key_columns": {테이블: 고객키 컬럼}, "grades": dict 또는 None,
+          "run_key", "elapsed_ms"}
+    """
+    started = time.perf_counter()
+    out = {"customer": cust_id, "tables": {}, "key_columns": {}, "grades": None, "run_key": None, "elapsed_ms": 0.0}
+    if cust_id is None or not DB_PATH.exists():
+        return out
+    keys = _customer_key_variants([cust_id])
+    conn = get_connection()
+    for t in [_sanitize_table_name(t) for t in tables] if tables is not None else list_tables():
+        if t in _CUSTOMER_POINT_SKIP:
+            continue
+        col = customer_key_column(t)
+        if not col:
+            continue
+        try:
+            df = pd.read_sql(
+                f'SELECT * FROM "{t}" WHERE "{col}" IN ({", ".join("?" * len(keys))}) ORDER BY rowid DESC LIMIT {max(1, int(limit))}',
+                conn,
+                params=keys,
+            )
+        except Exception:
+            continue
+        if not df.empty:
+            out["tables"][t] = df.iloc[::-1].reset_index(drop=True)
+            out["key_columns"][t] = col
+    out["run_key"] = run_key or latest_ml_run_key()
+    out["grades"] = get_customer_grades(cust_id, out["run_key"]) if out["run_key"] else None
+    out["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return out
+
+
 def get_table_schema_with_comments(table_name: str) -> list[dict]:
     """
     단일 테이블의 컬럼 스키마 + 한글명 반환.
@@ -856,10 +4828,7 @@ def get_table_schema_with_comments(table_name: str) -> list[dict]:
         return []
     comments = get_column_comments(table_name)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute(f'PRAGMA table_info("{table_name}")')
-        rows = cur.fetchall()
-        conn.close()
+        rows = _catalog.table_info(table_name)
         return [
             {
                 "name": r[1],
@@ -875,50 +4844,25 @@ def get_table_schema_with_comments(table_name: str) -> list[dict]:
 
 def get_all_tables_schema_with_comments() -> dict[str, list[dict]]:
     """
-    모든 테이블의 스키마+한글명을 한 번의 연결로 조회 (조건 추출 설정 등 대량 조회 시 로딩 완화).
+    모든 테이블의 스키마+한글명을 메타데이터 카탈로그에서 조회 (조건 추출 설정 등 대량 조회 시 로딩 완화).
     반환: { table_name: [ {"name", "type", "name_ko"}, ... ], ... }
     """
     if not DB_PATH.exists():
         return {}
     out = {}
     try:
-        conn = sqlite3.connect(DB_PATH)
-        _ensure_meta(conn)
-        try:
-            cur = conn.execute(f"SELECT name FROM {META_TABLE} ORDER BY name")
-            names = [row[0] for row in cur.fetchall()]
-        except Exception:
-            names = []
-        comments_all = {}
-        try:
-            _ensure_comment_tables(conn)
-            cur = conn.execute(
-                f"SELECT table_name, column_name, name_ko FROM {COLUMN_COMMENT_TABLE}"
-            )
-            for row in cur.fetchall():
-                t, c, ko = row[0], row[1], row[2]
-                if t not in comments_all:
-                    comments_all[t] = {}
-                if ko:
-                    comments_all[t][c] = ko
-        except Exception:
-            pass
-        for tname in names:
-            try:
-                cur = conn.execute(f'PRAGMA table_info("{tname}")')
-                rows = cur.fetchall()
-                comments = comments_all.get(tname, {})
-                out[tname] = [
-                    {
-                        "name": r[1],
-                        "type": (r[2] or "TEXT").upper(),
-                        "name_ko": comments.get(r[1]),
-                    }
-                    for r in rows
-                ]
-            except Exception:
-                out[tname] = []
-        conn.close()
+        data = _catalog.snapshot()
+        for tname in data["tables"]:
+            rows = data["table_info"].get(tname, [])
+            cols = data["columns"].get(tname, {})
+            out[tname] = [
+                {
+                    "name": r[1],
+                    "type": (r[2] or "TEXT").upper(),
+                    "name_ko": (cols.get(r[1]) or {}).get("name_ko") or None,
+                }
+                for r in rows
+            ]
     except Exception:
         pass
     return out
@@ -934,17 +4878,14 @@ def get_tables_schema() -> list[dict]:
         return []
     out = []
     try:
-        conn = sqlite3.connect(DB_PATH)
         for tname in names:
-            cur = conn.execute(f'PRAGMA table_info("{tname}")')
-            rows = cur.fetchall()
+            rows = _catalog.table_info(tname)
             # sqlite3: (cid, name, type, notnull, dflt_value, pk)
             cols = [
                 {"name": r[1], "type": (r[2] or "TEXT"), "pk": bool(r[5])}
                 for r in rows
             ]
             out.append({"name": tname, "columns": cols})
-        conn.close()
     except Exception:
         pass
     return out
@@ -955,7 +4896,6 @@ def refresh_erd_tables_json() -> bool:
     try:
         _ensure_dir()
         schema = get_tables_schema()
-        import json
         with open(ERD_JSON_PATH, "w", encoding="utf-8") as f:
             json.dump({"tables": schema}, f, ensure_ascii=False, indent=2)
         return True
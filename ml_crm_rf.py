@@ -5,6 +5,7 @@
 - BASE_YM 있으면 최신 연월만 사용
 - 수익성·건전성·취급율 타겟: 테이블 데이터·컬럼명/한글명 분석으로 각 차원당 상위 3개 후보 선정 후, 유효한 1개씩 타겟으로 사용
 - 수익성(Regressor)·건전성(Classifier)·취급율(Regressor) 학습 → 1~10등급·우선순위 점수(0~100)·ML_CRM_RESULTS 저장
+- 실행 메타데이터는 ML_CRM_RUNS에 기록, 보존 정책(최근 N개·N일) 밖의 실행은 저장 후 백그라운드에서 정리
 """
 
 from pathlib import Path
@@ -16,13 +17,28 @@ import numpy as np
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 
-# db_storage와 동일 경로
+from db_storage import (
+    append_rows,
+    get_connection,
+    get_column_comments,
+    get_column_profile,
+    load_table,
+    load_table_partitions,
+    next_ml_run_key,
+    partition_column,
+    register_ml_run,
+    schedule_ml_retention,
+    write_transaction,
+)
+
+# db_storage와 동일 경로 (연결은 db_storage.get_connection 공유)
 DB_DIR = Path(__file__).resolve().parent / "data"
 DB_PATH = DB_DIR / "crm.db"
 EXTRACTION_CONFIG_PATH = Path(__file__).resolve().parent / "data" / "extraction_config.json"
 COLUMN_COMMENT_TABLE = "_column_comment"
 ML_RESULTS_TABLE = "ML_CRM_RESULTS"
 ML_SEGMENTS_TABLE = "ML_CRM_SEGMENTS"  # RUN_KEY + 범주코드 키, 범주 요약·해석 저장
+ML_RUNS_TABLE = "ML_CRM_RUNS"  # RUN_KEY별 실행 메타데이터 (db_storage.register_ml_run)
 # 고객 범주 코드 (범주명 → 코드)
 SEGMENT_CD_MAP = {"VIP": "01", "우수고객": "02", "잠재고객": "03", "일반고객": "04", "주의고객": "05", "위험고객": "06"}
 
@@ -41,26 +57,12 @@ KEYWORDS_HANDLING = (
 )
 
 
-def _next_run_key(conn: sqlite3.Connection) -> str:
-    """오늘 날짜(YYYYMMDD) + 4자리 일련번호 생성. 예: 202602080001"""
-    today = datetime.now().strftime("%Y%m%d")
-    try:
-        cur = conn.execute(
-            f"SELECT MAX(RUN_KEY) FROM {ML_RESULTS_TABLE} WHERE RUN_KEY LIKE ?",
-            (today + "%",),
-        )
-        row = cur.fetchone()
-        if row and row[0]:
-            last = str(row[0])
-            if len(last) >= 12 and last[:8] == today:
-                seq = int(last[8:12]) + 1
-            else:
-                seq = 1
-        else:
-            seq = 1
-    except Exception:
-        seq = 1
-    return today + str(seq).zfill(4)
+def _next_run_key(conn: sqlite3.Connection, now: datetime | None = None) -> str:
+    """
+    오늘 날짜(YYYYMMDD) + 4자리 일련번호 생성. 예: 202602080001 (실행 카탈로그 ML_CRM_RUNS 기준)
+    결과를 저장하는 쓰기 트랜잭션 안에서 호출 (밖에서 정하면 동시 실행이 같은 키를 받음). 조회 오류는 그대로 전파.
+    """
+    return next_ml_run_key((now or datetime.now()).strftime("%Y%m%d"), conn)
 
 
 def _load_extraction_config():
@@ -77,41 +79,21 @@ def _load_extraction_config():
 
 
 def _load_table_from_db(table_name: str) -> pd.DataFrame | None:
-    """SQLite에서 테이블 전체 로드."""
+    """테이블 전체 로드 (load_table: COLUMNAR_MIN_ROWS 이상이면 컬럼형 스냅샷(mmap), 아니면 분석 엔진 설정에 따라 DuckDB/SQLite).
+    정수 축소·저유일값 텍스트 category 등 compact_dtypes 적용 (절감량은 df.attrs["compact"])."""
     if not DB_PATH.exists():
         return None
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn)
-        conn.close()
-        return df if not df.empty else None
-    except Exception:
-        return None
+    return load_table(table_name, compact=True)
 
 
 def _get_column_comment(conn: sqlite3.Connection, table_name: str, column_name: str) -> str | None:
-    """_column_comment에서 컬럼 한글명 조회."""
-    try:
-        cur = conn.execute(
-            f"SELECT name_ko FROM {COLUMN_COMMENT_TABLE} WHERE table_name = ? AND column_name = ?",
-            (table_name, column_name),
-        )
-        row = cur.fetchone()
-        return row[0] if row and row[0] else None
-    except Exception:
-        return None
+    """컬럼 한글명 조회 (db_storage 메타데이터 카탈로그)."""
+    return get_column_comments(table_name).get(column_name)
 
 
 def get_column_comments_map(conn: sqlite3.Connection, table_name: str) -> dict[str, str]:
-    """테이블별 컬럼 한글명 전체 조회. { column_name: name_ko }"""
-    try:
-        cur = conn.execute(
-            f"SELECT column_name, name_ko FROM {COLUMN_COMMENT_TABLE} WHERE table_name = ?",
-            (table_name,),
-        )
-        return {row[0]: row[1] for row in cur.fetchall() if row[1]}
-    except Exception:
-        return {}
+    """테이블별 컬럼 한글명 전체 조회. { column_name: name_ko } (db_storage 메타데이터 카탈로그)"""
+    return get_column_comments(table_name)
 
 
 def _column_name_ko_map(merged_columns: list, column_comments_by_table: dict) -> dict[str, str]:
@@ -149,9 +131,11 @@ def select_target_candidates(
     merged: pd.DataFrame,
     column_comments_by_table: dict,
     top_k: int = 3,
+    profiles_by_table: dict | None = None,
 ) -> tuple[dict[str, list[str]], dict[str, str | None]]:
     """
     병합 데이터와 컬럼 한글명을 분석해 수익성·건전성·취급율 각각 상위 top_k개 후보 선정.
+    profiles_by_table({테이블: get_column_profile 결과})이 있으면 문자 컬럼의 숫자 여부를 프로파일로 판정(전체 변환 생략).
     반환: (candidates, selected_targets)
     - candidates: {"profit": [col1,col2,col3], "soundness": [...], "handling": [...]}
     - selected_targets: {"profit": col | None, "soundness": col | None, "handling": col | None}
@@ -159,6 +143,8 @@ def select_target_candidates(
     """
     exclude = set(c.upper() for c in IDENTIFIER_COLS)
     col_ko = _column_name_ko_map(merged.columns.tolist(), column_comments_by_table)
+    # 병합 컬럼 → 원본 테이블 프로파일 (한글명과 같은 .TableName 접미사 규칙)
+    col_profile = _column_name_ko_map(merged.columns.tolist(), profiles_by_table) if profiles_by_table else {}
     candidates = {"profit": [], "soundness": [], "handling": []}
     selected = {"profit": None, "soundness": None, "handling": None}
 
@@ -177,7 +163,13 @@ def select_target_candidates(
         if valid_count < 5:
             continue
         name_ko = col_ko.get(col) or ""
-        is_numeric = pd.api.types.is_numeric_dtype(s) or (s.dtype == object and pd.to_numeric(s, errors="coerce").notna().sum() >= valid_count // 2)
+        prof = col_profile.get(col)
+        if pd.api.types.is_numeric_dtype(s):
+            is_numeric = True
+        elif s.dtype == object and prof:
+            is_numeric = prof["numeric"] >= prof["non_null"] // 2
+        else:
+            is_numeric = s.dtype == object and pd.to_numeric(s, errors="coerce").notna().sum() >= valid_count // 2
 
         for dim, keywords in dim_keywords:
             sc = _score_column_for_dimension(col, name_ko, keywords, is_numeric, valid_count)
@@ -218,7 +210,7 @@ def select_target_candidates(
 def build_merged_df(config_list: list[dict]) -> tuple[pd.DataFrame | None, str]:
     """
     데이터 사용 설정의 테이블을 CSTNO 기준 INNER JOIN.
-    BASE_YM 있으면 해당 테이블은 최신 연월만 필터.
+    BASE_YM 있으면 해당 테이블은 최신 연월 파티션만 조회 (BASE_YM 인덱스로 한 달치만 읽음).
     반환: (merged_df, error_message). 성공 시 error_message는 "".
     """
     if not config_list:
@@ -227,13 +219,17 @@ def build_merged_df(config_list: list[dict]) -> tuple[pd.DataFrame | None, str]:
         return None, "DB 파일이 없습니다."
 
     dfs = []
+    saved = 0  # compact_dtypes로 줄인 메모리 (바이트)
     for cfg in config_list:
         tname = cfg.get("table_name")
         if not tname:
             continue
-        df = _load_table_from_db(tname)
+        df = load_table_partitions(tname, latest_only=True, compact=True) if partition_column(tname) else None
+        if df is None:
+            df = _load_table_from_db(tname)
         if df is None or df.empty:
             continue
+        saved += (df.attrs.get("compact") or {}).get("saved", 0)
         if "CSTNO" not in df.columns:
             continue
         if "BASE_YM" in df.columns:
@@ -254,6 +250,7 @@ def build_merged_df(config_list: list[dict]) -> tuple[pd.DataFrame | None, str]:
     merged = dfs[0]
     for df in dfs[1:]:
         merged = merged.merge(df, on="CSTNO", how="inner")
+    merged.attrs["memory_saved"] = saved
     return merged, ""
 
 
@@ -277,6 +274,9 @@ def prepare_features_and_targets(
 
     feature_cols = [c for c in df.columns if c not in exclude and df[c].notna().any()]
     X = df[feature_cols].copy()
+    # category(저유일값 텍스트)는 코드로 (결측 -1) — fillna(0)이 범주 밖 값이라 실패하므로 먼저 변환
+    for col in X.select_dtypes(include=["category"]).columns:
+        X[col] = X[col].cat.codes
     X = X.fillna(0)
 
     for col in X.select_dtypes(include=["object"]).columns:
@@ -356,18 +356,21 @@ def run_ml_pipeline() -> tuple[bool, str, dict]:
     if merged is None:
         return False, err or "병합 실패", result
     result["merged_rows"] = len(merged)
+    result["memory_saved"] = merged.attrs.get("memory_saved", 0)
 
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        for cfg in config_list:
-            tname = cfg.get("table_name")
-            if tname:
-                result["column_comments_by_table"][tname] = get_column_comments_map(conn, tname)
-    finally:
-        conn.close()
+    conn = get_connection()
+    for cfg in config_list:
+        tname = cfg.get("table_name")
+        if tname:
+            result["column_comments_by_table"][tname] = get_column_comments_map(conn, tname)
 
     # 수익성·건전성·취급율 타겟 후보 각 3개 선정 → 유효한 1개씩 타겟으로 선택
-    candidates, selected = select_target_candidates(merged, result["column_comments_by_table"], top_k=3)
+    profiles_by_table = {
+        cfg["table_name"]: get_column_profile(cfg["table_name"]) for cfg in config_list if cfg.get("table_name")
+    }
+    candidates, selected = select_target_candidates(
+        merged, result["column_comments_by_table"], top_k=3, profiles_by_table=profiles_by_table
+    )
     result["target_candidates"] = candidates
     result["selected_targets"] = selected
 
@@ -460,16 +463,10 @@ def run_ml_pipeline() -> tuple[bool, str, dict]:
     segment_cd = customer_segment.map(SEGMENT_CD_MAP)
 
     now = datetime.now()
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        run_key = _next_run_key(conn)
-        conn.close()
-    except Exception:
-        run_key = now.strftime("%Y%m%d") + "0001"
     created_date = now.strftime("%Y-%m-%d")
     created_time = now.strftime("%H:%M:%S")
     out = pd.DataFrame({
-        "RUN_KEY": [run_key] * len(merged),
+        "RUN_KEY": [None] * len(merged),  # 저장 트랜잭션 안에서 채번
         "CSTNO": merged["CSTNO"].values,
         "profit_grade": grade_profit.values,
         "soundness_grade": grade_soundness.values,
@@ -500,108 +497,87 @@ def run_ml_pipeline() -> tuple[bool, str, dict]:
             "avg_handling_grade": round(sub["handling_grade"].mean(), 2),
             "avg_priority_score": round(sub["priority_score"].mean(), 2),
         })
-    result["run_key"] = run_key
+    result["run_key"] = None
 
-    # SQLite ML_CRM_RESULTS 저장 (append로 누적). 기존 테이블에 RUN_KEY 등 컬럼 없으면 ADD COLUMN
+    # SQLite ML_CRM_RESULTS 저장 (append로 누적). 테이블·컬럼 생성은 db_storage 스키마 마이그레이션에서 처리
+    # 결과·범주·한글명 등록을 한 트랜잭션으로 (커밋 후 테이블 버전·메타데이터 카탈로그 갱신은 write_transaction이 처리)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        try:
-            cur = conn.execute(f"PRAGMA table_info({ML_RESULTS_TABLE})")
-            existing_cols = {row[1] for row in cur.fetchall()}
-        except Exception:
-            existing_cols = set()
-        if existing_cols:
-            for col, col_type in [
-                ("RUN_KEY", "TEXT"), ("CREATED_DATE", "TEXT"), ("CREATED_TIME", "TEXT"),
-                ("SEGMENT_CD", "TEXT"),
-            ]:
-                if col not in existing_cols:
-                    conn.execute(f"ALTER TABLE {ML_RESULTS_TABLE} ADD COLUMN [{col}] {col_type}")
-                    conn.commit()
-        # 컬럼 한글명 등록 (_column_comment)
-        try:
-            conn.execute(
-                f"""CREATE TABLE IF NOT EXISTS {COLUMN_COMMENT_TABLE} (
-                    table_name TEXT, column_name TEXT, name_ko TEXT,
-                    PRIMARY KEY (table_name, column_name)
-                )"""
-            )
-            for col, name_ko in [
-                ("RUN_KEY", "실행키"),
-                ("CSTNO", "고객번호"),
-                ("profit_grade", "수익성 등급"),
-                ("soundness_grade", "건전성 등급"),
-                ("handling_grade", "취급율 등급"),
-                ("priority_score", "우선순위 점수"),
-                ("marketing_group", "마케팅 그룹"),
-                ("SEGMENT_CD", "범주코드"),
-                ("CREATED_DATE", "생성 일자"),
-                ("CREATED_TIME", "생성 시간"),
-            ]:
-                conn.execute(
+        with write_transaction(ML_RESULTS_TABLE, ML_SEGMENTS_TABLE, ML_RUNS_TABLE, metadata=True) as conn:
+            # 실행키는 같은 트랜잭션에서 채번 → 카탈로그 PK(일반 INSERT)가 동시 실행 충돌을 오류로 드러냄
+            run_key = _next_run_key(conn, now)
+            out["RUN_KEY"] = run_key
+            result["run_key"] = run_key
+            # 컬럼 한글명 등록 (_column_comment)
+            try:
+                conn.executemany(
                     f"INSERT OR REPLACE INTO {COLUMN_COMMENT_TABLE} (table_name, column_name, name_ko) VALUES (?, ?, ?)",
-                    (ML_RESULTS_TABLE, col, name_ko),
+                    [
+                        (ML_RESULTS_TABLE, col, name_ko)
+                        for col, name_ko in [
+                            ("RUN_KEY", "실행키"),
+                            ("CSTNO", "고객번호"),
+                            ("profit_grade", "수익성 등급"),
+                            ("soundness_grade", "건전성 등급"),
+                            ("handling_grade", "취급율 등급"),
+                            ("priority_score", "우선순위 점수"),
+                            ("marketing_group", "마케팅 그룹"),
+                            ("SEGMENT_CD", "범주코드"),
+                            ("CREATED_DATE", "생성 일자"),
+                            ("CREATED_TIME", "생성 시간"),
+                        ]
+                    ],
                 )
-            conn.commit()
-        except Exception:
-            pass
-        out.to_sql(ML_RESULTS_TABLE, conn, if_exists="append", index=False)
-        conn.execute("INSERT OR REPLACE INTO _crm_tables (name) VALUES (?)", (ML_RESULTS_TABLE,))
-        conn.commit()
-
-        # ML_CRM_SEGMENTS: RUN_KEY + 범주코드(SEGMENT_CD) 키로 범주 요약·해석 저장
-        conn.execute(
-            f"""CREATE TABLE IF NOT EXISTS {ML_SEGMENTS_TABLE} (
-                RUN_KEY TEXT NOT NULL,
-                SEGMENT_CD TEXT NOT NULL,
-                SEGMENT_NM TEXT,
-                CNT INTEGER,
-                AVG_PROFIT_GRADE REAL,
-                AVG_SOUNDNESS_GRADE REAL,
-                AVG_HANDLING_GRADE REAL,
-                AVG_PRIORITY_SCORE REAL,
-                SEGMENT_INTERPRETATION TEXT,
-                CREATED_DATE TEXT,
-                CREATED_TIME TEXT,
-                PRIMARY KEY (RUN_KEY, SEGMENT_CD)
-            )"""
-        )
-        for seg in result.get("segment_summary") or []:
-            conn.execute(
+            except Exception:
+                pass
+            # 생성 일시는 결과 행(데이터 보기에서 바로 보이도록)과 실행 카탈로그(ML_CRM_RUNS) 양쪽에 기록
+            append_rows(conn, ML_RESULTS_TABLE, out)
+            conn.execute("INSERT OR REPLACE INTO _crm_tables (name) VALUES (?)", (ML_RESULTS_TABLE,))
+            register_ml_run(
+                conn, run_key, len(out), created_date, created_time,
+                [cfg["table_name"] for cfg in config_list if cfg.get("table_name")],
+            )
+
+            # ML_CRM_SEGMENTS: RUN_KEY + 범주코드(SEGMENT_CD) 키로 범주 요약·해석 저장
+            conn.executemany(
                 f"""INSERT OR REPLACE INTO {ML_SEGMENTS_TABLE}
                     (RUN_KEY, SEGMENT_CD, SEGMENT_NM, CNT, AVG_PROFIT_GRADE, AVG_SOUNDNESS_GRADE, AVG_HANDLING_GRADE, AVG_PRIORITY_SCORE, SEGMENT_INTERPRETATION, CREATED_DATE, CREATED_TIME)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    run_key,
-                    seg.get("segment_cd", ""),
-                    seg.get("name", ""),
-                    seg.get("count", 0),
-                    seg.get("avg_profit_grade"),
-                    seg.get("avg_soundness_grade"),
-                    seg.get("avg_handling_grade"),
-                    seg.get("avg_priority_score"),
-                    None,  # 해석은 앱에서 AI 호출 후 UPDATE
-                    created_date,
-                    created_time,
-                ),
+                [
+                    (
+                        run_key,
+                        seg.get("segment_cd", ""),
+                        seg.get("name", ""),
+                        seg.get("count", 0),
+                        seg.get("avg_profit_grade"),
+                        seg.get("avg_soundness_grade"),
+                        seg.get("avg_handling_grade"),
+                        seg.get("avg_priority_score"),
+                        None,  # 해석은 앱에서 AI 호출 후 UPDATE
+                        created_date,
+                        created_time,
+                    )
+                    for seg in result.get("segment_summary") or []
+                ],
             )
-        conn.execute("INSERT OR REPLACE INTO _crm_tables (name) VALUES (?)", (ML_SEGMENTS_TABLE,))
-        for col, name_ko in [
-            ("RUN_KEY", "실행키"), ("SEGMENT_CD", "범주코드"), ("SEGMENT_NM", "범주명"),
-            ("CNT", "건수"), ("AVG_PROFIT_GRADE", "평균 수익등급"), ("AVG_SOUNDNESS_GRADE", "평균 건전등급"),
-            ("AVG_HANDLING_GRADE", "평균 취급등급"), ("AVG_PRIORITY_SCORE", "평균 우선순위점수"),
-            ("SEGMENT_INTERPRETATION", "범주 해석"), ("CREATED_DATE", "생성 일자"), ("CREATED_TIME", "생성 시간"),
-        ]:
+            conn.execute("INSERT OR REPLACE INTO _crm_tables (name) VALUES (?)", (ML_SEGMENTS_TABLE,))
             try:
-                conn.execute(
+                conn.executemany(
                     f"INSERT OR REPLACE INTO {COLUMN_COMMENT_TABLE} (table_name, column_name, name_ko) VALUES (?, ?, ?)",
-                    (ML_SEGMENTS_TABLE, col, name_ko),
+                    [
+                        (ML_SEGMENTS_TABLE, col, name_ko)
+                        for col, name_ko in [
+                            ("RUN_KEY", "실행키"), ("SEGMENT_CD", "범주코드"), ("SEGMENT_NM", "범주명"),
+                            ("CNT", "건수"), ("AVG_PROFIT_GRADE", "평균 수익등급"), ("AVG_SOUNDNESS_GRADE", "평균 건전등급"),
+                            ("AVG_HANDLING_GRADE", "평균 취급등급"), ("AVG_PRIORITY_SCORE", "평균 우선순위점수"),
+                            ("SEGMENT_INTERPRETATION", "범주 해석"), ("CREATED_DATE", "생성 일자"), ("CREATED_TIME", "생성 시간"),
+                        ]
+                    ],
                 )
             except Exception:
                 pass
-        conn.commit()
-        conn.close()
     except Exception as e:
         return False, f"ML_CRM_RESULTS 저장 실패: {e}", result
 
+    # 보존 정책 밖의 예전 실행은 백그라운드에서 정리 (incremental VACUUM 포함)
+    schedule_ml_retention()
     return True, "", result